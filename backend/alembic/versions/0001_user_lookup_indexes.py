@@ -0,0 +1,101 @@
+"""user lookup indexes
+
+为 CRUD 查询路径补充索引：
+- user_oauth(provider, provider_user_id) 唯一索引，对应 get_by_provider_user_id
+- user_oauth(user_id) 外键索引
+- user_sessions(user_id, is_active, expires_at) 复合索引，对应活跃会话查询
+
+基础表结构由 init_db() 创建，这里只负责增量索引。
+建唯一索引前先处理已有的重复 (provider, provider_user_id)：同一用户的重复关联只保留最新一条；
+关联到不同用户的重复无法自动合并，迁移直接失败并列出这些账户，人工处理后重新运行。
+所有索引都用 CREATE INDEX CONCURRENTLY 构建，不阻塞线上读写；
+CONCURRENTLY 不能在事务中执行，因此放在 autocommit_block 里。
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ("uq_user_oauth_provider_user_id", "user_oauth", ["provider", "provider_user_id"], True),
+    ("ix_user_oauth_user_id", "user_oauth", ["user_id"], False),
+    ("ix_user_sessions_user_active_expires", "user_sessions", ["user_id", "is_active", "expires_at"], False),
+]
+
+
+def _drop_invalid_index(name: str) -> None:
+    """删除并发构建失败后遗留的 INVALID 索引，否则 IF NOT EXISTS 会跳过它"""
+    if context.is_offline_mode() or op.get_bind().dialect.name != "postgresql":
+        return
+    bind = op.get_bind()
+    invalid = bind.execute(
+        sa.text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ),
+        {"name": name},
+    ).first()
+    if invalid:
+        op.execute(sa.text(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"'))
+
+
+def _dedupe_oauth_accounts() -> None:
+    """唯一索引 uq_user_oauth_provider_user_id 构建前处理重复行"""
+    if not context.is_offline_mode():
+        conflicts = op.get_bind().execute(
+            sa.text(
+                "SELECT provider, provider_user_id FROM user_oauth "
+                "GROUP BY provider, provider_user_id HAVING COUNT(DISTINCT user_id) > 1 "
+                "ORDER BY provider, provider_user_id LIMIT 20"
+            )
+        ).all()
+        if conflicts:
+            accounts = ", ".join(f"{provider}:{provider_user_id}" for provider, provider_user_id in conflicts)
+            raise RuntimeError(
+                "user_oauth 中存在关联到多个用户的 OAuth 账户，无法创建唯一索引 "
+                f"uq_user_oauth_provider_user_id，请先合并或删除这些关联: {accounts}"
+            )
+    # 同一用户的重复关联：保留 id 最大（最新）的一条
+    op.execute(
+        sa.text(
+            "DELETE FROM user_oauth WHERE id IN ("
+            "SELECT older.id FROM user_oauth older JOIN user_oauth newer "
+            "ON newer.provider = older.provider AND newer.provider_user_id = older.provider_user_id "
+            "AND newer.user_id = older.user_id AND newer.id > older.id)"
+        )
+    )
+
+
+def upgrade() -> None:
+    _dedupe_oauth_accounts()
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in INDEXES:
+            _drop_invalid_index(name)
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=unique,
+                if_not_exists=True,
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                if_exists=True,
+                postgresql_concurrently=True,
+            )
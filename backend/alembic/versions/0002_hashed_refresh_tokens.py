@@ -0,0 +1,37 @@
+"""hashed refresh tokens
+
+刷新令牌改为 "<会话ID>.<密钥>"，数据库只保存密钥的 SHA-256 哈希：
+- 删除明文 refresh_token 列及其唯一索引（刷新改为按主键查询）
+- 新增 refresh_token_hash / previous_refresh_token_hash / refresh_token_rotated_at
+  用于令牌轮换和重用检测
+
+已签发的旧刷新令牌全部失效，客户端需要重新登录。
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("user_sessions", sa.Column("refresh_token_hash", sa.String(length=64), nullable=True))
+    op.add_column("user_sessions", sa.Column("previous_refresh_token_hash", sa.String(length=64), nullable=True))
+    op.add_column("user_sessions", sa.Column("refresh_token_rotated_at", sa.DateTime(timezone=True), nullable=True))
+    op.drop_index("ix_user_sessions_refresh_token", table_name="user_sessions", if_exists=True)
+    op.drop_column("user_sessions", "refresh_token")
+
+
+def downgrade() -> None:
+    op.add_column("user_sessions", sa.Column("refresh_token", sa.String(length=255), nullable=True))
+    op.create_index("ix_user_sessions_refresh_token", "user_sessions", ["refresh_token"], unique=True)
+    op.drop_column("user_sessions", "refresh_token_rotated_at")
+    op.drop_column("user_sessions", "previous_refresh_token_hash")
+    op.drop_column("user_sessions", "refresh_token_hash")
@@ -0,0 +1,54 @@
+"""user search indexes
+
+为管理员用户搜索（GET /users/search）创建 pg_trgm GIN 索引，
+支持 lower(email/username/full_name) 上的 LIKE '%q%' 子串匹配和相似度排序。
+索引以 CREATE INDEX CONCURRENTLY 构建；非 PostgreSQL 数据库跳过
+（SQLite 使用建表时创建的 FTS5 表 users_fts）。
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ("ix_users_email_trgm", "email"),
+    ("ix_users_username_trgm", "username"),
+    ("ix_users_full_name_trgm", "full_name"),
+]
+
+
+def _is_postgresql() -> bool:
+    return context.is_offline_mode() or op.get_bind().dialect.name == "postgresql"
+
+
+def upgrade() -> None:
+    if not _is_postgresql():
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    with op.get_context().autocommit_block():
+        for name, column in INDEXES:
+            op.create_index(
+                name,
+                "users",
+                [sa.text(f"lower({column}) gin_trgm_ops")],
+                if_not_exists=True,
+                postgresql_using="gin",
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    if not _is_postgresql():
+        return
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(INDEXES):
+            op.drop_index(name, table_name="users", if_exists=True, postgresql_concurrently=True)
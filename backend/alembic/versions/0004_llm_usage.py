@@ -0,0 +1,56 @@
+"""llm usage
+
+新增 LLM 用量统计与项目配额表：
+- llm_usage：按 (日期, 代理, 项目, 用户, 模型) 汇总的请求数与token数，由用量累加器定期批量写入；
+  无项目/无用户记为 0（唯一约束中 NULL 互不相等，可为空的键列会产生重复行）
+- project_token_quotas：项目的每日token配额
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "llm_usage",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("agent_name", sa.String(length=100), nullable=False),
+        sa.Column("project_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("model", sa.String(length=100), nullable=False),
+        sa.Column("requests", sa.Integer(), nullable=False),
+        sa.Column("prompt_tokens", sa.BigInteger(), nullable=False),
+        sa.Column("completion_tokens", sa.BigInteger(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.UniqueConstraint("day", "agent_name", "project_id", "user_id", "model", name="uq_llm_usage_key"),
+        if_not_exists=True,
+    )
+    op.create_index("ix_llm_usage_id", "llm_usage", ["id"], if_not_exists=True)
+    op.create_index("ix_llm_usage_day", "llm_usage", ["day"], if_not_exists=True)
+    op.create_index("ix_llm_usage_project_day", "llm_usage", ["project_id", "day"], if_not_exists=True)
+    op.create_table(
+        "project_token_quotas",
+        sa.Column("project_id", sa.Integer(), primary_key=True),
+        sa.Column("daily_tokens", sa.BigInteger(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("project_token_quotas", if_exists=True)
+    op.drop_index("ix_llm_usage_project_day", table_name="llm_usage", if_exists=True)
+    op.drop_index("ix_llm_usage_day", table_name="llm_usage", if_exists=True)
+    op.drop_index("ix_llm_usage_id", table_name="llm_usage", if_exists=True)
+    op.drop_table("llm_usage", if_exists=True)
@@ -0,0 +1,51 @@
+"""change log
+
+新增项目变更日志，用于看板/待办列表的增量同步：
+- project_versions：每个项目单调递增的变更版本，以及已压缩掉的最高版本
+- change_log：每次写入的实体变更（按项目与版本索引）
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "project_versions",
+        sa.Column("project_id", sa.Integer(), primary_key=True),
+        sa.Column("version", sa.BigInteger(), nullable=False),
+        sa.Column("min_version", sa.BigInteger(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        if_not_exists=True,
+    )
+    op.create_table(
+        "change_log",
+        sa.Column("id", sa.BigInteger().with_variant(sa.Integer(), "sqlite"), primary_key=True),
+        sa.Column("project_id", sa.Integer(), nullable=False),
+        sa.Column("version", sa.BigInteger(), nullable=False),
+        sa.Column("entity", sa.String(length=100), nullable=False),
+        sa.Column("entity_id", sa.Integer(), nullable=False),
+        sa.Column("op", sa.String(length=10), nullable=False),
+        sa.Column("data", sa.JSON(), nullable=True),
+        sa.Column("changed_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.UniqueConstraint("project_id", "version", name="uq_change_log_project_version"),
+        if_not_exists=True,
+    )
+    op.create_index("ix_change_log_entity", "change_log", ["project_id", "entity", "entity_id"], if_not_exists=True)
+    op.create_index("ix_change_log_changed_at", "change_log", ["changed_at"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_change_log_changed_at", table_name="change_log", if_exists=True)
+    op.drop_index("ix_change_log_entity", table_name="change_log", if_exists=True)
+    op.drop_table("change_log", if_exists=True)
+    op.drop_table("project_versions", if_exists=True)
@@ -0,0 +1,28 @@
+"""user token version
+
+新增 users.token_version：权限变更（停用、角色/项目成员关系变更）时加一，
+版本小于当前值的访问令牌被拒绝。保存在数据库中，重启后仍然有效、各工作进程共享。
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "users",
+        sa.Column("token_version", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("users", "token_version")
@@ -0,0 +1,115 @@
+"""
+代理工作流回放基准（离线）
+
+先用本地假 LLM 服务录制一次 Sprint 回顾工作流（1 个收集步骤 -> N 个并行分析步骤 -> 1 个汇总步骤，
+每步调用一次代理），再用 ReplayLLM 回放：
+- original：按录制耗时回放，总耗时应接近录制时
+- zero：零延迟回放，总耗时即工作流、代理与追踪自身的开销
+零延迟回放分别在关闭和开启追踪时各运行若干次，报告每次 LLM 调用的平均开销；
+指定 --max-overhead-ms 时超过阈值以非零状态退出，可用于发现性能回退。
+
+用法:
+    python benchmarks/bench_agent_replay.py --steps 20 --latency 0.05 --max-overhead-ms 2
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+
+from scrumix.agents.agent.chat import ChatAgent
+from scrumix.agents.llm.base import BaseLLM
+from scrumix.agents.llm.fake_server import create_fake_llm_app
+from scrumix.agents.llm.openai import AzureOpenAILLM
+from scrumix.agents.llm.replay import ORIGINAL, ZERO, RecordingLLM, ReplayLLM
+from scrumix.agents.llm.scheduler import DeploymentLimits, LLMScheduler
+from scrumix.agents.utils.logger import logger
+from scrumix.agents.utils.tracing import default_tracer
+from scrumix.agents.workflows.engine import Workflow
+from scrumix.agents.workflows.store import FileTraceStore
+
+
+def build_workflow(llm: BaseLLM, steps: int) -> Workflow:
+    agent = ChatAgent(llm, name="retro")
+    workflow = Workflow("sprint_retro")
+
+    @workflow.step()
+    async def collect(params):
+        return await agent.execute(f"列出 Sprint {params['sprint']} 的主要事件")
+
+    def analysis(i: int):
+        async def analyze(params, collect):
+            return await agent.execute(f"从角度 {i} 分析：{collect}")
+        return analyze
+
+    for i in range(steps):
+        workflow.step(name=f"analyze_{i}", depends_on=["collect"])(analysis(i))
+
+    @workflow.step(depends_on=[f"analyze_{i}" for i in range(steps)])
+    async def summary(params, **analyses):
+        return await agent.execute("汇总：" + " | ".join(analyses[k] for k in sorted(analyses)))
+
+    return workflow
+
+
+async def record(path: str, steps: int, latency: float) -> float:
+    app = create_fake_llm_app(latency=latency)
+    scheduler = LLMScheduler(DeploymentLimits(max_concurrency=steps, tokens_per_minute=10 ** 9))
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://fake-llm") as client:
+        llm = AzureOpenAILLM("retro", endpoint="http://fake-llm", scheduler=scheduler, http_client=client)
+        started = time.perf_counter()
+        await build_workflow(RecordingLLM(llm, path), steps).run({"sprint": 7})
+        return time.perf_counter() - started
+
+
+async def replay(path: str, steps: int, latency: str) -> float:
+    workflow = build_workflow(ReplayLLM(path, latency=latency), steps)
+    started = time.perf_counter()
+    await workflow.run({"sprint": 7})
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=20, help="并行分析步骤数")
+    parser.add_argument("--latency", type=float, default=0.05, help="录制时假 LLM 的单次延迟（秒）")
+    parser.add_argument("--repeat", type=int, default=20, help="零延迟回放的运行次数")
+    parser.add_argument("--max-overhead-ms", type=float, default=None, help="每次 LLM 调用的开销上限")
+    args = parser.parse_args()
+    calls = args.steps + 2
+    # 每次代理调用的提示词统计日志会干扰计时
+    logger.setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "retro.jsonl")
+        recorded = asyncio.run(record(path, args.steps, args.latency))
+        original = asyncio.run(replay(path, args.steps, ORIGINAL))
+
+        rows = [("录制", recorded), ("回放 original", original)]
+        overheads = {}
+        for label, store in (("回放 zero", None), ("回放 zero+追踪", FileTraceStore(os.path.join(tmp, "traces")))):
+            default_tracer.configure(store)
+            timings = [asyncio.run(replay(path, args.steps, ZERO)) for _ in range(args.repeat)]
+            overheads[label] = statistics.median(timings) / calls * 1000
+            rows.append((label, statistics.median(timings)))
+        default_tracer.configure(None)
+
+    print(f"LLM 调用 {calls} 次/运行")
+    print(f"{'模式':<16}{'耗时(ms)':>10}{'每次调用(ms)':>14}")
+    for label, elapsed in rows:
+        print(f"{label:<16}{elapsed * 1000:>10.1f}{elapsed / calls * 1000:>14.3f}")
+
+    if args.max_overhead_ms is not None:
+        worst = max(overheads.values())
+        if worst > args.max_overhead_ms:
+            print(f"\n每次调用开销 {worst:.3f} ms 超过阈值 {args.max_overhead_ms} ms")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+认证依赖开销微基准
+
+测量 get_token_data（校验访问令牌的 FastAPI 依赖）单次调用耗时：
+- 冷路径：每次清空缓存，完整解码并验签
+- 热路径：同一令牌重复请求，命中已验证令牌缓存
+分别在 HS256 与 ES256 下测量。
+
+用法:
+    python benchmarks/bench_auth_dependency.py --iterations 20000
+"""
+import argparse
+import asyncio
+import time
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from fastapi.security import HTTPAuthorizationCredentials
+
+from scrumix.api.core.config import settings
+from scrumix.api.core.security import create_access_token, get_token_data, token_cache
+
+
+def generate_es256_keys():
+    """生成临时 P-256 密钥对（PEM）"""
+    private_key = ec.generate_private_key(ec.SECP256R1())
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode()
+    return private_pem, public_pem
+
+
+async def measure(token: str, iterations: int, cold: bool) -> float:
+    """返回单次调用平均耗时（微秒）"""
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    await get_token_data(credentials)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        if cold:
+            token_cache.clear()
+        await get_token_data(credentials)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20_000)
+    args = parser.parse_args()
+
+    private_pem, public_pem = generate_es256_keys()
+    claims = {"sub": "1", "email": "bench@example.com", "scopes": ["user"], "prj": {"1": 7, "2": 1}}
+
+    print(f"{'算法':<10}{'冷路径(µs)':>14}{'缓存命中(µs)':>16}{'加速比':>10}")
+    for algorithm in ("HS256", "ES256"):
+        settings.JWT_ALGORITHM = algorithm
+        settings.JWT_PRIVATE_KEY, settings.JWT_PUBLIC_KEY = (private_pem, public_pem) \
+            if algorithm == "ES256" else ("", "")
+        token = create_access_token(claims)
+        cold_iterations = max(args.iterations // 10, 100)
+        cold_us = asyncio.run(measure(token, cold_iterations, cold=True))
+        token_cache.clear()
+        warm_us = asyncio.run(measure(token, args.iterations, cold=False))
+        print(f"{algorithm:<10}{cold_us:>14.1f}{warm_us:>16.1f}{cold_us / warm_us:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
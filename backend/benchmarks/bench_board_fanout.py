@@ -0,0 +1,154 @@
+"""
+看板推送扇出基准（离线）
+
+在进程内创建 BoardHub（进程内广播），按项目频道订阅大量连接（默认 10000 个，分布在若干项目中），
+每个订阅一个消费任务模拟 WebSocket 发送循环；其中一部分为慢连接（每条消息额外等待）。
+以固定速率发布看板事件（部分事件带 key，模拟同一卡片的重复移动），报告：
+- 每次 publish 的扇出耗时
+- 快连接从发布到取出的延迟（中位数 / p99 / 最大）
+- 慢连接的合并、丢弃与 resync 次数，以及结束时的积压
+指定 --max-p99-ms 时，快连接 p99 延迟超过阈值以非零状态退出。
+
+用法:
+    python benchmarks/bench_board_fanout.py --subscribers 10000 --projects 100 --events 2000 --rate 200
+"""
+import argparse
+import asyncio
+import logging
+import random
+import resource
+import statistics
+import sys
+import time
+
+from scrumix.agents.utils.logger import logger
+from scrumix.api.core.realtime import RESYNC, BoardHub, MemoryBroadcast
+
+
+async def consume(subscription, published: dict, latencies: list, slow_delay: float, counters: dict) -> None:
+    while not subscription.closed:
+        messages = await subscription.get()
+        received = time.perf_counter()
+        for message in messages:
+            started = published.get(id(message))
+            if started is None:
+                if RESYNC in message[:20]:
+                    counters["resyncs"] += 1
+                continue
+            if slow_delay:
+                await asyncio.sleep(slow_delay)
+            else:
+                latencies.append(received - started)
+
+
+async def run(args) -> dict:
+    hub = BoardHub(MemoryBroadcast(), queue_size=args.queue_size)
+    await hub.start()
+    rng = random.Random(0)
+    published: dict = {}
+    keep_alive = []
+    latencies: list = []
+    counters = {"resyncs": 0}
+
+    subscriptions = []
+    consumers = []
+    slow_count = int(args.subscribers * args.slow_fraction)
+    for i in range(args.subscribers):
+        subscription = hub.subscribe(i % args.projects, user_id=i)
+        subscriptions.append(subscription)
+        slow = i < slow_count
+        consumers.append(asyncio.create_task(consume(
+            subscription, published, latencies, args.slow_delay_ms / 1000 if slow else 0.0, counters
+        )))
+    await asyncio.sleep(0)
+
+    # 在投递处记录每条消息的发布时间（按消息对象 id，消费端无需解析 JSON）
+    deliver = hub._deliver
+
+    def timed_deliver(project_id, key, message):
+        published[id(message)] = time.perf_counter()
+        keep_alive.append(message)
+        deliver(project_id, key, message)
+
+    hub.backend._deliver = timed_deliver
+
+    publish_costs = []
+    interval = 1.0 / args.rate if args.rate else 0.0
+    started = time.perf_counter()
+    for n in range(args.events):
+        project_id = n % args.projects
+        item = rng.randrange(args.items)
+        key = f"item:{item}" if rng.random() < args.keyed_fraction else None
+        begin = time.perf_counter()
+        hub.publish(project_id, "item.moved", {"id": item, "status": "in_progress", "n": n}, key=key)
+        publish_costs.append(time.perf_counter() - begin)
+        # 按目标速率发布；期间让出事件循环给消费任务
+        delay = started + (n + 1) * interval - time.perf_counter()
+        await asyncio.sleep(max(0.0, delay))
+    elapsed = time.perf_counter() - started
+    # 等待快连接取完
+    await asyncio.sleep(0.2)
+
+    stats = hub.stats()
+    slow = subscriptions[:slow_count]
+    for task in consumers:
+        task.cancel()
+    await asyncio.gather(*consumers, return_exceptions=True)
+    await hub.stop()
+    return {
+        "elapsed": elapsed,
+        "publish_costs": publish_costs,
+        "latencies": latencies,
+        "resyncs": counters["resyncs"],
+        "slow_coalesced": sum(s.coalesced for s in slow),
+        "slow_dropped": sum(s.dropped for s in slow),
+        "pending": stats["pending"],
+    }
+
+
+def percentile(values: list, pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] if values else 0.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, default=10_000, help="订阅连接数")
+    parser.add_argument("--projects", type=int, default=100, help="项目频道数（订阅均匀分布）")
+    parser.add_argument("--events", type=int, default=2000, help="发布的事件数")
+    parser.add_argument("--rate", type=float, default=200.0, help="每秒发布的事件数（0 表示不限速）")
+    parser.add_argument("--items", type=int, default=50, help="卡片数（带 key 的事件按卡片合并）")
+    parser.add_argument("--keyed-fraction", type=float, default=0.8, help="带 key 的事件比例")
+    parser.add_argument("--slow-fraction", type=float, default=0.05, help="慢连接比例")
+    parser.add_argument("--slow-delay-ms", type=float, default=1000.0, help="慢连接每条消息的额外耗时（模拟网络阻塞）")
+    parser.add_argument("--queue-size", type=int, default=16, help="每个连接的发送队列长度")
+    parser.add_argument("--max-p99-ms", type=float, default=None, help="快连接 p99 延迟上限")
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)
+
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result = asyncio.run(run(args))
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    costs = result["publish_costs"]
+    latencies = result["latencies"]
+    per_channel = args.subscribers / args.projects
+    print(f"{args.subscribers} 个订阅 / {args.projects} 个项目（每频道约 {per_channel:.0f} 个），"
+          f"{args.events} 个事件，用时 {result['elapsed']:.2f}s")
+    print(f"publish 扇出耗时: 平均 {statistics.mean(costs) * 1e6:.0f}us，"
+          f"p99 {percentile(costs, 99) * 1e6:.0f}us（每个订阅 {statistics.mean(costs) / per_channel * 1e9:.0f}ns）")
+    print(f"快连接延迟（{len(latencies)} 条）: 中位数 {percentile(latencies, 50) * 1000:.2f}ms，"
+          f"p99 {percentile(latencies, 99) * 1000:.2f}ms，最大 {max(latencies, default=0) * 1000:.2f}ms")
+    print(f"慢连接: 合并 {result['slow_coalesced']}，丢弃 {result['slow_dropped']}，"
+          f"resync {result['resyncs']}，结束时积压 {result['pending']}")
+    print(f"峰值内存增长约 {(after - before) / 1024:.1f} MB")
+
+    if args.max_p99_ms is not None:
+        p99 = percentile(latencies, 99) * 1000
+        if p99 > args.max_p99_ms:
+            print(f"\n快连接 p99 延迟 {p99:.2f}ms 超过阈值 {args.max_p99_ms}ms")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
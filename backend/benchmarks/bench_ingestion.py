@@ -0,0 +1,91 @@
+"""
+增量嵌入管道基准（离线，使用本地假 LLM 服务）
+
+生成一批合成文档后依次测量：
+- 全量写入（即每次变更都全部重新嵌入的朴素做法的成本）
+- 无变更时重新写入
+- 修改 1% 的文档（各改一个段落）后重新写入
+报告嵌入的块数、嵌入请求数、估算token数与耗时。
+
+用法:
+    python benchmarks/bench_ingestion.py --documents 5000 --latency 0.05
+"""
+import argparse
+import asyncio
+import random
+import shutil
+import tempfile
+
+import httpx
+
+from scrumix.agents.llm.fake_server import EMBEDDING_DIM, create_fake_llm_app
+from scrumix.agents.llm.openai import AzureOpenAILLM
+from scrumix.agents.llm.scheduler import DeploymentLimits, LLMScheduler
+from scrumix.agents.memory.ingest import Document, IngestionPipeline
+from scrumix.agents.memory.vector_store import VectorStore
+
+VOCABULARY = [f"w{i}" for i in range(5_000)]
+
+
+def paragraph(rng: random.Random) -> str:
+    return " ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(20, 80))) + "."
+
+
+def make_corpus(count: int, rng: random.Random):
+    return {
+        f"doc:{i}": [paragraph(rng) for _ in range(rng.randint(4, 16))]
+        for i in range(count)
+    }
+
+
+def documents(corpus):
+    return [
+        Document(source_id, "\n\n".join(paragraphs), project_id=int(source_id.split(":")[1]) % 10)
+        for source_id, paragraphs in corpus.items()
+    ]
+
+
+async def run(args) -> None:
+    rng = random.Random(args.seed)
+    corpus = make_corpus(args.documents, rng)
+    app = create_fake_llm_app(latency=args.latency)
+    scheduler = LLMScheduler(DeploymentLimits(max_concurrency=args.concurrency, tokens_per_minute=10 ** 9))
+    path = tempfile.mkdtemp(prefix="bench_ingestion_")
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://fake-llm") as client:
+            llm = AzureOpenAILLM("chat", endpoint="http://fake-llm", scheduler=scheduler, http_client=client,
+                                 embedding_deployment="embed")
+            pipeline = IngestionPipeline(VectorStore(path, EMBEDDING_DIM), llm, concurrency=args.concurrency)
+
+            print(f"{'场景':<14}{'块数':>8}{'嵌入块':>8}{'跳过':>8}{'删除':>6}{'请求':>6}{'tokens':>10}{'耗时(s)':>10}")
+
+            async def measure(name: str):
+                before = app.state.embedding_requests
+                stats = await pipeline.ingest(documents(corpus))
+                print(
+                    f"{name:<14}{stats.chunks:>8}{stats.embedded:>8}{stats.skipped:>8}{stats.deleted:>6}"
+                    f"{app.state.embedding_requests - before:>6}{stats.embedded_tokens:>10}{stats.elapsed:>10.2f}"
+                )
+
+            await measure("全量写入")
+            await measure("无变更")
+            edited = rng.sample(sorted(corpus), max(1, args.documents // 100))
+            for source_id in edited:
+                paragraphs = corpus[source_id]
+                paragraphs[rng.randrange(len(paragraphs))] = paragraph(rng)
+            await measure("修改1%文档")
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=5_000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+LLM 响应缓存基准（离线，使用本地假 LLM 服务）
+
+模拟多个用户并发请求少量相同的摘要提示词，对比无缓存与 CachedLLM
+的上游调用次数、总耗时、命中率和节省的token数。
+
+用法:
+    python benchmarks/bench_llm_cache.py --users 50 --prompts 5 --rounds 4
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import httpx
+
+from scrumix.agents.llm.cache import CachedLLM
+from scrumix.agents.llm.fake_server import create_fake_llm_app
+from scrumix.agents.llm.openai import AzureOpenAILLM
+from scrumix.agents.llm.scheduler import DeploymentLimits, LLMScheduler
+
+
+async def run(users: int, prompts: int, rounds: int, latency: float, cached: bool, path: str):
+    app = create_fake_llm_app(latency=latency)
+    scheduler = LLMScheduler(DeploymentLimits(max_concurrency=8, tokens_per_minute=100_000_000))
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://fake-llm") as client:
+        llm = AzureOpenAILLM("bench", endpoint="http://fake-llm", scheduler=scheduler, http_client=client)
+        if cached:
+            llm = CachedLLM(llm, path=path)
+        start = time.perf_counter()
+        for _ in range(rounds):
+            await asyncio.gather(*(
+                llm.generate(f"总结 Sprint {i % prompts} 的燃尽图", max_tokens=64) for i in range(users)
+            ))
+        elapsed = time.perf_counter() - start
+    stats = llm.stats.as_dict() if cached else None
+    return elapsed, app.state.requests, stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--prompts", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "llm_cache.sqlite3")
+        base_elapsed, base_calls, _ = asyncio.run(
+            run(args.users, args.prompts, args.rounds, args.latency, False, path)
+        )
+        elapsed, calls, stats = asyncio.run(run(args.users, args.prompts, args.rounds, args.latency, True, path))
+
+    print(f"{'':<10}{'上游调用':>10}{'总耗时(s)':>12}")
+    print(f"{'无缓存':<10}{base_calls:>10}{base_elapsed:>12.2f}")
+    print(f"{'CachedLLM':<10}{calls:>10}{elapsed:>12.2f}")
+    print(f"\n命中率 {stats['hit_rate']:.1%}，合并并发请求 {stats['coalesced']} 次，节省约 {stats['tokens_saved']} tokens")
+
+
+if __name__ == "__main__":
+    main()
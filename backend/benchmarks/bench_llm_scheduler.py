@@ -0,0 +1,53 @@
+"""
+LLM 调度器基准（离线，使用本地假 LLM 服务）
+
+并发发出一批请求，对比不同并发上限下的总耗时，
+并分别报告排队等待时间与模型延迟；可注入 429 检验重试。
+
+用法:
+    python benchmarks/bench_llm_scheduler.py --requests 200 --latency 0.05 --failure-rate 0.1
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from scrumix.agents.llm.fake_server import create_fake_llm_app
+from scrumix.agents.llm.openai import AzureOpenAILLM
+from scrumix.agents.llm.scheduler import DeploymentLimits, LLMScheduler
+
+
+async def run(requests: int, concurrency: int, latency: float, failure_rate: float, tpm: int):
+    app = create_fake_llm_app(latency=latency, failure_rate=failure_rate, retry_after=0.01, seed=0)
+    scheduler = LLMScheduler()
+    scheduler.configure("bench", DeploymentLimits(max_concurrency=concurrency, tokens_per_minute=tpm))
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://fake-llm") as client:
+        llm = AzureOpenAILLM("bench", endpoint="http://fake-llm", scheduler=scheduler, http_client=client)
+        start = time.perf_counter()
+        await asyncio.gather(*(llm.generate(f"任务 {i}", max_tokens=32) for i in range(requests)))
+        elapsed = time.perf_counter() - start
+    return elapsed, scheduler.stats("bench")["bench"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--failure-rate", type=float, default=0.1)
+    parser.add_argument("--tpm", type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    print(f"{'并发上限':<10}{'总耗时(s)':>10}{'排队均值(ms)':>14}{'延迟均值(ms)':>14}{'重试':>8}{'失败':>6}")
+    for concurrency in (1, 4, 16, 64):
+        elapsed, stats = asyncio.run(
+            run(args.requests, concurrency, args.latency, args.failure_rate, args.tpm)
+        )
+        print(
+            f"{concurrency:<10}{elapsed:>10.2f}{stats['queue_wait_avg'] * 1000:>14.1f}"
+            f"{stats['latency_avg'] * 1000:>14.1f}{stats['retries']:>8}{stats['failures']:>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+请求追踪开销基准（离线）
+
+用进程内的 FastAPI 应用（TracingMiddleware + 已插桩的 SQLite 引擎）模拟一个典型接口：
+每个请求执行若干条 SQL 语句并返回 JSON。分别在以下配置下串行发送请求，比较每个请求的平均耗时
+（后台线程按批写入轨迹文件，平均值包含批量写入期间被拖慢的请求）：
+- off：不记录轨迹（未配置存储）
+- sample=R：按比例 R 采样（默认 0.1）
+- sample=1：记录全部请求
+轨迹写入临时目录。指定 --max-overhead-pct 时，采样配置的开销超过阈值以非零状态退出。
+
+用法:
+    python benchmarks/bench_request_tracing.py --requests 2000 --statements 5 --max-overhead-pct 3
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from scrumix.agents.utils.logger import logger
+from scrumix.agents.utils.tracing import default_tracer
+from scrumix.agents.workflows.store import FileTraceStore
+from scrumix.api.core.middleware import TracingMiddleware
+from scrumix.api.db.tracing import instrument_engine
+
+
+def build_app(statements: int) -> FastAPI:
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    instrument_engine(engine)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, project_id INTEGER, title TEXT)"))
+        conn.execute(
+            text("INSERT INTO items (project_id, title) VALUES (:p, :t)"),
+            [{"p": i % 10, "t": f"item {i}"} for i in range(1000)],
+        )
+
+    app = FastAPI()
+    app.add_middleware(TracingMiddleware)
+
+    @app.get("/projects/{project_id}/items")
+    async def list_items(project_id: int):
+        rows = []
+        with engine.connect() as conn:
+            for _ in range(statements):
+                rows = conn.execute(
+                    text("SELECT id, title FROM items WHERE project_id = :p LIMIT 20"), {"p": project_id}
+                ).all()
+        return [{"id": r[0], "title": r[1]} for r in rows]
+
+    return app
+
+
+async def run(app: FastAPI, requests: int) -> list:
+    timings = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for i in range(requests):
+            started = time.perf_counter()
+            response = await client.get(f"/projects/{i % 10}/items")
+            timings.append(time.perf_counter() - started)
+            response.raise_for_status()
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000, help="每种配置的请求数")
+    parser.add_argument("--rounds", type=int, default=5, help="交替运行的轮数")
+    parser.add_argument("--statements", type=int, default=5, help="每个请求执行的 SQL 语句数")
+    parser.add_argument("--sample-rate", type=float, default=0.1, help="采样配置的采样比例")
+    parser.add_argument("--max-overhead-pct", type=float, default=None, help="采样配置相对 off 的开销上限（%%）")
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)
+
+    app = build_app(args.statements)
+    # 预热
+    asyncio.run(run(app, 100))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = FileTraceStore(tmp)
+        configs = (
+            ("off", None, 1.0),
+            (f"sample={args.sample_rate:g}", store, args.sample_rate),
+            ("sample=1", store, 1.0),
+        )
+        # 各配置交替运行多轮，减少机器负载波动的影响
+        timings = {label: [] for label, _, _ in configs}
+        for _ in range(args.rounds):
+            for label, configured, rate in configs:
+                default_tracer.configure(configured, sample_rate=rate)
+                timings[label].extend(asyncio.run(run(app, args.requests // args.rounds)))
+        default_tracer.flush()
+        saved = len(store.list_runs(limit=10 ** 9))
+        default_tracer.configure(None)
+    rows = [(label, statistics.mean(timings[label]), statistics.median(timings[label])) for label, _, _ in configs]
+
+    baseline = rows[0][1]
+    print(f"{args.requests} 请求/配置，每请求 {args.statements} 条 SQL，已写入轨迹 {saved} 条")
+    print(f"{'配置':<14}{'平均(ms)':>10}{'中位数(ms)':>12}{'开销':>10}")
+    for label, mean, median in rows:
+        print(f"{label:<14}{mean * 1000:>10.3f}{median * 1000:>12.3f}{(mean / baseline - 1) * 100:>9.1f}%")
+
+    if args.max_overhead_pct is not None:
+        overhead = (rows[1][1] / baseline - 1) * 100
+        if overhead > args.max_overhead_pct:
+            print(f"\n采样配置开销 {overhead:.1f}% 超过阈值 {args.max_overhead_pct}%")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
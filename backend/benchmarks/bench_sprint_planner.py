@@ -0,0 +1,107 @@
+"""
+Sprint 规划优化器基准
+
+对不同规模的合成 backlog（随机故事点、优先级、约 30% 条目有前置依赖）测量 plan_sprint 的耗时，
+并与忽略依赖和成员划分的单背包动态规划最优值（上界）比较，报告达到上界的比例。
+另测两种极端形状：一条 --shape-size 个条目的依赖长链，以及 --wide-members 个成员的大团队。
+
+用法:
+    python benchmarks/bench_sprint_planner.py --sizes 1000 10000 50000 --members 8 --capacity 20
+    python benchmarks/bench_sprint_planner.py --sizes --shape-size 10000 --wide-members 500
+"""
+import argparse
+import random
+import statistics
+import time
+
+import numpy as np
+
+from scrumix.agents.plan.optimizer import PlanItem, TeamMember, plan_sprint, priority_value
+
+POINTS = [1, 2, 3, 5, 8, 13]
+PRIORITIES = ["low", "medium", "high", "critical"]
+
+
+def make_backlog(size: int, rng: random.Random, dependency_rate: float):
+    return [
+        PlanItem(
+            id=i,
+            story_points=rng.choice(POINTS),
+            priority=rng.choice(PRIORITIES),
+            depends_on=[rng.randrange(i)] if i and rng.random() < dependency_rate else [],
+        )
+        for i in range(size)
+    ]
+
+
+def make_chain(size: int, rng: random.Random):
+    """每个条目依赖前一个条目"""
+    return [
+        PlanItem(id=i, story_points=rng.choice(POINTS), priority=rng.choice(PRIORITIES), depends_on=[i - 1] if i else [])
+        for i in range(size)
+    ]
+
+
+def time_plan(items, members, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        plan = plan_sprint(items, members)
+        timings.append((time.perf_counter() - started) * 1000)
+    return plan, timings
+
+
+def knapsack_bound(items, capacity: int) -> float:
+    """单背包 0/1 动态规划（忽略依赖与成员划分）的最优值"""
+    best = np.zeros(capacity + 1)
+    for item in items:
+        w = int(item.story_points)
+        if w <= capacity:
+            best[w:] = np.maximum(best[w:], best[:capacity + 1 - w] + priority_value(item.priority))
+    return float(best[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="*", default=[100, 1_000, 10_000, 50_000])
+    parser.add_argument("--members", type=int, default=8)
+    parser.add_argument("--capacity", type=int, default=20, help="每个成员的故事点容量")
+    parser.add_argument("--dependency-rate", type=float, default=0.3)
+    parser.add_argument("--shape-size", type=int, default=10_000, help="长链与大团队形状的条目数（0 表示不测）")
+    parser.add_argument("--wide-members", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    members = [TeamMember(user_id=u, capacity=args.capacity) for u in range(args.members)]
+    print(f"{'条目数':>8}{'中位(ms)':>10}{'最大(ms)':>10}{'选中':>6}{'故事点':>8}{'价值':>8}{'上界':>8}{'比例':>8}")
+    for size in args.sizes:
+        items = make_backlog(size, rng, args.dependency_rate)
+        plan, timings = time_plan(items, members, args.repeat)
+        bound = knapsack_bound(items, args.members * args.capacity)
+        print(
+            f"{size:>8}{statistics.median(timings):>10.1f}{max(timings):>10.1f}{len(plan.assignments):>6}"
+            f"{plan.total_points:>8.0f}{plan.total_value:>8.0f}{bound:>8.0f}{plan.total_value / bound:>8.1%}"
+        )
+
+    if not args.shape_size:
+        return
+    size = args.shape_size
+    # 长链容量足够选中全部条目，每次选中都会解除一个下游条目的阻塞
+    chain = make_chain(size, rng)
+    chain_members = [TeamMember(user_id=0, capacity=sum(item.story_points for item in chain))]
+    wide_members = [TeamMember(user_id=u, capacity=args.capacity) for u in range(args.wide_members)]
+    shapes = [
+        (f"长链 x{size}", chain, chain_members),
+        (f"{args.wide_members} 成员 x{size}", make_backlog(size, rng, args.dependency_rate), wide_members),
+    ]
+    print()
+    print(f"{'形状':<16}{'中位(ms)':>10}{'最大(ms)':>10}{'选中':>8}")
+    for name, items, shape_members in shapes:
+        plan, timings = time_plan(items, shape_members, args.repeat)
+        print(f"{name:<16}{statistics.median(timings):>10.1f}{max(timings):>10.1f}{len(plan.assignments):>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+管理员用户搜索基准测试
+
+生成合成用户数据，对比：
+- 现状：通过列表接口拉取整张用户表，在客户端按子串过滤
+- 索引搜索：user_search_crud.search_users（PostgreSQL pg_trgm / SQLite FTS5）
+
+PostgreSQL 需要先执行 alembic upgrade head 创建 trigram 索引。
+
+用法:
+    python benchmarks/bench_user_search.py --users 1000000
+    python benchmarks/bench_user_search.py --database-url postgresql://... --users 1000000
+"""
+import argparse
+import random
+import statistics
+import string
+import time
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from scrumix.api.crud.user_search import user_search_crud
+from scrumix.api.db.base import Base
+from scrumix.api.models.user import User
+
+FIRST_NAMES = ["alice", "bob", "carol", "dave", "erin", "frank", "grace", "heidi", "ivan", "judy"]
+LAST_NAMES = ["smith", "zhang", "wang", "müller", "garcia", "kim", "nguyen", "rossi", "ivanov", "tanaka"]
+QUERIES = ["zhang", "alice", "example", "ivan.t", "ross", "q7x"]
+
+
+def seed(engine, users: int, batch_size: int = 20_000) -> None:
+    """批量插入合成用户"""
+    rnd = random.Random(42)
+    with engine.begin() as conn:
+        for start in range(0, users, batch_size):
+            rows = []
+            for i in range(start, min(start + batch_size, users)):
+                first, last = rnd.choice(FIRST_NAMES), rnd.choice(LAST_NAMES)
+                suffix = "".join(rnd.choices(string.ascii_lowercase + string.digits, k=4))
+                rows.append({
+                    "email": f"{first}.{last}{i}@example.com",
+                    "username": f"{first[:3]}{last[:3]}{suffix}{i}",
+                    "full_name": f"{first.title()} {last.title()}",
+                    "is_active": True,
+                })
+            conn.execute(insert(User), rows)
+
+
+def scan_search(db, q: str, limit: int):
+    """对照组（现状）：拉取整张用户表后在客户端过滤"""
+    rows = db.execute(select(User.id, User.email, User.username, User.full_name)).all()
+    matches = [
+        row for row in rows
+        if any(q in (value or "").lower() for value in row[1:])
+    ]
+    return matches[:limit]
+
+
+def timeit(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite:///./bench_user_search.db")
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="保留生成的数据")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    start = time.perf_counter()
+    seed(engine, args.users)
+    print(f"生成 {args.users} 个用户耗时 {time.perf_counter() - start:.1f}s ({engine.dialect.name})")
+
+    db = sessionmaker(bind=engine)()
+    print(f"{'查询':<12}{'全表(ms)':>12}{'索引(ms)':>12}{'第2页(ms)':>12}{'命中':>8}")
+    for q in QUERIES:
+        scan_ms = timeit(lambda: scan_search(db, q, args.limit), args.repeat)
+        users, cursor = user_search_crud.search_users(db, q, limit=args.limit)
+        search_ms = timeit(lambda: user_search_crud.search_users(db, q, limit=args.limit), args.repeat)
+        page2_ms = timeit(lambda: user_search_crud.search_users(db, q, limit=args.limit, cursor=cursor), args.repeat) \
+            if cursor else 0.0
+        print(f"{q:<12}{scan_ms:>12.2f}{search_ms:>12.2f}{page2_ms:>12.2f}{len(users):>8}")
+        db.expunge_all()
+
+    db.close()
+    if not args.keep:
+        Base.metadata.drop_all(engine)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+会话列表与会话变更基准测试
+
+对比拥有数千个会话的用户：
+- 列表：加载完整 UserSession ORM 对象 vs 只投影响应所需列
+- 撤销：加载整行再修改 vs 单条 UPDATE ... WHERE id AND user_id
+
+用法:
+    python benchmarks/bench_user_sessions.py --sessions 5000
+    python benchmarks/bench_user_sessions.py --database-url postgresql://...
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List
+
+from sqlalchemy import and_, create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from scrumix.api.crud.user import session_crud
+from scrumix.api.db.base import Base
+from scrumix.api.models.user import User, UserSession
+from scrumix.api.schemas.user import UserSessionResponse
+
+
+def seed(db, users: int, sessions_per_user: int) -> List[int]:
+    """每个用户生成 sessions_per_user 个活跃会话，device_info 为约1KB文本"""
+    now = datetime.now()
+    device_info = "x" * 1024
+    user_ids = []
+    for u in range(users):
+        user = User(email=f"bench{u}@example.com", username=f"bench{u}")
+        db.add(user)
+        db.flush()
+        user_ids.append(user.id)
+        db.bulk_insert_mappings(UserSession, [
+            {
+                "user_id": user.id,
+                "session_token": f"{u}-{i}",
+                "user_agent": "Mozilla/5.0 (benchmark)",
+                "ip_address": "127.0.0.1",
+                "device_info": device_info,
+                "is_active": True,
+                "expires_at": now + timedelta(days=7),
+                "last_activity_at": now - timedelta(seconds=i),
+            }
+            for i in range(sessions_per_user)
+        ])
+    db.commit()
+    return user_ids
+
+
+def orm_list(db, user_id: int):
+    """原实现：加载完整ORM对象后序列化"""
+    sessions = db.query(UserSession).filter(
+        and_(
+            UserSession.user_id == user_id,
+            UserSession.is_active == True,
+            UserSession.expires_at > datetime.now()
+        )
+    ).order_by(UserSession.last_activity_at.desc()).all()
+    result = [UserSessionResponse.model_validate(s) for s in sessions]
+    db.expunge_all()
+    return result
+
+
+def projected_list(db, user_id: int):
+    """投影查询后序列化"""
+    return [UserSessionResponse.model_validate(r) for r in session_crud.get_user_sessions(db, user_id)]
+
+
+def orm_deactivate(db, session_id: int, user_id: int) -> bool:
+    """原实现：先加载整行再修改"""
+    session = db.query(UserSession).filter(UserSession.id == session_id).first()
+    if not session or session.user_id != user_id:
+        return False
+    session.is_active = False
+    db.commit()
+    return True
+
+
+def timeit(fn: Callable, repeat: int) -> float:
+    """返回中位数耗时（毫秒）"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite://")
+    parser.add_argument("--users", type=int, default=3)
+    parser.add_argument("--sessions", type=int, default=5000, help="每个用户的会话数")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    kwargs = {"poolclass": StaticPool, "connect_args": {"check_same_thread": False}} \
+        if args.database_url.startswith("sqlite") else {}
+    engine = create_engine(args.database_url, **kwargs)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+
+    user_ids = seed(db, args.users, args.sessions)
+    user_id = user_ids[0]
+    session_ids = [sid for (sid,) in db.query(UserSession.id).filter(UserSession.user_id == user_id)]
+
+    print(f"用户数={args.users} 每用户会话数={args.sessions} 重复={args.repeat}")
+    print(f"{'操作':<24}{'ORM(ms)':>12}{'优化后(ms)':>14}{'加速比':>10}")
+
+    orm_ms = timeit(lambda: orm_list(db, user_id), args.repeat)
+    proj_ms = timeit(lambda: projected_list(db, user_id), args.repeat)
+    print(f"{'list sessions':<24}{orm_ms:>12.2f}{proj_ms:>14.2f}{orm_ms / proj_ms:>9.1f}x")
+
+    ids = iter(session_ids)
+    orm_ms = timeit(lambda: orm_deactivate(db, next(ids), user_id), args.repeat)
+    proj_ms = timeit(lambda: session_crud.deactivate_session(db, next(ids), user_id), args.repeat)
+    print(f"{'revoke session':<24}{orm_ms:>12.2f}{proj_ms:>14.2f}{orm_ms / proj_ms:>9.1f}x")
+
+    db.close()
+    Base.metadata.drop_all(engine)
+
+
+if __name__ == "__main__":
+    main()
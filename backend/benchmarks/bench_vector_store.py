@@ -0,0 +1,106 @@
+"""
+向量记忆存储基准
+
+在合成的聚簇向量（模拟文档嵌入）上测量：
+- 暴力检索与 IVF 检索的单次查询延迟（中位数）
+- IVF 的 recall@k（以暴力检索结果为真值）
+- 索引训练耗时，以及增量添加 / 删除的耗时
+
+用法:
+    python benchmarks/bench_vector_store.py --sizes 10000,100000,1000000 --dim 128
+"""
+import argparse
+import shutil
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from scrumix.agents.memory.vector_store import VectorStore, normalize
+
+ADD_BATCH_SIZE = 100_000
+
+
+def synthetic_vectors(n: int, centers: np.ndarray, rng: np.random.Generator, noise: float = 0.5) -> np.ndarray:
+    """围绕给定中心的聚簇向量，noise 为噪声向量的期望范数"""
+    dim = centers.shape[1]
+    labels = rng.integers(0, len(centers), n)
+    return normalize(centers[labels] + rng.normal(scale=noise / np.sqrt(dim), size=(n, dim)).astype(np.float32))
+
+
+def median_ms(fn, queries) -> float:
+    timings = []
+    for q in queries:
+        start = time.perf_counter()
+        fn(q)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def run(n: int, dim: int, queries: int, k: int, nprobe: int, seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    path = tempfile.mkdtemp(prefix="bench_vector_store_")
+    try:
+        centers = normalize(rng.normal(size=(max(16, n // 100), dim)))
+        store = VectorStore(path, dim, ivf_threshold=n + 1)
+        start = time.perf_counter()
+        for offset in range(0, n, ADD_BATCH_SIZE):
+            count = min(ADD_BATCH_SIZE, n - offset)
+            store.add(
+                [str(i) for i in range(offset, offset + count)],
+                synthetic_vectors(count, centers, rng),
+                project_ids=rng.integers(0, 100, count).tolist(),
+            )
+        load_s = time.perf_counter() - start
+
+        probes = synthetic_vectors(queries, centers, rng)
+        truth = [{m.id for m in store.search(q, k)} for q in probes]
+        brute_ms = median_ms(lambda q: store.search(q, k), probes)
+        project_ms = median_ms(lambda q: store.search(q, k, project_id=7), probes)
+
+        start = time.perf_counter()
+        store.build_index()
+        build_s = time.perf_counter() - start
+        ivf_ms = median_ms(lambda q: store.search(q, k, nprobe=nprobe), probes)
+        recall = statistics.mean(
+            len(truth[i] & {m.id for m in store.search(q, k, nprobe=nprobe)}) / k for i, q in enumerate(probes)
+        )
+
+        extra = synthetic_vectors(1_000, centers, rng)
+        start = time.perf_counter()
+        store.add([f"new-{i}" for i in range(1_000)], extra)
+        add_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        store.delete([str(i) for i in range(1_000)])
+        delete_ms = (time.perf_counter() - start) * 1000
+        store.close()
+
+        print(
+            f"{n:>10,}{load_s:>9.1f}{brute_ms:>11.2f}{project_ms:>11.2f}{build_s:>9.1f}"
+            f"{ivf_ms:>10.2f}{recall:>10.3f}{add_ms:>11.1f}{delete_ms:>11.1f}"
+        )
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(
+        f"{'向量数':>10}{'写入(s)':>9}{'暴力(ms)':>11}{'项目内(ms)':>11}{'训练(s)':>9}"
+        f"{'IVF(ms)':>10}{'recall':>10}{'+1k(ms)':>11}{'-1k(ms)':>11}"
+    )
+    for n in (int(size) for size in args.sizes.split(",")):
+        run(n, args.dim, args.queries, args.k, args.nprobe, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,47 @@
 # 代理基类
+import functools
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from scrumix.agents.llm.usage import usage_scope
+from scrumix.agents.memory.base import BaseMemory
+from scrumix.agents.tools.registry import Tool, ToolCall, ToolRegistry, ToolResult, ToolRunCache
+from scrumix.agents.utils.tracing import default_tracer
+
+
+def _usage_scope(agent: "BaseAgent", context: Optional[Dict[str, Any]]):
+    """本次运行中的 LLM 用量计入该代理以及 context 中的 project_id / user_id"""
+    context = context or {}
+    return usage_scope(agent.name, context.get("project_id"), context.get("user_id"))
+
+
+def _traced_execute(func):
+    """为 execute 记录 agent span；最外层调用开始一条新轨迹"""
+    @functools.wraps(func)
+    async def wrapper(self, task: str, context: Dict[str, Any] = None):
+        with default_tracer.span(f"agent.{self.name}", "agent", root=True, agent=self.name, task_chars=len(task)), \
+                _usage_scope(self, context):
+            return await func(self, task, context)
+    return wrapper
+
+
+def _traced_execute_stream(func):
+    """为 execute_stream 记录 agent span，span 覆盖整个流；提前关闭时同时关闭内部流"""
+    @functools.wraps(func)
+    async def wrapper(self, task: str, context: Dict[str, Any] = None):
+        with default_tracer.span(f"agent.{self.name}", "agent", root=True, agent=self.name,
+                                 task_chars=len(task), stream=True) as span, _usage_scope(self, context):
+            chunks = func(self, task, context)
+            count = 0
+            try:
+                async for chunk in chunks:
+                    count += 1
+                    yield chunk
+            finally:
+                span.set(chunks=count)
+                await chunks.aclose()
+    return wrapper
+
 
 class BaseAgent(ABC):
     """代理基类"""
@@ -8,18 +49,37 @@ class BaseAgent(ABC):
     def __init__(self, name: str, description: str = ""):
         self.name = name
         self.description = description
-        self.tools = []
-        self.memory = None
+        self.tools = ToolRegistry()
+        self.memory: Optional[BaseMemory] = None
+    
+    def __init_subclass__(cls, **kwargs):
+        # 子类实现的 execute / execute_stream 自动记录轨迹
+        super().__init_subclass__(**kwargs)
+        if "execute" in cls.__dict__:
+            cls.execute = _traced_execute(cls.__dict__["execute"])
+        if "execute_stream" in cls.__dict__:
+            cls.execute_stream = _traced_execute_stream(cls.__dict__["execute_stream"])
     
     @abstractmethod
     async def execute(self, task: str, context: Dict[str, Any] = None) -> Any:
         """执行任务"""
         pass
     
-    def add_tool(self, tool):
-        """添加工具"""
-        self.tools.append(tool)
+    async def execute_stream(self, task: str, context: Dict[str, Any] = None) -> AsyncIterator[str]:
+        """流式执行任务，逐段产出输出；默认实现一次性产出完整结果"""
+        result = await self.execute(task, context)
+        yield result if isinstance(result, str) else str(result)
+    
+    def add_tool(self, tool, **options):
+        """添加工具；tool 为 Tool 或异步函数（参数由签名推断，options 见 Tool）"""
+        if not isinstance(tool, Tool):
+            tool = Tool.from_function(tool, **options)
+        self.tools.register(tool)
+    
+    async def call_tools(self, calls: List[ToolCall], cache: Optional[ToolRunCache] = None) -> List[ToolResult]:
+        """并发执行一轮工具调用；同一次运行内传入同一个 cache 以复用只读工具结果"""
+        return await self.tools.execute(calls, cache)
     
-    def set_memory(self, memory):
+    def set_memory(self, memory: BaseMemory):
         """设置记忆"""
         self.memory = memory 
\ No newline at end of file
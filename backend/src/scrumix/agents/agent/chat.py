@@ -0,0 +1,89 @@
+# 对话代理
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from scrumix.agents.agent.agent import BaseAgent
+from scrumix.agents.llm.base import BaseLLM
+from scrumix.agents.memory.conversation import ConversationMemory
+from scrumix.agents.prompts.packer import HISTORY_PRIORITY, ContextItem, ContextPacker, PackStats
+from scrumix.agents.prompts.tokens import MESSAGE_OVERHEAD, count_tokens
+from scrumix.agents.utils.logger import logger
+
+DEFAULT_SYSTEM_PROMPT = "You are ScrumiX, an assistant for agile Scrum teams."
+CONTEXT_HEADER = "Relevant project context:"
+
+
+class ChatAgent(BaseAgent):
+    """直接把任务交给LLM的对话代理"""
+
+    def __init__(self, llm: BaseLLM, name: str = "chat", description: str = "",
+                 system_prompt: str = DEFAULT_SYSTEM_PROMPT, max_tokens: int = 1000,
+                 packer: Optional[ContextPacker] = None):
+        super().__init__(name, description)
+        self.llm = llm
+        self.system_prompt = system_prompt
+        self.max_tokens = max_tokens
+        self.packer = packer or ContextPacker(reserve_output=max_tokens, model=getattr(llm, "model_name", None))
+
+    def build_prompt(self, task: str, context: Dict[str, Any] = None) -> Tuple[List[Dict[str, str]], PackStats]:
+        """
+        构造对话消息，并把上下文装入token预算
+        context["history"] 为此前的对话消息（可带 "summary" 字段作为放不下时的替代），
+        context["items"] 为其他候选上下文（ContextItem 列表），
+        context["memory"] 为 ConversationMemory 时以其摘要与窗口内消息代替 history
+        """
+        context = context or {}
+        history = context.get("history", [])
+        memory: Optional[ConversationMemory] = context.get("memory")
+        if memory is not None:
+            history, context["memory_stats"] = memory.context()
+        items: List[ContextItem] = [
+            ContextItem(m.get("content") or "", HISTORY_PRIORITY, i, m.get("summary"), m.get("role", "user"))
+            for i, m in enumerate(history)
+        ]
+        extra: List[ContextItem] = list(context.get("items", []))
+        fixed = sum(count_tokens(text, self.packer.model) + MESSAGE_OVERHEAD for text in (self.system_prompt, task))
+        if extra:
+            fixed += count_tokens(CONTEXT_HEADER, self.packer.model) + MESSAGE_OVERHEAD
+        packed, stats = self.packer.pack(items + extra, fixed)
+
+        extra_ids = {id(item) for item in extra}
+        messages = [{"role": "system", "content": self.system_prompt}]
+        chosen_extra = [p.text for p in packed if id(p.item) in extra_ids]
+        if chosen_extra:
+            messages.append({"role": "system", "content": "\n\n".join([CONTEXT_HEADER, *chosen_extra])})
+        messages.extend({"role": p.item.role, "content": p.text} for p in packed if id(p.item) not in extra_ids)
+        messages.append({"role": "user", "content": task})
+        return messages, stats
+
+    def build_messages(self, task: str, context: Dict[str, Any] = None) -> List[Dict[str, str]]:
+        """构造对话消息；本次的打包统计写入 context["prompt_stats"]"""
+        messages, stats = self.build_prompt(task, context)
+        if context is not None:
+            context["prompt_stats"] = stats
+        logger.info(
+            f"代理 {self.name} 提示词 {stats.prompt_tokens} tokens，节省 {stats.saved_tokens} tokens"
+            f"（摘要 {stats.summarized}，丢弃 {stats.dropped}）"
+        )
+        return messages
+
+    @staticmethod
+    def remember(context: Optional[Dict[str, Any]], task: str, reply: str) -> None:
+        """把完成的回合写入对话记忆"""
+        memory: Optional[ConversationMemory] = (context or {}).get("memory")
+        if memory is not None:
+            memory.add("user", task)
+            memory.add("assistant", reply)
+
+    async def execute(self, task: str, context: Dict[str, Any] = None) -> str:
+        """执行任务"""
+        reply = await self.llm.chat(self.build_messages(task, context), max_tokens=self.max_tokens)
+        self.remember(context, task, reply)
+        return reply
+
+    async def execute_stream(self, task: str, context: Dict[str, Any] = None) -> AsyncIterator[str]:
+        """流式执行任务；只有完整输出的回合才写入对话记忆"""
+        chunks: List[str] = []
+        async for chunk in self.llm.stream_chat(self.build_messages(task, context), max_tokens=self.max_tokens):
+            chunks.append(chunk)
+            yield chunk
+        self.remember(context, task, "".join(chunks))
@@ -1,6 +1,77 @@
 # LLM 基类
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+
+class LLMError(Exception):
+    """LLM调用失败"""
+
+
+class LLMHTTPError(LLMError):
+    """LLM接口返回错误状态码或网络错误（status_code 为 None）"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        """429、5xx 和网络错误可以重试"""
+        return self.status_code is None or self.status_code == 429 or self.status_code >= 500
+
+
+class QuotaExceededError(LLMError):
+    """项目的token配额已用尽"""
+
+    def __init__(self, project_id: int, used: int, limit: int):
+        super().__init__(f"项目 {project_id} 今日token配额已用尽（{used}/{limit}）")
+        self.project_id = project_id
+        self.used = used
+        self.limit = limit
+
+
+@dataclass(frozen=True)
+class TokenUsage:
+    """一次调用的token用量"""
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    @classmethod
+    def from_openai(cls, usage: Optional[Dict[str, Any]]) -> "TokenUsage":
+        usage = usage or {}
+        return cls(int(usage.get("prompt_tokens") or 0), int(usage.get("completion_tokens") or 0))
+
+    def __add__(self, other: "TokenUsage") -> "TokenUsage":
+        return TokenUsage(self.prompt_tokens + other.prompt_tokens, self.completion_tokens + other.completion_tokens)
+
+
+class LLMResult(str):
+    """
+    generate/chat 的结果：仍是 str（原有调用方无需修改），另带模型名与token用量
+    cached=True 表示结果来自缓存，没有消耗上游配额
+    """
+    usage: TokenUsage
+    model: Optional[str]
+    cached: bool
+
+    def __new__(cls, text: str, usage: Optional[TokenUsage] = None, model: Optional[str] = None,
+                cached: bool = False) -> "LLMResult":
+        result = super().__new__(cls, text)
+        result.usage = usage or TokenUsage()
+        result.model = model
+        result.cached = cached
+        return result
+
+    @property
+    def text(self) -> str:
+        return str.__str__(self)
+
 
 class BaseLLM(ABC):
     """LLM基类"""
@@ -17,7 +88,7 @@ class BaseLLM(ABC):
         temperature: float = 0.7,
         **kwargs
     ) -> str:
-        """生成文本"""
+        """生成文本；实现可返回 LLMResult 以附带token用量"""
         pass
     
     @abstractmethod
@@ -28,5 +99,19 @@ class BaseLLM(ABC):
         temperature: float = 0.7,
         **kwargs
     ) -> str:
-        """对话生成"""
-        pass 
\ No newline at end of file
+        """对话生成；实现可返回 LLMResult 以附带token用量"""
+        pass
+
+    async def stream_chat(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 1000,
+        temperature: float = 0.7,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """流式对话生成，逐段产出文本；默认实现一次性产出完整结果"""
+        yield await self.chat(messages, max_tokens, temperature, **kwargs)
+
+    async def embed(self, texts: List[str], **kwargs) -> List[List[float]]:
+        """批量计算文本向量"""
+        raise NotImplementedError(f"{type(self).__name__} 不支持文本向量")
@@ -0,0 +1,278 @@
+"""
+LLM 响应缓存
+
+CachedLLM 包装任意 BaseLLM：
+- 键：模型 + 规范化后的消息 + 参数 的 SHA-256
+- 两级存储：进程内存（LRU）+ 磁盘 SQLite（LRU），都支持 TTL
+- 单飞（single-flight）：相同请求并发到达时只调用一次上游，其余请求等待同一结果
+- 统计命中率与节省的token数
+"""
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from scrumix.api.core.config import settings
+from scrumix.agents.llm.base import BaseLLM, LLMResult
+from scrumix.agents.prompts.tokens import count_message_tokens, count_tokens
+
+
+def _normalize_text(text: str) -> str:
+    return "\n".join(line.rstrip() for line in text.replace("\r\n", "\n").strip().split("\n"))
+
+
+def cache_key(model: str, messages: List[Dict[str, Any]], params: Dict[str, Any]) -> str:
+    """规范化请求并计算缓存键"""
+    normalized = {
+        "model": model,
+        "messages": [
+            {
+                "role": str(m.get("role", "")).lower(),
+                "content": _normalize_text(m.get("content") or ""),
+                **({"name": m["name"]} if m.get("name") else {}),
+            }
+            for m in messages
+        ],
+        "params": {k: round(v, 4) if isinstance(v, float) else v for k, v in params.items() if v is not None},
+    }
+    payload = json.dumps(normalized, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+@dataclass
+class CacheEntry:
+    value: str
+    tokens: int
+    expires_at: float
+
+
+class MemoryCacheStore:
+    """进程内 LRU 缓存"""
+
+    def __init__(self, max_entries: int = 1_000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCacheStore:
+    """磁盘 SQLite 缓存，按最近访问时间淘汰"""
+
+    def __init__(self, path: str, max_entries: int = 100_000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, tokens INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_accessed_at ON llm_cache (accessed_at)")
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, tokens, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[2] <= now:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return CacheEntry(value=row[0], tokens=row[1], expires_at=row[2])
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, tokens, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, entry.value, entry.tokens, entry.expires_at, now),
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN "
+                    "(SELECT key FROM llm_cache ORDER BY accessed_at LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+
+    def purge_expired(self) -> int:
+        """删除已过期的条目"""
+        with self._lock:
+            return self._conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+@dataclass
+class CacheStats:
+    """缓存统计"""
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    tokens_saved: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """命中率（等待同一上游调用的请求也计为命中）"""
+        total = self.hits + self.coalesced + self.misses
+        return (self.hits + self.coalesced) / total if total else 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": self.hit_rate,
+            "tokens_saved": self.tokens_saved,
+        }
+
+
+class CachedLLM(BaseLLM):
+    """为任意 BaseLLM 增加响应缓存与单飞合并"""
+
+    def __init__(self, llm: BaseLLM, ttl_seconds: Optional[int] = None, max_entries: Optional[int] = None,
+                 path: Optional[str] = None):
+        super().__init__(llm.model_name, llm.api_key)
+        self.llm = llm
+        self.ttl_seconds = settings.LLM_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        max_entries = settings.LLM_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        path = settings.LLM_CACHE_PATH if path is None else path
+        self.memory = MemoryCacheStore(max_entries)
+        self.disk = SQLiteCacheStore(path, max_entries) if path else None
+        self.stats = CacheStats()
+        self._inflight: Dict[str, "asyncio.Task[Tuple[str, int]]"] = {}
+
+    async def _run_in_thread(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def _lookup(self, key: str) -> Optional[CacheEntry]:
+        entry = self.memory.get(key)
+        if entry is None and self.disk is not None:
+            entry = await self._run_in_thread(self.disk.get, key)
+            if entry is not None:
+                self.memory.set(key, entry)
+        return entry
+
+    async def _store(self, key: str, messages: List[Dict[str, Any]], value: str) -> CacheEntry:
+        tokens = count_message_tokens(messages, self.model_name) + count_tokens(value, self.model_name)
+        entry = CacheEntry(value, tokens, time.time() + self.ttl_seconds)
+        self.memory.set(key, entry)
+        if self.disk is not None:
+            await self._run_in_thread(self.disk.set, key, entry)
+        return entry
+
+    async def _fetch(self, key: str, messages: List[Dict[str, Any]], max_tokens: int,
+                     temperature: float, kwargs: Dict[str, Any]) -> Tuple[str, int]:
+        """调用上游并写入缓存；返回上游结果（保留token用量）"""
+        value = await self.llm.chat(messages, max_tokens, temperature, **kwargs)
+        entry = await self._store(key, messages, value)
+        return value, entry.tokens
+
+    async def generate(self, prompt: str, max_tokens: int = 1000, temperature: float = 0.7,
+                       **kwargs) -> str:
+        """生成文本"""
+        return await self.chat([{"role": "user", "content": prompt}], max_tokens, temperature, **kwargs)
+
+    async def chat(self, messages: List[Dict[str, str]], max_tokens: int = 1000, temperature: float = 0.7,
+                   use_cache: bool = True, **kwargs) -> str:
+        """对话生成；use_cache=False 时绕过缓存"""
+        if not use_cache:
+            return await self.llm.chat(messages, max_tokens, temperature, **kwargs)
+
+        key = cache_key(self.model_name, messages, {"max_tokens": max_tokens, "temperature": temperature, **kwargs})
+        entry = await self._lookup(key)
+        if entry is not None:
+            self.stats.hits += 1
+            self.stats.tokens_saved += entry.tokens
+            return LLMResult(entry.value, model=self.model_name, cached=True)
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats.coalesced += 1
+            value, tokens = await asyncio.shield(task)
+            self.stats.tokens_saved += tokens
+            # 合并的请求没有消耗上游配额，用量只计在发起者
+            return LLMResult(value, model=self.model_name, cached=True)
+
+        self.stats.misses += 1
+        task = asyncio.ensure_future(self._fetch(key, messages, max_tokens, temperature, kwargs))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield：发起者被取消时上游调用继续，等待同一结果的其他请求不受影响
+        value, _ = await asyncio.shield(task)
+        return value
+
+    async def stream_chat(self, messages: List[Dict[str, str]], max_tokens: int = 1000,
+                          temperature: float = 0.7, use_cache: bool = True, **kwargs) -> AsyncIterator[str]:
+        """流式对话生成：命中时一次性产出缓存结果，未命中时透传上游流并在完整结束后写入缓存"""
+        if not use_cache:
+            async for chunk in self.llm.stream_chat(messages, max_tokens, temperature, **kwargs):
+                yield chunk
+            return
+
+        key = cache_key(self.model_name, messages, {"max_tokens": max_tokens, "temperature": temperature, **kwargs})
+        entry = await self._lookup(key)
+        if entry is not None:
+            self.stats.hits += 1
+            self.stats.tokens_saved += entry.tokens
+            yield entry.value
+            return
+
+        self.stats.misses += 1
+        chunks = []
+        async for chunk in self.llm.stream_chat(messages, max_tokens, temperature, **kwargs):
+            chunks.append(chunk)
+            yield chunk
+        await self._store(key, messages, "".join(chunks))
+
+    async def embed(self, texts: List[str], **kwargs) -> List[List[float]]:
+        """文本向量不缓存，直接调用上游"""
+        return await self.llm.embed(texts, **kwargs)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
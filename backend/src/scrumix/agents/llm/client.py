@@ -0,0 +1,39 @@
+"""
+共享的 HTTP 连接池
+
+所有 LLM 提供方共用一个 httpx.AsyncClient，复用 TCP/TLS 连接，
+避免每次请求重新握手。应用关闭时调用 close_http_client()。
+"""
+from typing import Optional
+
+import httpx
+
+from scrumix.api.core.config import settings
+
+# 连接池大小应不小于所有部署并发上限之和
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 20
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """获取共享的 AsyncClient（首次调用时创建）"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.LLM_REQUEST_TIMEOUT_SECONDS, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            ),
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """关闭共享的 AsyncClient"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
@@ -0,0 +1,201 @@
+"""
+本地假 LLM 服务（离线测试用）
+
+实现 OpenAI 与 Azure OpenAI 的 chat completions 接口（含 stream=True 的 SSE），
+回显最后一条用户消息；embeddings 接口返回基于词哈希的确定性向量（相同词越多越相似）。
+可配置延迟、流式分块间隔与注入 429/5xx 错误。
+
+进程内使用（不走网络）:
+    app = create_fake_llm_app(latency=0.05, failure_rate=0.2)
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://fake-llm")
+    llm = AzureOpenAILLM("gpt-4o-mini", endpoint="http://fake-llm", http_client=client)
+
+独立运行:
+    cd src && python -m scrumix.agents.llm.fake_server --port 8001
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from scrumix.agents.prompts.tokens import CHARS_PER_TOKEN, count_tokens
+
+EMBEDDING_DIM = 256
+
+def fake_reply(messages: List[Dict[str, Any]]) -> str:
+    """回显最后一条用户消息"""
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            return f"echo: {message.get('content') or ''}"
+    return "echo:"
+
+
+def fake_embedding(text: str, dim: int = EMBEDDING_DIM) -> List[float]:
+    """词哈希向量（hashing trick），已归一化"""
+    vector = [0.0] * dim
+    for word in text.lower().split():
+        digest = hashlib.md5(word.encode()).digest()
+        vector[int.from_bytes(digest[:4], "little") % dim] += 1.0 if digest[4] & 1 else -1.0
+    norm = sum(v * v for v in vector) ** 0.5 or 1.0
+    return [v / norm for v in vector]
+
+
+def create_fake_llm_app(latency: float = 0.0, failure_rate: float = 0.0, failure_status: int = 429,
+                        retry_after: Optional[float] = None, seed: Optional[int] = None,
+                        chunk_delay: float = 0.0) -> FastAPI:
+    """
+    创建假 LLM 应用
+    latency: 每个请求的模拟延迟（秒），流式请求即首token前的延迟
+    chunk_delay: 流式响应中相邻分块的间隔（秒）
+    failure_rate: 返回 failure_status 的概率
+    retry_after: 失败响应中的 Retry-After（秒）
+    """
+    app = FastAPI(title="Fake LLM")
+    rng = random.Random(seed)
+    app.state.requests = 0
+    app.state.failures = 0
+    app.state.embedding_requests = 0
+    app.state.embedded_inputs = 0
+
+    async def completion(request: Request, model: str) -> JSONResponse:
+        app.state.requests += 1
+        body = await request.json()
+        if latency:
+            await asyncio.sleep(latency)
+        if failure_rate and rng.random() < failure_rate:
+            app.state.failures += 1
+            headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+            return JSONResponse(
+                {"error": {"code": str(failure_status), "message": "fake failure"}},
+                status_code=failure_status,
+                headers=headers,
+            )
+
+        messages = body.get("messages") or []
+        content = fake_reply(messages)
+        max_tokens = body.get("max_tokens")
+        if max_tokens:
+            content = content[: max_tokens * CHARS_PER_TOKEN]
+        prompt_tokens = sum(count_tokens(m.get("content") or "") for m in messages)
+        completion_tokens = count_tokens(content)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        if body.get("stream"):
+            include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+            return StreamingResponse(
+                stream_chunks(completion_id, model, content, usage if include_usage else None),
+                media_type="text/event-stream",
+            )
+        return JSONResponse({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        })
+
+    async def stream_chunks(completion_id: str, model: str, content: str, usage: Optional[Dict[str, int]]):
+        """按词切分为 chat.completion.chunk 事件"""
+        def event(choices: List[Dict[str, Any]], **extra) -> str:
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": choices,
+                **extra,
+            }
+            return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+
+        yield event([{"index": 0, "delta": {"role": "assistant"}, "finish_reason": None}])
+        for i, word in enumerate(content.split(" ")):
+            if chunk_delay and i:
+                await asyncio.sleep(chunk_delay)
+            piece = word if i == 0 else f" {word}"
+            yield event([{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+        yield event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if usage is not None:
+            yield event([], usage=usage)
+        yield "data: [DONE]\n\n"
+
+    async def embeddings(request: Request, model: str) -> JSONResponse:
+        app.state.requests += 1
+        app.state.embedding_requests += 1
+        body = await request.json()
+        if latency:
+            await asyncio.sleep(latency)
+        if failure_rate and rng.random() < failure_rate:
+            app.state.failures += 1
+            return JSONResponse({"error": {"message": "fake failure"}}, status_code=failure_status)
+        inputs = body.get("input") or []
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        app.state.embedded_inputs += len(inputs)
+        tokens = sum(count_tokens(text) for text in inputs)
+        return JSONResponse({
+            "object": "list",
+            "model": model,
+            "data": [
+                {"object": "embedding", "index": i, "embedding": fake_embedding(text)}
+                for i, text in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+    @app.post("/embeddings")
+    @app.post("/v1/embeddings")
+    async def openai_embeddings(request: Request):
+        body = await request.json()
+        return await embeddings(request, body.get("model", "fake"))
+
+    @app.post("/openai/deployments/{deployment}/embeddings")
+    async def azure_embeddings(deployment: str, request: Request):
+        return await embeddings(request, deployment)
+
+    @app.post("/chat/completions")
+    @app.post("/v1/chat/completions")
+    async def openai_chat(request: Request):
+        body = await request.json()
+        return await completion(request, body.get("model", "fake"))
+
+    @app.post("/openai/deployments/{deployment}/chat/completions")
+    async def azure_chat(deployment: str, request: Request):
+        return await completion(request, deployment)
+
+    return app
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="本地假 LLM 服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--failure-status", type=int, default=429)
+    parser.add_argument("--chunk-delay", type=float, default=0.02)
+    args = parser.parse_args(argv)
+
+    app = create_fake_llm_app(args.latency, args.failure_rate, args.failure_status, chunk_delay=args.chunk_delay)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
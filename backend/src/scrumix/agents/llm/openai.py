@@ -0,0 +1,266 @@
+"""
+OpenAI / Azure OpenAI 兼容的 LLM 实现
+
+请求经由共享连接池（llm/client.py）发出，并由调度器（llm/scheduler.py）
+按部署限流和重试。参见 docs/Azure_OpenAI_GUIDELINES.md。
+"""
+import json
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from scrumix.api.core.config import settings
+from scrumix.agents.llm.base import BaseLLM, LLMError, LLMHTTPError, LLMResult, TokenUsage
+from scrumix.agents.llm.client import get_http_client
+from scrumix.agents.llm.scheduler import CallTiming, LLMScheduler, default_scheduler
+from scrumix.agents.llm.usage import UsageAccumulator, default_usage
+from scrumix.agents.prompts.tokens import count_message_tokens, count_tokens
+from scrumix.agents.utils.tracing import Span, default_tracer
+
+
+def _trace_call(span: Span, usage: Dict[str, Any], timing: Optional[CallTiming]) -> None:
+    """把token用量与调度耗时写入 span"""
+    span.set(
+        prompt_tokens=usage.get("prompt_tokens"),
+        completion_tokens=usage.get("completion_tokens"),
+        total_tokens=usage.get("total_tokens"),
+    )
+    if timing is not None:
+        span.set(queue_wait=timing.queue_wait, latency=timing.latency, attempts=timing.attempts, ttft=timing.ttft)
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = response.headers.get("retry-after")
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+class OpenAILLM(BaseLLM):
+    """OpenAI 兼容接口（POST {base_url}/chat/completions）"""
+
+    def __init__(self, model_name: str, api_key: str = None, base_url: str = "https://api.openai.com/v1",
+                 scheduler: Optional[LLMScheduler] = None, http_client: Optional[httpx.AsyncClient] = None,
+                 embedding_model: str = "text-embedding-3-small", usage: Optional[UsageAccumulator] = None):
+        super().__init__(model_name, api_key)
+        self.base_url = base_url.rstrip("/")
+        self.embedding_model = embedding_model
+        self.scheduler = scheduler or default_scheduler
+        self.usage = usage or default_usage
+        self._http_client = http_client
+
+    @property
+    def deployment(self) -> str:
+        """调度器中的限流键"""
+        return self.model_name
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        return self._http_client or get_http_client()
+
+    def _url(self, model: Optional[str] = None, operation: str = "chat/completions") -> str:
+        return f"{self.base_url}/{operation}"
+
+    def _headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+
+    def _params(self) -> Dict[str, str]:
+        return {}
+
+    def _payload(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float,
+                 **kwargs) -> Dict[str, Any]:
+        return {
+            "model": self.model_name,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            **kwargs,
+        }
+
+    def _http_error(self, response: httpx.Response) -> LLMHTTPError:
+        return LLMHTTPError(
+            f"LLM请求失败: {response.status_code} {response.text[:200]}",
+            status_code=response.status_code,
+            retry_after=_retry_after(response),
+        )
+
+    async def _post(self, payload: Dict[str, Any], url: Optional[str] = None) -> Dict[str, Any]:
+        """发送一次请求，错误统一转换为 LLMHTTPError"""
+        try:
+            response = await self.http_client.post(
+                url or self._url(), params=self._params(), headers=default_tracer.inject(self._headers()), json=payload
+            )
+        except httpx.TransportError as e:
+            raise LLMHTTPError(f"LLM请求失败: {e}")
+        if response.status_code >= 400:
+            raise self._http_error(response)
+        return response.json()
+
+    async def _open_stream(self, payload: Dict[str, Any]) -> httpx.Response:
+        """发送流式请求，返回尚未读取响应体的 Response"""
+        request = self.http_client.build_request(
+            "POST", self._url(), params=self._params(), headers=default_tracer.inject(self._headers()), json=payload
+        )
+        try:
+            response = await self.http_client.send(request, stream=True)
+        except httpx.TransportError as e:
+            raise LLMHTTPError(f"LLM请求失败: {e}")
+        if response.status_code >= 400:
+            await response.aread()
+            await response.aclose()
+            raise self._http_error(response)
+        return response
+
+    async def complete(self, messages: List[Dict[str, str]], max_tokens: int = 1000,
+                       temperature: float = 0.7, **kwargs) -> Dict[str, Any]:
+        """调用 chat completions，返回原始响应；项目配额用尽时抛出 QuotaExceededError"""
+        self.usage.check_quota()
+        payload = self._payload(messages, max_tokens, temperature, **kwargs)
+        estimated = count_message_tokens(messages, self.model_name) + max_tokens
+        with default_tracer.span("llm.chat", "llm", model=self.deployment, max_tokens=max_tokens) as span:
+            data, timing = await self.scheduler.submit(
+                self.deployment, lambda: self._post(payload), estimated_tokens=estimated
+            )
+            usage = data.get("usage") or {}
+            _trace_call(span, usage, timing)
+        self.scheduler.record_usage(self.deployment, estimated, usage.get("total_tokens", estimated))
+        self.usage.record(self.deployment, TokenUsage.from_openai(usage))
+        return data
+
+    async def generate(self, prompt: str, max_tokens: int = 1000, temperature: float = 0.7,
+                       **kwargs) -> str:
+        """生成文本"""
+        return await self.chat([{"role": "user", "content": prompt}], max_tokens, temperature, **kwargs)
+
+    async def chat(self, messages: List[Dict[str, str]], max_tokens: int = 1000,
+                   temperature: float = 0.7, **kwargs) -> str:
+        """对话生成"""
+        data = await self.complete(messages, max_tokens, temperature, **kwargs)
+        try:
+            content = data["choices"][0]["message"]["content"] or ""
+        except (KeyError, IndexError, TypeError):
+            raise LLMError("LLM响应格式无效")
+        return LLMResult(content, TokenUsage.from_openai(data.get("usage")), self.deployment)
+
+    async def embed(self, texts: List[str], **kwargs) -> List[List[float]]:
+        """批量计算文本向量（embedding_model），与对话共用调度器，按嵌入部署限流"""
+        self.usage.check_quota()
+        payload = self._embedding_payload(texts, **kwargs)
+        estimated = sum(count_tokens(t, self.embedding_model) for t in texts) + 1
+        url = self._url(self.embedding_model, "embeddings")
+        with default_tracer.span("llm.embed", "llm", model=self.embedding_model, inputs=len(texts)) as span:
+            data, timing = await self.scheduler.submit(
+                self.embedding_model, lambda: self._post(payload, url), estimated_tokens=estimated
+            )
+            usage = data.get("usage") or {}
+            _trace_call(span, usage, timing)
+        self.scheduler.record_usage(self.embedding_model, estimated, usage.get("total_tokens", estimated))
+        self.usage.record(self.embedding_model, TokenUsage.from_openai(usage))
+        try:
+            items = sorted(data["data"], key=lambda item: item["index"])
+            return [item["embedding"] for item in items]
+        except (KeyError, TypeError):
+            raise LLMError("嵌入响应格式无效")
+
+    def _embedding_payload(self, texts: List[str], **kwargs) -> Dict[str, Any]:
+        return {"model": self.embedding_model, "input": texts, **kwargs}
+
+    async def stream_chat(self, messages: List[Dict[str, str]], max_tokens: int = 1000,
+                          temperature: float = 0.7, **kwargs) -> AsyncIterator[str]:
+        """流式对话生成（SSE），逐段产出文本增量"""
+        self.usage.check_quota()
+        payload = self._payload(
+            messages, max_tokens, temperature, stream=True, stream_options={"include_usage": True}, **kwargs
+        )
+        prompt_tokens = count_message_tokens(messages, self.model_name)
+        estimated = prompt_tokens + max_tokens
+        used = estimated
+        usage: Dict[str, Any] = {}
+        timing: Optional[CallTiming] = None
+        streamed: List[str] = []
+        with default_tracer.span("llm.chat", "llm", model=self.deployment, max_tokens=max_tokens, stream=True) as span:
+            try:
+                async with self.scheduler.open_stream(
+                    self.deployment, lambda: self._open_stream(payload), estimated_tokens=estimated
+                ) as (response, timing):
+                    try:
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            data = line[len("data:"):].strip()
+                            if data == "[DONE]":
+                                break
+                            chunk = json.loads(data)
+                            if chunk.get("usage"):
+                                usage = chunk["usage"]
+                                used = usage.get("total_tokens", used)
+                            for choice in chunk.get("choices") or []:
+                                delta = (choice.get("delta") or {}).get("content")
+                                if delta:
+                                    if timing.ttft is None:
+                                        timing.ttft = time.monotonic() - timing.submitted_at
+                                    streamed.append(delta)
+                                    yield delta
+                    except httpx.TransportError as e:
+                        raise LLMHTTPError(f"LLM流式响应中断: {e}")
+            finally:
+                _trace_call(span, usage, timing)
+                self.scheduler.record_usage(self.deployment, estimated, used)
+                if timing is not None:
+                    # 中途断开的流没有 usage 块，按已收到的文本计数
+                    self.usage.record(self.deployment, TokenUsage.from_openai(usage) if usage else TokenUsage(
+                        prompt_tokens, count_tokens("".join(streamed), self.model_name)
+                    ))
+
+
+class AzureOpenAILLM(OpenAILLM):
+    """Azure OpenAI（POST {endpoint}/openai/deployments/{deployment}/chat/completions）"""
+
+    def __init__(self, deployment: str, endpoint: str, api_key: str = None,
+                 api_version: str = "2024-12-01-preview", scheduler: Optional[LLMScheduler] = None,
+                 http_client: Optional[httpx.AsyncClient] = None,
+                 embedding_deployment: str = "text-embedding-3-small", usage: Optional[UsageAccumulator] = None):
+        super().__init__(deployment, api_key, endpoint, scheduler, http_client, embedding_deployment, usage)
+        self.api_version = api_version
+
+    @classmethod
+    def from_settings(cls, **kwargs) -> "AzureOpenAILLM":
+        """按 AZURE_OPENAI_* 配置创建"""
+        options = {
+            "deployment": settings.AZURE_OPENAI_DEPLOYMENT,
+            "endpoint": settings.AZURE_OPENAI_ENDPOINT,
+            "api_key": settings.AZURE_OPENAI_API_KEY,
+            "api_version": settings.AZURE_OPENAI_API_VERSION,
+            "embedding_deployment": settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
+        }
+        options.update(kwargs)
+        return cls(**options)
+
+    def _url(self, model: Optional[str] = None, operation: str = "chat/completions") -> str:
+        return f"{self.base_url}/openai/deployments/{model or self.model_name}/{operation}"
+
+    def _headers(self) -> Dict[str, str]:
+        return {"api-key": self.api_key} if self.api_key else {}
+
+    def _params(self) -> Dict[str, str]:
+        return {"api-version": self.api_version}
+
+    def _payload(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float,
+                 **kwargs) -> Dict[str, Any]:
+        payload = super()._payload(messages, max_tokens, temperature, **kwargs)
+        # Azure 通过URL中的部署名选择模型
+        payload.pop("model", None)
+        return payload
+
+    def _embedding_payload(self, texts: List[str], **kwargs) -> Dict[str, Any]:
+        return {"input": texts, **kwargs}
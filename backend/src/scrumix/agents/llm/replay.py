@@ -0,0 +1,186 @@
+"""
+LLM 调用的录制与回放
+
+RecordingLLM 包装真实的 BaseLLM，把每次调用的请求键、响应、耗时（流式调用含每段的时间点）
+追加写入 JSONL 记录文件；ReplayLLM 读取记录文件，按请求键返回录制的响应：
+- latency="original"：按录制时的耗时（可用 speed 缩放）等待后返回，流式调用按原节奏逐段产出
+- latency="zero"：立即返回，用于只测量工作流/代理自身的开销
+
+请求键与响应缓存相同（llm/cache.py 的 cache_key），同一请求录制多次时按录制顺序依次回放。
+
+    llm = RecordingLLM(AzureOpenAILLM.from_settings(), "runs/sprint_review.jsonl")
+    ...
+    llm = ReplayLLM("runs/sprint_review.jsonl", latency="zero")
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from scrumix.agents.llm.base import BaseLLM, LLMError
+from scrumix.agents.llm.cache import cache_key
+from scrumix.agents.prompts.tokens import count_message_tokens, count_tokens
+from scrumix.agents.utils.tracing import default_tracer
+
+ORIGINAL = "original"
+ZERO = "zero"
+
+
+def _chat_key(model: str, messages: List[Dict[str, Any]], max_tokens: int, temperature: float,
+              kwargs: Dict[str, Any]) -> str:
+    return cache_key(model, messages, {"max_tokens": max_tokens, "temperature": temperature, **kwargs})
+
+
+def _embed_key(model: str, texts: List[str], kwargs: Dict[str, Any]) -> str:
+    return cache_key(model, [{"role": "input", "content": text} for text in texts], {"embed": True, **kwargs})
+
+
+class RecordingLLM(BaseLLM):
+    """录制上游 LLM 的调用"""
+
+    def __init__(self, llm: BaseLLM, path: str):
+        super().__init__(llm.model_name, llm.api_key)
+        self.llm = llm
+        self.path = path
+        self.recorded = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps({"model": self.model_name, **record}, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self.recorded += 1
+
+    async def generate(self, prompt: str, max_tokens: int = 1000, temperature: float = 0.7, **kwargs) -> str:
+        """生成文本"""
+        return await self.chat([{"role": "user", "content": prompt}], max_tokens, temperature, **kwargs)
+
+    async def chat(self, messages: List[Dict[str, str]], max_tokens: int = 1000, temperature: float = 0.7,
+                   **kwargs) -> str:
+        """对话生成"""
+        started = time.perf_counter()
+        value = await self.llm.chat(messages, max_tokens, temperature, **kwargs)
+        self._write({
+            "key": _chat_key(self.model_name, messages, max_tokens, temperature, kwargs),
+            "kind": "chat",
+            "latency": time.perf_counter() - started,
+            "tokens": count_message_tokens(messages, self.model_name) + count_tokens(value, self.model_name),
+            "response": value,
+        })
+        return value
+
+    async def stream_chat(self, messages: List[Dict[str, str]], max_tokens: int = 1000,
+                          temperature: float = 0.7, **kwargs) -> AsyncIterator[str]:
+        """流式对话生成；完整结束的流才会被录制"""
+        started = time.perf_counter()
+        chunks: List[List[Any]] = []
+        async for chunk in self.llm.stream_chat(messages, max_tokens, temperature, **kwargs):
+            chunks.append([time.perf_counter() - started, chunk])
+            yield chunk
+        self._write({
+            "key": _chat_key(self.model_name, messages, max_tokens, temperature, kwargs),
+            "kind": "stream",
+            "latency": time.perf_counter() - started,
+            "tokens": count_message_tokens(messages, self.model_name)
+            + count_tokens("".join(c for _, c in chunks), self.model_name),
+            "chunks": chunks,
+        })
+
+    async def embed(self, texts: List[str], **kwargs) -> List[List[float]]:
+        """批量计算文本向量"""
+        started = time.perf_counter()
+        vectors = await self.llm.embed(texts, **kwargs)
+        self._write({
+            "key": _embed_key(self.model_name, texts, kwargs),
+            "kind": "embed",
+            "latency": time.perf_counter() - started,
+            "tokens": sum(count_tokens(t, self.model_name) for t in texts),
+            "response": vectors,
+        })
+        return vectors
+
+
+class ReplayLLM(BaseLLM):
+    """回放录制的 LLM 调用；没有对应记录时抛出 LLMError"""
+
+    def __init__(self, path: str, latency: str = ORIGINAL, speed: float = 1.0, model_name: Optional[str] = None):
+        if latency not in (ORIGINAL, ZERO):
+            raise ValueError(f"latency 只能是 {ORIGINAL} 或 {ZERO}")
+        self.path = path
+        self.latency = latency
+        self.speed = speed
+        self.records: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        model = None
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self.records[record["key"]].append(record)
+                    model = model or record.get("model")
+        # 请求键包含模型名，默认使用录制时的模型名
+        super().__init__(model_name or model or "replay")
+        self._positions: Dict[str, int] = defaultdict(int)
+        self.replayed = 0
+
+    def _take(self, key: str, kind: str) -> Dict[str, Any]:
+        records = self.records.get(key)
+        if not records:
+            raise LLMError(f"回放记录中没有该请求（{kind} {key[:12]}）")
+        position = self._positions[key]
+        self._positions[key] = position + 1
+        self.replayed += 1
+        # 回放次数超过录制次数时重复最后一条
+        return records[min(position, len(records) - 1)]
+
+    async def _sleep(self, seconds: float) -> None:
+        if self.latency == ORIGINAL and seconds > 0:
+            await asyncio.sleep(seconds / self.speed)
+
+    async def generate(self, prompt: str, max_tokens: int = 1000, temperature: float = 0.7, **kwargs) -> str:
+        """生成文本"""
+        return await self.chat([{"role": "user", "content": prompt}], max_tokens, temperature, **kwargs)
+
+    async def chat(self, messages: List[Dict[str, str]], max_tokens: int = 1000, temperature: float = 0.7,
+                   **kwargs) -> str:
+        """对话生成"""
+        key = _chat_key(self.model_name, messages, max_tokens, temperature, kwargs)
+        with default_tracer.span("llm.chat", "llm", model=self.model_name, replay=True) as span:
+            record = self._take(key, "chat")
+            span.set(total_tokens=record.get("tokens"))
+            await self._sleep(record["latency"])
+        if record["kind"] == "stream":
+            return "".join(chunk for _, chunk in record["chunks"])
+        return record["response"]
+
+    async def stream_chat(self, messages: List[Dict[str, str]], max_tokens: int = 1000,
+                          temperature: float = 0.7, **kwargs) -> AsyncIterator[str]:
+        """流式对话生成；按录制的时间点逐段产出"""
+        key = _chat_key(self.model_name, messages, max_tokens, temperature, kwargs)
+        with default_tracer.span("llm.chat", "llm", model=self.model_name, replay=True, stream=True) as span:
+            record = self._take(key, "stream")
+            span.set(total_tokens=record.get("tokens"))
+            if record["kind"] != "stream":
+                await self._sleep(record["latency"])
+                yield record["response"]
+                return
+            elapsed = 0.0
+            for offset, chunk in record["chunks"]:
+                await self._sleep(offset - elapsed)
+                elapsed = offset
+                yield chunk
+
+    async def embed(self, texts: List[str], **kwargs) -> List[List[float]]:
+        """批量计算文本向量"""
+        key = _embed_key(self.model_name, texts, kwargs)
+        with default_tracer.span("llm.embed", "llm", model=self.model_name, replay=True, inputs=len(texts)) as span:
+            record = self._take(key, "embed")
+            span.set(total_tokens=record.get("tokens"))
+            await self._sleep(record["latency"])
+        return record["response"]
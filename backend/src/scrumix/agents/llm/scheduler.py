@@ -0,0 +1,241 @@
+"""
+LLM 请求调度器
+
+每个部署（deployment）独立限流：
+- 并发上限：同时在途的请求数
+- 每分钟token预算（TPM）：令牌桶，按预估token数扣减，响应返回后按实际用量校正
+- 429 / 5xx / 网络错误按指数退避 + 全抖动重试，优先遵循 Retry-After
+
+统计中排队等待时间（等待预算和并发槽）与模型延迟（请求本身耗时）分开记录；
+流式请求额外记录首token时间（TTFT），整个流式响应期间占用并发槽。
+"""
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from scrumix.api.core.config import settings
+from scrumix.agents.llm.base import LLMHTTPError
+
+T = TypeVar("T")
+
+# 退避基数与上限（秒）
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 30.0
+
+
+@dataclass
+class DeploymentLimits:
+    """部署的限流配置"""
+    max_concurrency: int = settings.LLM_MAX_CONCURRENCY
+    tokens_per_minute: int = settings.LLM_TOKENS_PER_MINUTE
+    max_retries: int = settings.LLM_MAX_RETRIES
+
+
+@dataclass
+class CallTiming:
+    """单次调用的耗时"""
+    queue_wait: float = 0.0
+    latency: float = 0.0
+    attempts: int = 0
+    ttft: Optional[float] = None
+    submitted_at: float = 0.0
+
+
+@dataclass
+class DeploymentStats:
+    """部署的累计统计"""
+    requests: int = 0
+    failures: int = 0
+    retries: int = 0
+    queue_wait_total: float = 0.0
+    queue_wait_max: float = 0.0
+    latency_total: float = 0.0
+    latency_max: float = 0.0
+    tokens_used: int = 0
+    streams: int = 0
+    ttft_total: float = 0.0
+    ttft_max: float = 0.0
+
+    def record(self, timing: CallTiming) -> None:
+        self.requests += 1
+        self.retries += max(timing.attempts - 1, 0)
+        self.queue_wait_total += timing.queue_wait
+        self.queue_wait_max = max(self.queue_wait_max, timing.queue_wait)
+        self.latency_total += timing.latency
+        self.latency_max = max(self.latency_max, timing.latency)
+        if timing.ttft is not None:
+            self.streams += 1
+            self.ttft_total += timing.ttft
+            self.ttft_max = max(self.ttft_max, timing.ttft)
+
+    def as_dict(self) -> Dict[str, float]:
+        count = self.requests or 1
+        return {
+            "requests": self.requests,
+            "failures": self.failures,
+            "retries": self.retries,
+            "queue_wait_avg": self.queue_wait_total / count,
+            "queue_wait_max": self.queue_wait_max,
+            "latency_avg": self.latency_total / count,
+            "latency_max": self.latency_max,
+            "tokens_used": self.tokens_used,
+            "ttft_avg": self.ttft_total / (self.streams or 1),
+            "ttft_max": self.ttft_max,
+        }
+
+
+class TokenBudget:
+    """每分钟token预算（令牌桶，容量 = TPM，按秒连续补充）"""
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        # 按到达顺序排队，避免大请求被小请求饿死
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens: int) -> None:
+        """扣减预算，不足时等待补充"""
+        tokens = min(float(tokens), self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+    def adjust(self, delta: int) -> None:
+        """按实际用量校正：delta > 0 追加扣减，< 0 退还"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class _Deployment:
+    def __init__(self, limits: DeploymentLimits):
+        self.limits = limits
+        self.semaphore = asyncio.Semaphore(limits.max_concurrency)
+        self.budget = TokenBudget(limits.tokens_per_minute)
+        self.stats = DeploymentStats()
+
+
+class LLMScheduler:
+    """按部署限流并重试的请求调度器"""
+
+    def __init__(self, default_limits: Optional[DeploymentLimits] = None):
+        self.default_limits = default_limits or DeploymentLimits()
+        self._deployments: Dict[str, _Deployment] = {}
+
+    def configure(self, deployment: str, limits: DeploymentLimits) -> None:
+        """设置部署的限流配置（会重置该部署的统计）"""
+        self._deployments[deployment] = _Deployment(limits)
+
+    def _get(self, deployment: str) -> _Deployment:
+        if deployment not in self._deployments:
+            self._deployments[deployment] = _Deployment(self.default_limits)
+        return self._deployments[deployment]
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """第 attempt 次重试前的等待时间"""
+        if retry_after is not None:
+            return min(retry_after, BACKOFF_MAX_SECONDS) + random.uniform(0, BACKOFF_BASE_SECONDS)
+        return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+    async def submit(self, deployment: str, call: Callable[[], Awaitable[T]],
+                     estimated_tokens: int = 0) -> Tuple[T, CallTiming]:
+        """
+        在限流下执行 call，返回 (结果, 耗时)
+        call 每次重试都会重新调用，失败时抛出 LLMHTTPError
+        """
+        target = self._get(deployment)
+        timing = CallTiming()
+        queued_at = time.monotonic()
+        await target.budget.acquire(estimated_tokens)
+
+        while True:
+            async with target.semaphore:
+                started = time.monotonic()
+                timing.queue_wait += started - queued_at
+                timing.attempts += 1
+                try:
+                    result = await call()
+                except LLMHTTPError as e:
+                    timing.latency += time.monotonic() - started
+                    if not e.retryable or timing.attempts > target.limits.max_retries:
+                        target.stats.failures += 1
+                        target.stats.record(timing)
+                        raise
+                    delay = self.backoff(timing.attempts - 1, e.retry_after)
+                else:
+                    timing.latency += time.monotonic() - started
+                    target.stats.record(timing)
+                    return result, timing
+            # 退避期间释放并发槽，退避时间计入排队等待
+            queued_at = time.monotonic()
+            await asyncio.sleep(delay)
+
+    @asynccontextmanager
+    async def open_stream(self, deployment: str, open_call: Callable[[], Awaitable[Any]],
+                          estimated_tokens: int = 0) -> AsyncIterator[Tuple[Any, CallTiming]]:
+        """
+        在限流下打开流式响应，产出 (响应, 耗时)；上下文结束前一直占用并发槽
+        open_call 返回带 aclose() 的响应对象，只在开始读取前重试
+        调用方在收到首个token时设置 timing.ttft（相对提交时间 timing.submitted_at，含排队）
+        """
+        target = self._get(deployment)
+        timing = CallTiming()
+        queued_at = timing.submitted_at = time.monotonic()
+        await target.budget.acquire(estimated_tokens)
+
+        while True:
+            await target.semaphore.acquire()
+            started = time.monotonic()
+            timing.queue_wait += started - queued_at
+            timing.attempts += 1
+            try:
+                response = await open_call()
+            except LLMHTTPError as e:
+                target.semaphore.release()
+                timing.latency += time.monotonic() - started
+                if not e.retryable or timing.attempts > target.limits.max_retries:
+                    target.stats.failures += 1
+                    target.stats.record(timing)
+                    raise
+                queued_at = time.monotonic()
+                await asyncio.sleep(self.backoff(timing.attempts - 1, e.retry_after))
+                continue
+            except BaseException:
+                target.semaphore.release()
+                raise
+            break
+
+        try:
+            yield response, timing
+        finally:
+            target.semaphore.release()
+            timing.latency += time.monotonic() - started
+            target.stats.record(timing)
+            await response.aclose()
+
+    def record_usage(self, deployment: str, estimated_tokens: int, actual_tokens: int) -> None:
+        """响应返回后按实际token用量校正预算"""
+        target = self._get(deployment)
+        target.budget.adjust(actual_tokens - estimated_tokens)
+        target.stats.tokens_used += actual_tokens
+
+    def stats(self, deployment: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+        """统计快照"""
+        names = [deployment] if deployment else list(self._deployments)
+        return {name: self._get(name).stats.as_dict() for name in names}
+
+
+default_scheduler = LLMScheduler()
@@ -0,0 +1,204 @@
+"""
+LLM token用量统计与项目配额
+
+- 用量归属（代理名、项目、用户）保存在 contextvars 中：BaseAgent.execute 按 context
+  中的 project_id / user_id 自动设置，也可用 usage_scope() 手动设置
+- 每次上游调用后 record() 只在内存中按 (日期, 代理, 项目, 用户, 模型) 累加，开销为一次加锁的字典更新
+- 后台任务定期 drain() 出累计值批量写入 llm_usage 表（见 api/crud/usage.py），
+  写入后用数据库中当天的项目总量与配额刷新本地视图（多进程部署时配额的滞后不超过一个刷新周期）
+- check_quota() 在调用前检查项目当天用量（已写库的 + 本进程未写库的），用尽时抛出 QuotaExceededError
+"""
+import asyncio
+import contextvars
+import datetime
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional
+
+from scrumix.api.core.config import settings
+from scrumix.agents.llm.base import QuotaExceededError, TokenUsage
+from scrumix.agents.utils.logger import logger
+
+
+@dataclass(frozen=True)
+class UsageScope:
+    """用量归属"""
+    agent: Optional[str] = None
+    project_id: Optional[int] = None
+    user_id: Optional[int] = None
+
+
+class UsageKey(NamedTuple):
+    day: datetime.date
+    agent: str
+    project_id: Optional[int]
+    user_id: Optional[int]
+    model: str
+
+
+@dataclass
+class UsageRow:
+    """一个统计周期内某个键的累计用量"""
+    key: UsageKey
+    requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+_scope: "contextvars.ContextVar[UsageScope]" = contextvars.ContextVar("llm_usage_scope", default=UsageScope())
+
+
+def current_scope() -> UsageScope:
+    return _scope.get()
+
+
+@contextmanager
+def usage_scope(agent: Optional[str] = None, project_id: Optional[int] = None,
+                user_id: Optional[int] = None) -> Iterator[UsageScope]:
+    """设置用量归属；未指定的字段沿用外层的值"""
+    outer = _scope.get()
+    scope = replace(
+        outer,
+        agent=agent or outer.agent,
+        project_id=project_id if project_id is not None else outer.project_id,
+        user_id=user_id if user_id is not None else outer.user_id,
+    )
+    token = _scope.set(scope)
+    try:
+        yield scope
+    finally:
+        try:
+            _scope.reset(token)
+        except ValueError:
+            # 异步生成器在其他上下文中被关闭
+            _scope.set(outer)
+
+
+def _today() -> datetime.date:
+    return datetime.datetime.now(datetime.timezone.utc).date()
+
+
+class UsageAccumulator:
+    """进程内的用量累加器"""
+
+    def __init__(self, default_daily_quota: Optional[int] = None):
+        self.default_daily_quota = (
+            settings.LLM_PROJECT_DAILY_TOKEN_QUOTA if default_daily_quota is None else default_daily_quota
+        )
+        self._pending: Dict[UsageKey, UsageRow] = {}
+        self._lock = threading.Lock()
+        self._day = _today()
+        # 当天各项目的用量：上次刷新时数据库中的总量 + 本进程此后的用量
+        self._project_tokens: Dict[int, int] = {}
+        # 项目的每日配额（覆盖默认值，0 表示不限）
+        self._quotas: Dict[int, int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _roll_day(self) -> None:
+        today = _today()
+        if today != self._day:
+            self._day = today
+            self._project_tokens = {}
+
+    def record(self, model: str, usage: TokenUsage, scope: Optional[UsageScope] = None) -> None:
+        """记录一次上游调用的用量"""
+        scope = scope or _scope.get()
+        with self._lock:
+            self._roll_day()
+            key = UsageKey(self._day, scope.agent or "", scope.project_id, scope.user_id, model)
+            row = self._pending.get(key)
+            if row is None:
+                row = self._pending[key] = UsageRow(key)
+            row.requests += 1
+            row.prompt_tokens += usage.prompt_tokens
+            row.completion_tokens += usage.completion_tokens
+            if scope.project_id is not None:
+                self._project_tokens[scope.project_id] = (
+                    self._project_tokens.get(scope.project_id, 0) + usage.total_tokens
+                )
+
+    def quota(self, project_id: int) -> int:
+        return self._quotas.get(project_id, self.default_daily_quota)
+
+    def used(self, project_id: int) -> int:
+        with self._lock:
+            self._roll_day()
+            return self._project_tokens.get(project_id, 0)
+
+    def remaining(self, project_id: int) -> Optional[int]:
+        """项目当天剩余的token数；不限额时返回 None"""
+        limit = self.quota(project_id)
+        return max(0, limit - self.used(project_id)) if limit else None
+
+    def check_quota(self, project_id: Optional[int] = None) -> None:
+        """检查项目配额（默认取当前归属的项目），用尽时抛出 QuotaExceededError"""
+        if project_id is None:
+            project_id = _scope.get().project_id
+        if project_id is None:
+            return
+        limit = self.quota(project_id)
+        if limit:
+            used = self.used(project_id)
+            if used >= limit:
+                raise QuotaExceededError(project_id, used, limit)
+
+    def drain(self) -> List[UsageRow]:
+        """取出尚未写库的累计用量"""
+        with self._lock:
+            rows = list(self._pending.values())
+            self._pending = {}
+        return rows
+
+    def restore(self, rows: List[UsageRow]) -> None:
+        """写库失败时放回累计用量，下次一并写入"""
+        with self._lock:
+            for row in rows:
+                pending = self._pending.get(row.key)
+                if pending is None:
+                    self._pending[row.key] = row
+                else:
+                    pending.requests += row.requests
+                    pending.prompt_tokens += row.prompt_tokens
+                    pending.completion_tokens += row.completion_tokens
+
+    def sync(self, day: datetime.date, project_tokens: Dict[int, int], quotas: Dict[int, int]) -> None:
+        """用数据库中的项目总量与配额刷新本地视图（加上此后本进程新增、尚未写库的用量）"""
+        with self._lock:
+            self._quotas = dict(quotas)
+            if day != self._day:
+                return
+            totals = dict(project_tokens)
+            for row in self._pending.values():
+                if row.key.day == day and row.key.project_id is not None:
+                    totals[row.key.project_id] = (
+                        totals.get(row.key.project_id, 0) + row.prompt_tokens + row.completion_tokens
+                    )
+            self._project_tokens = totals
+
+    async def run_periodic(self, flush: Callable[[], None], interval: Optional[float] = None) -> None:
+        """定期在线程池中执行 flush（写库并 sync），直到任务被取消"""
+        interval = interval or settings.LLM_USAGE_FLUSH_SECONDS
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await loop.run_in_executor(None, flush)
+            except Exception as e:
+                logger.warning(f"写入LLM用量失败: {e}")
+
+    def start(self, flush: Callable[[], None], interval: Optional[float] = None) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run_periodic(flush, interval))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+default_usage = UsageAccumulator()
@@ -0,0 +1,35 @@
+# 记忆基类
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+@dataclass
+class MemoryMatch:
+    """检索结果"""
+    id: str
+    score: float
+    project_id: Optional[int] = None
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+class BaseMemory(ABC):
+    """向量记忆基类：按ID存取向量，按相似度检索"""
+
+    @abstractmethod
+    def add(self, ids: Sequence[str], vectors: np.ndarray, project_ids: Optional[Sequence[Optional[int]]] = None,
+            metadata: Optional[Sequence[Dict[str, Any]]] = None) -> None:
+        """添加或覆盖向量"""
+        pass
+
+    @abstractmethod
+    def delete(self, ids: Sequence[str]) -> int:
+        """删除向量，返回实际删除的数量"""
+        pass
+
+    @abstractmethod
+    def search(self, query: np.ndarray, k: int = 10, project_id: Optional[int] = None) -> List[MemoryMatch]:
+        """检索最相似的 k 条"""
+        pass
@@ -0,0 +1,183 @@
+"""
+对话短期记忆
+
+- 滑动token窗口：只原样保留最近 window_tokens 内的消息
+- 窗口外的旧消息折叠进滚动摘要：新摘要 = LLM(旧摘要 + 新移出窗口的消息)，只处理增量
+- 摘要在后台任务中生成，不阻塞当前回合；摘要完成前，移出窗口的消息仍原样发送，不会丢失内容
+- 每回合报告与发送全部历史相比节省的token数
+
+    memory = ConversationMemory(llm)
+    memory.add("user", "...")
+    messages, stats = memory.context()
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from scrumix.agents.llm.base import BaseLLM
+from scrumix.agents.prompts.tokens import MESSAGE_OVERHEAD, count_tokens
+from scrumix.agents.utils.logger import logger
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a Scrum team member and an assistant. "
+    "Merge the new messages into the existing summary. Keep decisions, open questions, action items, "
+    "names, numbers and IDs; drop small talk. Reply with the updated summary only."
+)
+SUMMARY_PREFIX = "Summary of the earlier conversation:"
+
+
+@dataclass
+class MemoryTurnStats:
+    """一个回合发送的历史token统计"""
+    full_tokens: int = 0
+    sent_tokens: int = 0
+    summarized_messages: int = 0
+    window_messages: int = 0
+    summary_pending: bool = False
+
+    @property
+    def saved_tokens(self) -> int:
+        return max(0, self.full_tokens - self.sent_tokens)
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "full_tokens": self.full_tokens,
+            "sent_tokens": self.sent_tokens,
+            "saved_tokens": self.saved_tokens,
+            "summarized_messages": self.summarized_messages,
+            "window_messages": self.window_messages,
+            "summary_pending": self.summary_pending,
+        }
+
+
+class ConversationMemory:
+    """带滚动摘要的对话记忆"""
+
+    def __init__(self, llm: BaseLLM, window_tokens: int = 4000, summary_tokens: int = 500,
+                 min_fold_tokens: Optional[int] = None, model: Optional[str] = None):
+        self.llm = llm
+        self.window_tokens = window_tokens
+        self.summary_tokens = summary_tokens
+        # 移出窗口的消息累计到该数量才触发摘要，避免每回合都调用LLM
+        self.min_fold_tokens = min_fold_tokens if min_fold_tokens is not None else window_tokens // 4
+        self.model = model or getattr(llm, "model_name", None)
+        self.messages: List[Dict[str, str]] = []
+        self._tokens: List[int] = []
+        self.summary = ""
+        self.summary_tokens_used = 0
+        # messages[:summarized] 已折叠进摘要
+        self.summarized = 0
+        self.total_saved_tokens = 0
+        self.last_stats: Optional[MemoryTurnStats] = None
+        self.updated_at = time.time()
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, role: str, content: str) -> None:
+        """追加消息；窗口外未摘要的消息足够多时在后台更新摘要"""
+        self.messages.append({"role": role, "content": content})
+        self._tokens.append(count_tokens(content, self.model) + MESSAGE_OVERHEAD)
+        self.updated_at = time.time()
+        self._maybe_fold()
+
+    def _window_start(self) -> int:
+        """滑动窗口的起点（至少保留最后一条消息）"""
+        total = 0
+        start = len(self.messages)
+        while start > 0 and (start == len(self.messages) or total + self._tokens[start - 1] <= self.window_tokens):
+            start -= 1
+            total += self._tokens[start]
+        return start
+
+    def _maybe_fold(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        end = self._window_start()
+        if sum(self._tokens[self.summarized:end]) < max(1, self.min_fold_tokens):
+            return
+        try:
+            self._task = asyncio.get_running_loop().create_task(self._fold(end))
+        except RuntimeError:
+            # 没有运行中的事件循环（同步调用）时，推迟到下一次在循环内 add
+            pass
+
+    async def _fold(self, end: int) -> None:
+        start = self.summarized
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in self.messages[start:end])
+        prompt = f"Existing summary:\n{self.summary or '(none)'}\n\nNew messages:\n{transcript}"
+        try:
+            summary = await self.llm.chat(
+                [{"role": "system", "content": SUMMARY_PROMPT}, {"role": "user", "content": prompt}],
+                max_tokens=self.summary_tokens,
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"对话摘要失败，保留原始消息: {e}")
+            return
+        self.summary = summary.strip()
+        self.summary_tokens_used = count_tokens(f"{SUMMARY_PREFIX}\n{self.summary}", self.model) + MESSAGE_OVERHEAD
+        self.summarized = end
+        # 摘要期间又有消息移出窗口时继续折叠
+        self._task = None
+        self._maybe_fold()
+
+    def context(self) -> Tuple[List[Dict[str, str]], MemoryTurnStats]:
+        """本回合要发送的历史消息：摘要 + 未折叠的消息"""
+        messages: List[Dict[str, str]] = []
+        sent = 0
+        if self.summarized:
+            messages.append({"role": "system", "content": f"{SUMMARY_PREFIX}\n{self.summary}"})
+            sent += self.summary_tokens_used
+        messages.extend(self.messages[self.summarized:])
+        sent += sum(self._tokens[self.summarized:])
+        stats = MemoryTurnStats(
+            full_tokens=sum(self._tokens),
+            sent_tokens=sent,
+            summarized_messages=self.summarized,
+            window_messages=len(self.messages) - self._window_start(),
+            summary_pending=self.pending,
+        )
+        self.total_saved_tokens += stats.saved_tokens
+        self.last_stats = stats
+        return messages, stats
+
+    @property
+    def pending(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def wait(self) -> None:
+        """等待进行中的摘要完成"""
+        while self.pending:
+            await asyncio.shield(self._task)
+
+    def close(self) -> None:
+        if self.pending:
+            self._task.cancel()
+
+
+class ConversationMemoryStore:
+    """进程内的对话记忆表，按最近使用淘汰"""
+
+    def __init__(self, llm: BaseLLM, max_conversations: int = 1000, **options):
+        self.llm = llm
+        self.max_conversations = max_conversations
+        self.options = options
+        self._memories: "OrderedDict[Hashable, ConversationMemory]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> ConversationMemory:
+        with self._lock:
+            memory = self._memories.get(key)
+            if memory is None:
+                memory = self._memories[key] = ConversationMemory(self.llm, **self.options)
+            self._memories.move_to_end(key)
+            while len(self._memories) > self.max_conversations:
+                _, evicted = self._memories.popitem(last=False)
+                evicted.close()
+            return memory
+
+    def __len__(self) -> int:
+        return len(self._memories)
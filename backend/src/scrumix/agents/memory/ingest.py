@@ -0,0 +1,235 @@
+"""
+增量嵌入管道
+
+把 backlog 条目、会议记录、文档等写入向量记忆：
+- 流式读取文档，逐个切块；切块边界由内容决定（段落哈希），局部修改只影响附近的块
+- 块ID = "<source_id>#<内容哈希>"，已存在的块直接跳过，文档中消失的块被删除
+- 新块按条数和token数分批，批次在 BaseLLM 的调度预算下并发计算向量
+- 每个提交窗口的添加与删除在一个事务中提交（VectorStore.apply），文档不会处于半更新状态
+"""
+import asyncio
+import hashlib
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+from scrumix.api.core.config import settings
+from scrumix.agents.llm.base import BaseLLM
+from scrumix.agents.memory.vector_store import VectorStore
+from scrumix.agents.prompts.tokens import count_tokens
+
+# 段落哈希对该值取模为0时切块，平均每 CUT_MODULUS 个段落一个内容决定的边界
+CUT_MODULUS = 4
+
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_SENTENCE_RE = re.compile(r"(?<=[.!?。！？])\s+")
+
+
+@dataclass
+class Document:
+    """待写入记忆的文档"""
+    source_id: str
+    text: str
+    project_id: Optional[int] = None
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class IngestStats:
+    """一次写入的统计"""
+    documents: int = 0
+    chunks: int = 0
+    embedded: int = 0
+    skipped: int = 0
+    deleted: int = 0
+    batches: int = 0
+    embedded_tokens: int = 0
+    elapsed: float = 0.0
+
+
+def _split_long(paragraph: str, max_chars: int) -> List[str]:
+    """过长的段落按句子切分，单句仍过长时按字符切分"""
+    pieces: List[str] = []
+    current = ""
+    for sentence in _SENTENCE_RE.split(paragraph):
+        while len(sentence) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            pieces.append(current)
+            current = ""
+        current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def chunk_text(text: str, max_chars: int = 1200, min_chars: int = 200) -> List[str]:
+    """
+    按段落切块
+    在段落哈希命中 CUT_MODULUS 处或长度将超过 max_chars 时切分，
+    修改一个段落后，后续的块在下一个哈希边界处恢复与原来一致。
+    """
+    chunks: List[str] = []
+    current: List[str] = []
+    length = 0
+    for paragraph in _PARAGRAPH_RE.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        for piece in _split_long(paragraph, max_chars) if len(paragraph) > max_chars else [paragraph]:
+            if current and length + len(piece) > max_chars:
+                chunks.append("\n\n".join(current))
+                current, length = [], 0
+            current.append(piece)
+            length += len(piece) + 2
+            digest = hashlib.md5(piece.encode()).digest()
+            if length >= min_chars and digest[0] % CUT_MODULUS == 0:
+                chunks.append("\n\n".join(current))
+                current, length = [], 0
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def chunk_hash(text: str, model: str = "") -> str:
+    """块内容哈希；包含嵌入模型名，换模型后自动重新计算"""
+    return hashlib.sha256(f"{model}\0{text}".encode()).hexdigest()
+
+
+def make_batches(texts: List[str], max_items: int, max_tokens: int) -> List[List[int]]:
+    """按条数与token数上限分批，返回每批的下标"""
+    batches: List[List[int]] = []
+    current: List[int] = []
+    tokens = 0
+    for i, text in enumerate(texts):
+        cost = count_tokens(text) + 1
+        if current and (len(current) >= max_items or tokens + cost > max_tokens):
+            batches.append(current)
+            current, tokens = [], 0
+        current.append(i)
+        tokens += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+async def _aiter(documents: Union[Iterable[Document], AsyncIterable[Document]]) -> AsyncIterator[Document]:
+    if hasattr(documents, "__aiter__"):
+        async for document in documents:
+            yield document
+    else:
+        for document in documents:
+            yield document
+
+
+@dataclass
+class _PendingChunk:
+    id: str
+    text: str
+    project_id: Optional[int]
+    metadata: Dict[str, Any]
+
+
+class IngestionPipeline:
+    """增量嵌入管道"""
+
+    def __init__(self, store: VectorStore, llm: BaseLLM, batch_size: Optional[int] = None,
+                 batch_tokens: Optional[int] = None, concurrency: int = 4, commit_every: int = 500,
+                 chunker: Callable[[str], List[str]] = chunk_text):
+        self.store = store
+        self.llm = llm
+        self.batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+        self.batch_tokens = batch_tokens or settings.EMBEDDING_BATCH_TOKENS
+        self.concurrency = concurrency
+        self.commit_every = commit_every
+        self.chunker = chunker
+        self.model = getattr(llm, "embedding_model", llm.model_name)
+
+    async def ingest(self, documents: Union[Iterable[Document], AsyncIterable[Document]]) -> IngestStats:
+        """写入文档（新增或更新）"""
+        stats = IngestStats()
+        started = time.monotonic()
+        window: List[Document] = []
+        async for document in _aiter(documents):
+            window.append(document)
+            if len(window) >= self.commit_every:
+                await self._process(window, stats)
+                window = []
+        if window:
+            await self._process(window, stats)
+        stats.elapsed = time.monotonic() - started
+        return stats
+
+    def delete_sources(self, source_ids: Iterable[str]) -> int:
+        """删除文档的全部块"""
+        ids = [i for source_id in source_ids for i in self.store.ids_with_prefix(f"{source_id}#")]
+        return self.store.delete(ids)
+
+    def _existing_chunks(self, source_ids: Iterable[str]) -> Dict[str, set]:
+        """各文档已有的块ID"""
+        return {source_id: set(self.store.ids_with_prefix(f"{source_id}#")) for source_id in source_ids}
+
+    async def _process(self, documents: List[Document], stats: IngestStats) -> None:
+        pending: Dict[str, _PendingChunk] = {}
+        delete_ids: List[str] = []
+        # 同一窗口中同一文档出现多次时以最后一次为准
+        latest = {document.source_id: document for document in documents}
+        # 向量存储的 SQLite 查询与写入在线程池中执行，不阻塞事件循环
+        loop = asyncio.get_running_loop()
+        existing_chunks = await loop.run_in_executor(None, self._existing_chunks, list(latest))
+        for document in latest.values():
+            stats.documents += 1
+            wanted = {}
+            for text in self.chunker(document.text):
+                chunk_id = f"{document.source_id}#{chunk_hash(text, self.model)[:24]}"
+                wanted[chunk_id] = text
+            stats.chunks += len(wanted)
+            existing = existing_chunks[document.source_id]
+            for chunk_id, text in wanted.items():
+                if chunk_id in existing:
+                    stats.skipped += 1
+                    continue
+                metadata = {**document.metadata, "source_id": document.source_id, "text": text}
+                pending[chunk_id] = _PendingChunk(chunk_id, text, document.project_id, metadata)
+            delete_ids.extend(existing - wanted.keys())
+
+        chunks = list(pending.values())
+        vectors = await self._embed([chunk.text for chunk in chunks], stats)
+        stats.embedded += len(chunks)
+        stats.deleted += await loop.run_in_executor(
+            None,
+            self.store.apply,
+            [chunk.id for chunk in chunks],
+            vectors,
+            [chunk.project_id for chunk in chunks],
+            [chunk.metadata for chunk in chunks],
+            delete_ids,
+        )
+
+    async def _embed(self, texts: List[str], stats: IngestStats) -> np.ndarray:
+        """分批并发计算向量，相同文本只计算一次"""
+        if not texts:
+            return np.empty((0, self.store.dim), dtype=np.float32)
+        unique = list(dict.fromkeys(texts))
+        vectors: List[Optional[List[float]]] = [None] * len(unique)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(batch: List[int]) -> None:
+            async with semaphore:
+                result = await self.llm.embed([unique[i] for i in batch])
+            for i, vector in zip(batch, result):
+                vectors[i] = vector
+
+        batches = make_batches(unique, self.batch_size, self.batch_tokens)
+        stats.batches += len(batches)
+        stats.embedded_tokens += sum(count_tokens(text) + 1 for text in unique)
+        await asyncio.gather(*(run(batch) for batch in batches))
+        position = {text: i for i, text in enumerate(unique)}
+        return np.asarray([vectors[position[text]] for text in texts], dtype=np.float32)
@@ -0,0 +1,470 @@
+"""
+向量记忆存储
+
+- 向量以 float32 存放在磁盘上的内存映射数组中，写入前归一化，内积即余弦相似度
+- 小集合用 NumPy 暴力检索（精确）；超过 ivf_threshold 后自动训练 IVF 索引
+  （球面 k-means 质心 + 倒排列表），检索时只扫描最相近的 nprobe 个列表
+- 按 project_id 过滤；项目内向量较少时直接对该项目暴力检索，保证召回
+- 增量添加只追加槽位并分配到最近的倒排列表，删除只打墓碑，都不需要重建索引；
+  墓碑过多时调用 compact() 回收空间
+
+目录结构:
+    vectors.f32     (capacity, dim) float32 内存映射数组（compact() 后与 vectors.compact.f32 交替使用）
+    items.sqlite3   id / 槽位 / project_id / metadata，以及维度、已用槽位数和当前向量文件名
+    ivf.npz         IVF 质心与各槽位所属列表（训练后写入）
+
+写入顺序：先把向量写入未使用的新槽位并刷盘，再在一个 SQLite 事务中提交 id 映射和已用槽位数，
+进程中途退出时不会出现半写入的向量；apply() 可在同一事务中同时添加与删除。
+compact() 同理：先把存活向量写入另一个文件，再在一个事务中提交新的槽位映射和文件名，提交前旧文件保持不变。
+"""
+import json
+import math
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from scrumix.agents.memory.base import BaseMemory, MemoryMatch
+
+NO_PROJECT = -1
+INITIAL_CAPACITY = 1024
+VECTOR_FILES = ("vectors.f32", "vectors.compact.f32")
+# 分批计算与质心的相似度，限制临时矩阵大小
+ASSIGN_BATCH_SIZE = 16_384
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """按行L2归一化为 float32"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """分数最高的 k 个下标（降序）"""
+    if k >= len(scores):
+        return np.argsort(-scores)
+    part = np.argpartition(-scores, k)[:k]
+    return part[np.argsort(-scores[part])]
+
+
+class IVFIndex:
+    """倒排文件索引：每个槽位归属最近的质心"""
+
+    def __init__(self, centroids: np.ndarray, assignments: np.ndarray):
+        self.centroids = centroids
+        self.assignments = assignments
+        self._lists: List[np.ndarray] = []
+        self._extra: List[List[int]] = []
+        self._rebuild_lists()
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    def _rebuild_lists(self) -> None:
+        valid = np.flatnonzero(self.assignments >= 0)
+        order = valid[np.argsort(self.assignments[valid], kind="stable")]
+        bounds = np.searchsorted(self.assignments[order], np.arange(self.n_lists + 1))
+        self._lists = [order[bounds[i]:bounds[i + 1]] for i in range(self.n_lists)]
+        self._extra = [[] for _ in range(self.n_lists)]
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, n_lists: int, iterations: int = 10,
+              sample_size: Optional[int] = None, seed: int = 0) -> "IVFIndex":
+        """在样本上训练球面 k-means 质心，再把全部向量分配到列表"""
+        rng = np.random.default_rng(seed)
+        n = len(vectors)
+        n_lists = max(1, min(n_lists, n))
+        sample_size = min(n, sample_size or n_lists * 32)
+        sample = np.asarray(vectors[np.sort(rng.choice(n, sample_size, replace=False))])
+        centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+
+        for _ in range(iterations):
+            labels = cls._nearest(centroids, sample)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=n_lists)
+            empty = counts == 0
+            if empty.any():
+                # 空簇用随机样本重新初始化
+                sums[empty] = sample[rng.choice(sample_size, int(empty.sum()), replace=False)]
+            centroids = normalize(sums)
+
+        index = cls(centroids, np.empty(0, dtype=np.int32))
+        index.assignments = index.assign(vectors)
+        index._rebuild_lists()
+        return index
+
+    @staticmethod
+    def _nearest(centroids: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+        labels = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), ASSIGN_BATCH_SIZE):
+            batch = np.asarray(vectors[start:start + ASSIGN_BATCH_SIZE])
+            labels[start:start + len(batch)] = np.argmax(batch @ centroids.T, axis=1)
+        return labels
+
+    def assign(self, vectors: np.ndarray) -> np.ndarray:
+        """最近质心编号"""
+        return self._nearest(self.centroids, vectors)
+
+    def add(self, slots: np.ndarray, vectors: np.ndarray) -> None:
+        """增量加入新槽位"""
+        labels = self.assign(vectors)
+        end = int(slots.max()) + 1 if len(slots) else 0
+        if end > len(self.assignments):
+            grown = np.full(max(end, len(self.assignments) * 2), -1, dtype=np.int32)
+            grown[:len(self.assignments)] = self.assignments
+            self.assignments = grown
+        self.assignments[slots] = labels
+        for slot, label in zip(slots.tolist(), labels.tolist()):
+            self._extra[label].append(slot)
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """最近 nprobe 个列表中的全部槽位"""
+        probes = top_k(self.centroids @ query, min(nprobe, self.n_lists))
+        parts = []
+        for i in probes:
+            parts.append(self._lists[i])
+            if self._extra[i]:
+                parts.append(np.asarray(self._extra[i], dtype=np.int64))
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    def save(self, path: str) -> None:
+        np.savez(path, centroids=self.centroids, assignments=self.assignments)
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        with np.load(path) as data:
+            return cls(data["centroids"], data["assignments"])
+
+
+class VectorStore(BaseMemory):
+    """磁盘内存映射的向量存储，支持暴力检索与 IVF 索引"""
+
+    def __init__(self, path: str, dim: int, ivf_threshold: int = 50_000, nprobe: Optional[int] = None):
+        self.path = path
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self._lock = threading.RLock()
+        os.makedirs(path, exist_ok=True)
+
+        self._db = sqlite3.connect(os.path.join(path, "items.sqlite3"), check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS items (id TEXT PRIMARY KEY, slot INTEGER NOT NULL UNIQUE,"
+            " project_id INTEGER, metadata TEXT)"
+        )
+        meta = dict(self._db.execute("SELECT key, value FROM meta").fetchall())
+        if "dim" in meta and int(meta["dim"]) != dim:
+            raise ValueError(f"向量维度不匹配: 存储为 {meta['dim']}，传入 {dim}")
+        self.dim = dim
+        self.size = int(meta.get("size", 0))
+        if "dim" not in meta:
+            self._db.execute("INSERT INTO meta (key, value) VALUES ('dim', ?), ('size', '0')", (str(dim),))
+
+        self._vectors_path = os.path.join(path, meta.get("vectors", VECTOR_FILES[0]))
+        self._index_path = os.path.join(path, "ivf.npz")
+        # 中途退出的 compact() 留下的未提交文件
+        spare = self._spare_vectors_path()
+        if os.path.exists(spare):
+            os.remove(spare)
+        self._open_vectors(max(INITIAL_CAPACITY, self.size))
+        self._load_items()
+        self.index: Optional[IVFIndex] = None
+        if os.path.exists(self._index_path):
+            self._load_index()
+
+    # ---- 存储 ----
+
+    def _open_vectors(self, capacity: int) -> None:
+        """打开（必要时扩展）内存映射文件"""
+        nbytes = capacity * self.dim * 4
+        current = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+        if current < nbytes:
+            with open(self._vectors_path, "ab") as f:
+                f.truncate(nbytes)
+        else:
+            capacity = current // (self.dim * 4)
+        self.capacity = capacity
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def _spare_vectors_path(self) -> str:
+        """compact() 写入的另一个向量文件"""
+        name = os.path.basename(self._vectors_path)
+        return os.path.join(self.path, VECTOR_FILES[1] if name == VECTOR_FILES[0] else VECTOR_FILES[0])
+
+    def _ensure_capacity(self, needed: int) -> None:
+        if needed <= self.capacity:
+            return
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        self._vectors.flush()
+        del self._vectors
+        self._open_vectors(capacity)
+        for name in ("_project_ids", "_alive"):
+            old = getattr(self, name)
+            grown = np.full(capacity, NO_PROJECT if name == "_project_ids" else False, dtype=old.dtype)
+            grown[:len(old)] = old
+            setattr(self, name, grown)
+
+    def _load_items(self) -> None:
+        """从 SQLite 重建内存中的 id 映射、项目数组与存活标记"""
+        self._slots: Dict[str, int] = {}
+        self._ids: Dict[int, str] = {}
+        self._project_ids = np.full(self.capacity, NO_PROJECT, dtype=np.int64)
+        self._alive = np.zeros(self.capacity, dtype=bool)
+        for item_id, slot, project_id in self._db.execute("SELECT id, slot, project_id FROM items"):
+            self._slots[item_id] = slot
+            self._ids[slot] = item_id
+            self._project_ids[slot] = NO_PROJECT if project_id is None else project_id
+            self._alive[slot] = True
+
+    def _load_index(self) -> None:
+        self.index = IVFIndex.load(self._index_path)
+        # 训练后新增的槽位在加载时补充分配
+        start = len(self.index.assignments)
+        missing = np.arange(start, self.size)
+        if len(missing):
+            self.index.add(missing, self._vectors[start:self.size])
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._slots
+
+    def ids(self, project_id: Optional[int] = None) -> List[str]:
+        """全部ID，可按项目过滤"""
+        if project_id is None:
+            return list(self._slots)
+        return [i for i, slot in self._slots.items() if self._project_ids[slot] == project_id]
+
+    def ids_with_prefix(self, prefix: str) -> List[str]:
+        """以 prefix 开头的ID（走主键索引的范围查询）"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id FROM items WHERE id >= ? AND id < ?", (prefix, prefix + "\U0010ffff")
+            )
+            return [row[0] for row in rows]
+
+    def get_vector(self, item_id: str) -> Optional[np.ndarray]:
+        slot = self._slots.get(item_id)
+        return None if slot is None else np.array(self._vectors[slot])
+
+    # ---- 写入 ----
+
+    def add(self, ids: Sequence[str], vectors: np.ndarray, project_ids: Optional[Sequence[Optional[int]]] = None,
+            metadata: Optional[Sequence[Dict[str, Any]]] = None) -> None:
+        """添加或覆盖向量；覆盖时旧槽位打墓碑"""
+        self.apply(ids, vectors, project_ids, metadata)
+
+    def delete(self, ids: Iterable[str]) -> int:
+        """删除向量（打墓碑，不重建索引）"""
+        return self.apply(delete_ids=ids)
+
+    def apply(self, ids: Sequence[str] = (), vectors: Optional[np.ndarray] = None,
+              project_ids: Optional[Sequence[Optional[int]]] = None,
+              metadata: Optional[Sequence[Dict[str, Any]]] = None, delete_ids: Iterable[str] = ()) -> int:
+        """在一个事务中添加/覆盖 ids 并删除 delete_ids，返回删除的数量"""
+        ids = list(ids)
+        vectors = normalize(vectors if vectors is not None else np.empty((0, self.dim))).reshape(-1, self.dim)
+        if len(ids) != len(vectors):
+            raise ValueError("ids 与 vectors 数量不一致")
+        if len(set(ids)) != len(ids):
+            raise ValueError("ids 中存在重复")
+        project_ids = list(project_ids) if project_ids is not None else [None] * len(ids)
+        metadata = list(metadata) if metadata is not None else [None] * len(ids)
+
+        with self._lock:
+            added = set(ids)
+            deleted = [(i, self._slots[i]) for i in dict.fromkeys(delete_ids) if i in self._slots and i not in added]
+            if not ids and not deleted:
+                return 0
+            start = self.size
+            end = start + len(ids)
+            self._ensure_capacity(end)
+            # 1. 向量写入新槽位并刷盘（尚未被任何 id 引用）
+            if ids:
+                self._vectors[start:end] = vectors
+                self._vectors.flush()
+
+            # 2. 一个事务内提交 id 映射、删除与已用槽位数
+            replaced = [self._slots[i] for i in ids if i in self._slots]
+            rows = [
+                (item_id, start + n, project_ids[n], json.dumps(metadata[n], ensure_ascii=False)
+                 if metadata[n] is not None else None)
+                for n, item_id in enumerate(ids)
+            ]
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO items (id, slot, project_id, metadata) VALUES (?, ?, ?, ?)", rows
+                )
+                self._db.executemany("DELETE FROM items WHERE id = ?", [(i,) for i, _ in deleted])
+                self._db.execute("UPDATE meta SET value = ? WHERE key = 'size'", (str(end),))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+            # 3. 更新内存状态
+            self.size = end
+            for slot in replaced:
+                self._alive[slot] = False
+                self._ids.pop(slot, None)
+            for item_id, slot in deleted:
+                del self._slots[item_id]
+                self._ids.pop(slot, None)
+                self._alive[slot] = False
+            for n, item_id in enumerate(ids):
+                slot = start + n
+                self._slots[item_id] = slot
+                self._ids[slot] = item_id
+                self._project_ids[slot] = NO_PROJECT if project_ids[n] is None else project_ids[n]
+                self._alive[slot] = True
+
+            if ids:
+                if self.index is not None:
+                    self.index.add(np.arange(start, end), vectors)
+                elif len(self._slots) >= self.ivf_threshold:
+                    self.build_index()
+            return len(deleted)
+
+    # ---- 索引 ----
+
+    def default_n_lists(self) -> int:
+        return max(1, int(math.sqrt(max(len(self._slots), 1))))
+
+    def build_index(self, n_lists: Optional[int] = None, iterations: int = 10) -> IVFIndex:
+        """训练（或重新训练）IVF 索引并保存"""
+        with self._lock:
+            live = np.flatnonzero(self._alive[:self.size])
+            index = IVFIndex.train(self._vectors[live], n_lists or self.default_n_lists(), iterations)
+            assignments = np.full(self.size, -1, dtype=np.int32)
+            assignments[live] = index.assignments
+            index.assignments = assignments
+            index._rebuild_lists()
+            index.save(self._index_path)
+            self.index = index
+            return index
+
+    def drop_index(self) -> None:
+        """删除 IVF 索引，退回暴力检索"""
+        with self._lock:
+            self.index = None
+            if os.path.exists(self._index_path):
+                os.remove(self._index_path)
+
+    def compact(self) -> None:
+        """回收墓碑槽位：存活向量重新紧凑排列，并重建索引"""
+        with self._lock:
+            live = np.flatnonzero(self._alive[:self.size])
+            if len(live) == self.size:
+                return
+            # 1. 存活向量写入另一个文件并刷盘（当前文件与映射保持不变）
+            capacity = max(INITIAL_CAPACITY, len(live))
+            new_path = self._spare_vectors_path()
+            with open(new_path, "wb") as f:
+                f.truncate(capacity * self.dim * 4)
+            try:
+                compacted = np.memmap(new_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+                compacted[:len(live)] = self._vectors[live]
+                compacted.flush()
+                del compacted
+                # 旧索引引用旧槽位，提交前删除（之后按需重建）
+                had_index = self.index is not None
+                self.drop_index()
+
+                # 2. 一个事务内提交新槽位、已用槽位数与向量文件名
+                moves = [(int(new), self._ids[int(old)]) for new, old in enumerate(live)]
+                self._db.execute("BEGIN")
+                try:
+                    # 先移到负数槽位避免 UNIQUE 冲突
+                    self._db.execute("UPDATE items SET slot = -slot - 1")
+                    self._db.executemany("UPDATE items SET slot = ? WHERE id = ?", moves)
+                    self._db.execute("UPDATE meta SET value = ? WHERE key = 'size'", (str(len(live)),))
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO meta (key, value) VALUES ('vectors', ?)", (os.path.basename(new_path),)
+                    )
+                    self._db.execute("COMMIT")
+                except BaseException:
+                    self._db.execute("ROLLBACK")
+                    raise
+            except BaseException:
+                os.remove(new_path)
+                raise
+
+            # 3. 切换到新文件并删除旧文件
+            old_path = self._vectors_path
+            del self._vectors
+            self._vectors_path = new_path
+            self._open_vectors(capacity)
+            os.remove(old_path)
+            self.size = len(live)
+            self._load_items()
+            if had_index or len(self._slots) >= self.ivf_threshold:
+                self.build_index()
+
+    # ---- 检索 ----
+
+    def search(self, query: np.ndarray, k: int = 10, project_id: Optional[int] = None,
+               nprobe: Optional[int] = None) -> List[MemoryMatch]:
+        """检索最相似的 k 条，可按项目过滤"""
+        q = normalize(query).reshape(self.dim)
+        with self._lock:
+            if not self._slots:
+                return []
+            alive = self._alive[:self.size]
+            if project_id is not None:
+                mask = alive & (self._project_ids[:self.size] == project_id)
+                if self.index is None or mask.sum() < self.ivf_threshold:
+                    slots = np.flatnonzero(mask)
+                    return self._rank(slots, self._vectors[slots] @ q, k)
+            if self.index is None:
+                scores = self._vectors[:self.size] @ q
+                scores[~alive] = -np.inf
+                slots = top_k(scores, k)
+                slots = slots[np.isfinite(scores[slots])]
+                return self._rank(slots, scores[slots], k)
+
+            nprobe = nprobe or self.nprobe or max(8, self.index.n_lists // 20)
+            slots = self.index.candidates(q, nprobe)
+            keep = self._alive[slots]
+            if project_id is not None:
+                keep &= self._project_ids[slots] == project_id
+            slots = slots[keep]
+            return self._rank(slots, self._vectors[slots] @ q, k)
+
+    def _rank(self, slots: np.ndarray, scores: np.ndarray, k: int) -> List[MemoryMatch]:
+        order = top_k(scores, k)
+        slots, scores = slots[order], scores[order]
+        ids = [self._ids[int(s)] for s in slots]
+        metadata = self._metadata(ids)
+        return [
+            MemoryMatch(
+                id=item_id,
+                score=float(score),
+                project_id=None if self._project_ids[slot] == NO_PROJECT else int(self._project_ids[slot]),
+                metadata=metadata.get(item_id) or {},
+            )
+            for item_id, slot, score in zip(ids, slots.tolist(), scores.tolist())
+        ]
+
+    def _metadata(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        rows = self._db.execute(f"SELECT id, metadata FROM items WHERE id IN ({placeholders})", ids)
+        return {item_id: json.loads(value) for item_id, value in rows if value}
+
+    def close(self) -> None:
+        with self._lock:
+            self._vectors.flush()
+            self._db.close()
@@ -0,0 +1,348 @@
+"""
+Sprint 规划优化器
+
+在团队容量内选择 backlog 条目（带依赖与成员容量约束的背包问题），贪心加修复：
+1. 打分（向量化）：按依赖层级传播，计算条目连同其前置的 优先级/故事点（链密度），
+   前置条目取其下游链密度的最大值，按密度排序
+2. 贪心：按得分顺序选择前置已满足的条目，分配给剩余容量最多的成员（或指定的负责人）
+3. 修复：用未选中的高优先级条目替换已选中、无下游依赖且优先级更低的条目，
+   弥补贪心按密度选择时漏掉大条目的问题；替换后再贪心填满剩余容量
+
+约定：
+- priority 越大越重要，也可使用 "critical"/"high"/"medium"/"low"
+- 依赖中不在候选列表里的条目视为已完成
+- 未估算（story_points 为 None）、负责人不在团队中、处于循环依赖中的条目及其下游不会被选中
+"""
+import heapq
+import operator
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+PRIORITY_VALUES = {"critical": 8.0, "high": 4.0, "medium": 2.0, "low": 1.0}
+# 计算密度时故事点的下限，0 点条目排在最前
+MIN_POINTS = 0.5
+# 成员下标：-1 表示任意成员，-2 表示指定的负责人不在团队中
+ANY_MEMBER = -1
+NOT_IN_TEAM = -2
+# 平均每层依赖边少于该值（深依赖链）时逐条边传播，避免逐层调用 ufunc.at 的固定开销
+MIN_EDGES_PER_LEVEL = 32
+_PY_OPS = {np.logical_or: operator.or_, np.add: operator.add, np.maximum: max}
+
+
+@dataclass
+class PlanItem:
+    """候选 backlog 条目"""
+    id: int
+    story_points: Optional[float]
+    priority: Union[float, str] = 1.0
+    depends_on: Sequence[int] = ()
+    assignee_id: Optional[int] = None
+
+
+@dataclass
+class TeamMember:
+    """成员及其本 Sprint 可投入的故事点"""
+    user_id: int
+    capacity: float
+
+
+@dataclass
+class SprintPlan:
+    """规划结果"""
+    assignments: Dict[int, int] = field(default_factory=dict)
+    total_points: float = 0.0
+    total_value: float = 0.0
+    capacity: float = 0.0
+    member_load: Dict[int, float] = field(default_factory=dict)
+    # 无法安排的条目：循环依赖、负责人不在团队、超出单人容量，或其前置无法安排
+    blocked: List[int] = field(default_factory=list)
+    unestimated: List[int] = field(default_factory=list)
+    swaps: int = 0
+    elapsed_ms: float = 0.0
+
+    @property
+    def utilization(self) -> float:
+        return self.total_points / self.capacity if self.capacity else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "assignments": [{"item_id": i, "user_id": u} for i, u in self.assignments.items()],
+            "total_points": self.total_points,
+            "total_value": self.total_value,
+            "capacity": self.capacity,
+            "utilization": round(self.utilization, 4),
+            "member_load": self.member_load,
+            "blocked": self.blocked,
+            "unestimated": self.unestimated,
+            "elapsed_ms": round(self.elapsed_ms, 2),
+        }
+
+
+def priority_value(priority: Union[float, str, None]) -> float:
+    if priority is None:
+        return PRIORITY_VALUES["medium"]
+    if isinstance(priority, str):
+        try:
+            return PRIORITY_VALUES[priority.lower()]
+        except KeyError:
+            raise ValueError(f"未知的优先级: {priority}") from None
+    return float(priority)
+
+
+def _csr(n: int, src: np.ndarray, dst: np.ndarray) -> Tuple[List[int], List[int]]:
+    """邻接表（src -> dst）的压缩表示：children[offsets[i]:offsets[i+1]]"""
+    order = np.argsort(src, kind="stable")
+    offsets = np.searchsorted(src[order], np.arange(n + 1))
+    return offsets.tolist(), dst[order].tolist()
+
+
+def _levels(n: int, dst: np.ndarray, offsets: List[int], children: List[int]) -> np.ndarray:
+    """拓扑层级（前置条目层级更小）；循环依赖中及其下游的条目为 -1"""
+    indegree = np.bincount(dst, minlength=n).tolist()
+    level = [0] * n
+    queue = deque(i for i in range(n) if indegree[i] == 0)
+    done = [False] * n
+    while queue:
+        node = queue.popleft()
+        done[node] = True
+        next_level = level[node] + 1
+        for k in range(offsets[node], offsets[node + 1]):
+            child = children[k]
+            if level[child] < next_level:
+                level[child] = next_level
+            indegree[child] -= 1
+            if indegree[child] == 0:
+                queue.append(child)
+    result = np.asarray(level, dtype=np.int64)
+    result[~np.asarray(done, dtype=bool)] = -1
+    return result
+
+
+class _LevelEdges:
+    """按前置条目层级（升序）排列的依赖边，bounds 为各层的起止位置"""
+
+    def __init__(self, src: np.ndarray, dst: np.ndarray, level: np.ndarray):
+        valid = level[src] >= 0
+        src, dst = src[valid], dst[valid]
+        order = np.argsort(level[src], kind="stable")
+        self.src, self.dst = src[order], dst[order]
+        _, starts = np.unique(level[self.src], return_index=True)
+        self.bounds = starts.tolist() + [len(self.src)]
+
+    def propagate(self, ufunc: np.ufunc, values: np.ndarray, reverse: bool = False) -> None:
+        """沿依赖边逐层传播：values[下游] = ufunc(values[下游], values[前置])；reverse 时由下游传给前置"""
+        n_levels = len(self.bounds) - 1
+        if n_levels * MIN_EDGES_PER_LEVEL <= len(self.src):
+            levels = list(zip(self.bounds[:-1], self.bounds[1:]))
+            for a, b in (reversed(levels) if reverse else levels):
+                s, d = self.src[a:b], self.dst[a:b]
+                if reverse:
+                    ufunc.at(values, s, values[d])
+                else:
+                    ufunc.at(values, d, values[s])
+            return
+        src, dst = self.src.tolist(), self.dst.tolist()
+        edges = zip(reversed(src), reversed(dst)) if reverse else zip(dst, src)
+        op = _PY_OPS[ufunc]
+        result = values.tolist()
+        for target, source in edges:
+            result[target] = op(result[target], result[source])
+        values[:] = result
+
+
+class _State:
+    """求解过程中的可变状态"""
+
+    def __init__(self, points: np.ndarray, fixed: np.ndarray, capacities: np.ndarray,
+                 offsets: List[int], children: List[int], dst: np.ndarray, src: np.ndarray):
+        n = len(points)
+        self.points_array = points
+        # 逐条循环中访问 Python 列表比访问 numpy 标量快
+        self.points = points.tolist()
+        self.fixed = fixed.tolist()
+        self.offsets = offsets
+        self.children = children
+        self.prerequisites = _csr(n, dst, src)
+        self.remaining = capacities.astype(float).tolist()
+        # 剩余容量的大顶堆 (-剩余, 成员下标)；容量变化时压入新值，过期的堆顶在读取时丢弃
+        self.capacity_heap = [(-r, j) for j, r in enumerate(self.remaining)]
+        heapq.heapify(self.capacity_heap)
+        self.member = [-1] * n
+        self.chosen = set()
+        # 尚未选中的前置条目数，为 0 时才能选择
+        self.pending = np.bincount(dst, minlength=n).tolist()
+        # 已选中的下游条目数，为 0 时才能被替换
+        self.selected_dependents = [0] * n
+
+    def _set_remaining(self, j: int, remaining: float) -> None:
+        self.remaining[j] = remaining
+        heapq.heappush(self.capacity_heap, (-remaining, j))
+
+    def most_remaining(self) -> int:
+        """剩余容量最多的成员下标"""
+        heap = self.capacity_heap
+        while -heap[0][0] != self.remaining[heap[0][1]]:
+            heapq.heappop(heap)
+        return heap[0][1]
+
+    def fit(self, i: int) -> int:
+        """可容纳条目的成员下标，没有时返回 -1"""
+        p = self.points[i]
+        f = self.fixed[i]
+        if f >= 0:
+            return f if self.remaining[f] >= p else -1
+        best = self.most_remaining()
+        return best if self.remaining[best] >= p else -1
+
+    def select(self, i: int, j: int) -> List[int]:
+        """选中条目，返回因此解除阻塞的下游条目"""
+        self.member[i] = j
+        self.chosen.add(i)
+        self._set_remaining(j, self.remaining[j] - self.points[i])
+        unlocked = []
+        for k in range(self.offsets[i], self.offsets[i + 1]):
+            child = self.children[k]
+            self.pending[child] -= 1
+            if self.pending[child] == 0:
+                unlocked.append(child)
+        offsets, prerequisites = self.prerequisites
+        for k in range(offsets[i], offsets[i + 1]):
+            self.selected_dependents[prerequisites[k]] += 1
+        return unlocked
+
+    def unselect(self, i: int) -> None:
+        j = self.member[i]
+        self.member[i] = -1
+        self.chosen.discard(i)
+        self._set_remaining(j, self.remaining[j] + self.points[i])
+        for k in range(self.offsets[i], self.offsets[i + 1]):
+            self.pending[self.children[k]] += 1
+        offsets, prerequisites = self.prerequisites
+        for k in range(offsets[i], offsets[i + 1]):
+            self.selected_dependents[prerequisites[k]] -= 1
+
+    def greedy(self, order: List[int], min_points: float) -> None:
+        """按顺序贪心选择；解除阻塞的下游条目按其在 order 中的位置加入待选队列"""
+        # 贪心过程中容量只减不增，放不下的条目之后也放不下，每个条目最多检查一次
+        rank = [-1] * len(self.points)
+        for r, i in enumerate(order):
+            rank[i] = r
+        ready = [(r, i) for r, i in enumerate(order) if self.member[i] < 0 and not self.pending[i]]
+        while ready:
+            if self.remaining[self.most_remaining()] < min_points:
+                return
+            _, i = heapq.heappop(ready)
+            j = self.fit(i)
+            if j >= 0:
+                for child in self.select(i, j):
+                    if rank[child] >= 0 and self.member[child] < 0:
+                        heapq.heappush(ready, (rank[child], child))
+
+
+def _repair(state: _State, value: np.ndarray, candidates: np.ndarray, limit: int) -> int:
+    """用未选中的高价值条目替换低价值条目，返回替换次数"""
+    swaps = 0
+    ranked = candidates[np.argsort(-value[candidates], kind="stable")]
+    prereq_offsets, prerequisites = state.prerequisites
+    # 已选条目、负责人与已选下游数；替换后就地更新，不必每个候选都重建
+    selected = np.fromiter(state.chosen, dtype=np.int64, count=len(state.chosen))
+    owners = np.array([state.member[i] for i in selected.tolist()], dtype=np.int64)
+    dependents = np.array([state.selected_dependents[i] for i in selected.tolist()], dtype=np.int64)
+    for c in ranked[:limit].tolist():
+        if state.member[c] >= 0 or state.pending[c]:
+            continue
+        if not len(selected):
+            break
+        slack = np.asarray(state.remaining)[owners]
+        ok = (
+            (dependents == 0)
+            & (value[selected] < value[c])
+            & (slack + state.points_array[selected] >= state.points[c])
+        )
+        if state.fixed[c] >= 0:
+            ok &= owners == state.fixed[c]
+        # 被替换的条目不能是候选条目的前置
+        own = prerequisites[prereq_offsets[c]:prereq_offsets[c + 1]]
+        if own:
+            ok &= ~np.isin(selected, own)
+        if not ok.any():
+            continue
+        gain = np.where(ok, value[c] - value[selected], -np.inf)
+        position = int(np.argmax(gain))
+        out = int(selected[position])
+        j = state.member[out]
+        state.unselect(out)
+        state.select(c, j)
+        selected[position] = c
+        out_prerequisites = prerequisites[prereq_offsets[out]:prereq_offsets[out + 1]]
+        if out_prerequisites:
+            dependents[np.isin(selected, out_prerequisites)] -= 1
+        if own:
+            dependents[np.isin(selected, own)] += 1
+        swaps += 1
+    return swaps
+
+
+def plan_sprint(items: Sequence[PlanItem], members: Sequence[TeamMember], swap_candidates: int = 256) -> SprintPlan:
+    """在成员容量与依赖约束下选择使总优先级最大的条目"""
+    started = time.perf_counter()
+    n = len(items)
+    capacities = np.array([max(0.0, float(m.capacity)) for m in members], dtype=float)
+    plan = SprintPlan(capacity=float(capacities.sum()), member_load={m.user_id: 0.0 for m in members})
+    if n == 0 or not len(members):
+        plan.elapsed_ms = (time.perf_counter() - started) * 1000
+        return plan
+
+    index = {item.id: i for i, item in enumerate(items)}
+    member_index = {m.user_id: j for j, m in enumerate(members)}
+    points = np.array([np.nan if it.story_points is None else it.story_points for it in items], dtype=float)
+    value = np.array([priority_value(it.priority) for it in items], dtype=float)
+    fixed = np.array(
+        [ANY_MEMBER if it.assignee_id is None else member_index.get(it.assignee_id, NOT_IN_TEAM) for it in items],
+        dtype=np.int64,
+    )
+    edges = [(index[d], i) for i, it in enumerate(items) for d in it.depends_on if d in index and index[d] != i]
+    src, dst = (np.array(e, dtype=np.int64) for e in zip(*edges)) if edges else (np.empty(0, np.int64),) * 2
+
+    offsets, children = _csr(n, src, dst)
+    level = _levels(n, dst, offsets, children)
+    level_edges = _LevelEdges(src, dst, level)
+
+    unestimated = np.isnan(points)
+    cyclic = level < 0
+    blocked = unestimated | cyclic | (fixed == NOT_IN_TEAM) | (np.nan_to_num(points) < 0)
+    blocked |= np.nan_to_num(points, nan=np.inf) > capacities.max()
+    level_edges.propagate(np.logical_or, blocked)
+    points = np.where(np.isnan(points), 0.0, points)
+    # 链密度：条目连同其全部前置的 总优先级/总故事点（共享的前置会被重复计入，仅用于排序）
+    chain_value = np.where(blocked, 0.0, value)
+    chain_points = np.maximum(points, MIN_POINTS)
+    level_edges.propagate(np.add, chain_value)
+    level_edges.propagate(np.add, chain_points)
+    density = np.where(blocked, 0.0, chain_value / chain_points)
+    # 前置条目至少与其最好的下游链一样优先
+    level_edges.propagate(np.maximum, density, reverse=True)
+    candidates = np.flatnonzero(~blocked)
+    order = candidates[np.lexsort((level[candidates], -density[candidates]))]
+
+    state = _State(points, fixed, capacities, offsets, children, dst, src)
+    min_points = float(points[candidates].min()) if len(candidates) else np.inf
+    state.greedy(order.tolist(), min_points)
+    plan.swaps = _repair(state, value, candidates, swap_candidates)
+    if plan.swaps:
+        state.greedy(order.tolist(), min_points)
+
+    chosen = np.array(sorted(state.chosen), dtype=np.int64)
+    plan.assignments = {items[i].id: members[state.member[i]].user_id for i in chosen.tolist()}
+    plan.total_points = float(points[chosen].sum())
+    plan.total_value = float(value[chosen].sum())
+    for j, m in enumerate(members):
+        plan.member_load[m.user_id] = float(capacities[j] - state.remaining[j])
+    plan.blocked = [items[i].id for i in np.flatnonzero(blocked & ~unestimated).tolist()]
+    plan.unestimated = [items[i].id for i in np.flatnonzero(unestimated).tolist()]
+    plan.elapsed_ms = (time.perf_counter() - started) * 1000
+    return plan
@@ -0,0 +1,45 @@
+"""
+Sprint 规划工具：供规划代理通过 function calling 调用优化器
+
+    agent.add_tool(plan_sprint_tool)
+"""
+import asyncio
+from typing import Any, Dict, List, Optional, Union
+
+from pydantic import BaseModel, Field
+
+from scrumix.agents.plan.optimizer import PlanItem, TeamMember, plan_sprint
+from scrumix.agents.tools.registry import Tool
+
+
+class PlanItemArgs(BaseModel):
+    id: int
+    story_points: Optional[float] = Field(None, ge=0, description="故事点；未估算时为空")
+    priority: Union[float, str] = Field(1.0, description="数值越大越重要，或 critical/high/medium/low")
+    depends_on: List[int] = Field(default_factory=list, description="前置条目ID")
+    assignee_id: Optional[int] = None
+
+
+class TeamMemberArgs(BaseModel):
+    user_id: int
+    capacity: float = Field(..., ge=0, description="本 Sprint 可投入的故事点")
+
+
+class PlanSprintArgs(BaseModel):
+    items: List[PlanItemArgs]
+    members: List[TeamMemberArgs]
+
+
+async def run_plan_sprint(items: List[PlanItemArgs], members: List[TeamMemberArgs]) -> Dict[str, Any]:
+    """在团队成员容量与依赖约束下，从候选 backlog 条目中选出本 Sprint 要做的条目并分配成员"""
+    plan_items = [PlanItem(i.id, i.story_points, i.priority, i.depends_on, i.assignee_id) for i in items]
+    team = [TeamMember(m.user_id, m.capacity) for m in members]
+    # 大 backlog 的计算放到线程池，不阻塞事件循环
+    loop = asyncio.get_event_loop()
+    plan = await loop.run_in_executor(None, plan_sprint, plan_items, team)
+    return plan.as_dict()
+
+
+plan_sprint_tool = Tool.from_function(
+    run_plan_sprint, name="plan_sprint", args_model=PlanSprintArgs, read_only=True, timeout=10,
+)
@@ -0,0 +1,126 @@
+"""
+上下文打包
+
+把对话历史、backlog 条目、会议记录等候选上下文装入目标token预算：
+- 按优先级从高到低、同优先级内从新到旧选择
+- 原文放不下时改用条目的摘要（若有），摘要也放不下则丢弃
+- 对话历史（HISTORY_PRIORITY）只保留最近的连续若干轮：某一轮原文放不下后更早的轮次只能使用摘要，
+  某一轮被丢弃后不再加入更早的轮次，避免对话中间出现缺口
+- 预算不超过 模型窗口 - 输出预留 - 固定部分（系统提示词与当前任务）
+- 输出保持候选条目的原始顺序，并报告与全量放入相比节省的token数
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from scrumix.api.core.config import settings
+from scrumix.agents.prompts.tokens import MESSAGE_OVERHEAD, count_tokens
+
+# 对话历史条目的优先级（高于其他上下文条目）
+HISTORY_PRIORITY = 1
+
+
+@dataclass
+class ContextItem:
+    """候选上下文条目；order 越大越新"""
+    text: str
+    priority: int = 0
+    order: int = 0
+    summary: Optional[str] = None
+    role: str = "user"
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class PackedItem:
+    """被选中的条目及实际放入的文本"""
+    item: ContextItem
+    text: str
+    summarized: bool = False
+
+
+@dataclass
+class PackStats:
+    """一次打包的统计"""
+    budget: int = 0
+    fixed_tokens: int = 0
+    context_tokens: int = 0
+    # 全部候选条目按原文放入时需要的token数
+    full_tokens: int = 0
+    included: int = 0
+    summarized: int = 0
+    dropped: int = 0
+
+    @property
+    def prompt_tokens(self) -> int:
+        return self.fixed_tokens + self.context_tokens
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.full_tokens - self.context_tokens
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "budget": self.budget,
+            "prompt_tokens": self.prompt_tokens,
+            "full_tokens": self.fixed_tokens + self.full_tokens,
+            "saved_tokens": self.saved_tokens,
+            "included": self.included,
+            "summarized": self.summarized,
+            "dropped": self.dropped,
+        }
+
+
+class ContextPacker:
+    """按优先级把上下文装入token预算"""
+
+    def __init__(self, context_window: Optional[int] = None, budget: Optional[int] = None,
+                 reserve_output: int = 1000, model: Optional[str] = None, overhead: int = MESSAGE_OVERHEAD):
+        self.context_window = context_window or settings.LLM_CONTEXT_WINDOW
+        self.budget = settings.LLM_PROMPT_TOKEN_BUDGET if budget is None else budget
+        self.reserve_output = reserve_output
+        self.model = model
+        self.overhead = overhead
+
+    def cost(self, text: str) -> int:
+        return count_tokens(text, self.model) + self.overhead
+
+    def available(self, fixed_tokens: int = 0) -> int:
+        """可用于候选条目的token数；固定部分已超出窗口时抛出 ValueError"""
+        limit = self.context_window - self.reserve_output
+        if fixed_tokens > limit:
+            raise ValueError(f"提示词固定部分（{fixed_tokens} tokens）超出模型窗口可用的 {limit} tokens")
+        target = min(self.budget, limit) if self.budget else limit
+        return max(0, target - fixed_tokens)
+
+    def pack(self, items: Sequence[ContextItem], fixed_tokens: int = 0) -> Tuple[List[PackedItem], PackStats]:
+        """选择条目，返回（按原始顺序的选中条目, 统计）"""
+        remaining = self.available(fixed_tokens)
+        stats = PackStats(budget=remaining + fixed_tokens, fixed_tokens=fixed_tokens)
+        chosen: Dict[int, PackedItem] = {}
+        ranked = sorted(range(len(items)), key=lambda i: (-items[i].priority, -items[i].order, -i))
+        # 对话历史从新到旧：full_history 为 False 后只用摘要，history_cut 后全部丢弃
+        full_history = True
+        history_cut = False
+        for i in ranked:
+            item = items[i]
+            cost = self.cost(item.text)
+            stats.full_tokens += cost
+            is_history = item.priority == HISTORY_PRIORITY
+            if is_history and history_cut:
+                stats.dropped += 1
+                continue
+            if cost <= remaining and (full_history or not is_history):
+                chosen[i] = PackedItem(item, item.text)
+            elif item.summary and self.cost(item.summary) <= remaining:
+                cost = self.cost(item.summary)
+                chosen[i] = PackedItem(item, item.summary, summarized=True)
+                stats.summarized += 1
+                full_history = full_history and not is_history
+            else:
+                stats.dropped += 1
+                history_cut = history_cut or is_history
+                continue
+            remaining -= cost
+            stats.context_tokens += cost
+        stats.included = len(chosen)
+        return [chosen[i] for i in sorted(chosen)], stats
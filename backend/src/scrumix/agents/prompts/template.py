@@ -0,0 +1,85 @@
+"""
+提示词模板
+
+模板使用 str.format 语法（{name}），构造时解析为字面量与字段的列表，
+渲染时只做拼接，不再重复解析；同一模板文本只编译一次。
+
+    prompt_templates.register("sprint_review", "Summarize sprint {sprint_name} for {audience}.")
+    text = prompt_templates.render("sprint_review", sprint_name="S1", audience="stakeholders")
+"""
+import string
+import threading
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+_formatter = string.Formatter()
+
+
+class PromptTemplate:
+    """预编译的提示词模板"""
+
+    def __init__(self, text: str, name: Optional[str] = None):
+        self.text = text
+        self.name = name
+        self._parts: List[Tuple[str, Optional[str], str, str]] = []
+        fields = set()
+        for literal, field_name, format_spec, conversion in _formatter.parse(text):
+            if field_name is not None:
+                if not field_name or field_name.isdigit():
+                    raise ValueError(f"模板字段必须命名: {name or text[:40]!r}")
+                fields.add(field_name.split(".")[0].split("[")[0])
+            self._parts.append((literal, field_name, format_spec or "", conversion or ""))
+        self.fields: FrozenSet[str] = frozenset(fields)
+
+    def render(self, **values: Any) -> str:
+        missing = self.fields - values.keys()
+        if missing:
+            raise KeyError(f"模板 {self.name or ''} 缺少字段: {', '.join(sorted(missing))}")
+        pieces = []
+        for literal, field_name, format_spec, conversion in self._parts:
+            pieces.append(literal)
+            if field_name is None:
+                continue
+            value, _ = _formatter.get_field(field_name, (), values)
+            if conversion:
+                value = _formatter.convert_field(value, conversion)
+            pieces.append(format(value, format_spec) if format_spec else str(value))
+        return "".join(pieces)
+
+    def __repr__(self) -> str:
+        return f"PromptTemplate(name={self.name!r}, fields={sorted(self.fields)})"
+
+
+@lru_cache(maxsize=1024)
+def compile_template(text: str) -> PromptTemplate:
+    """编译模板文本（按文本缓存）"""
+    return PromptTemplate(text)
+
+
+class TemplateRegistry:
+    """具名模板注册表"""
+
+    def __init__(self):
+        self._templates: Dict[str, PromptTemplate] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, text: str) -> PromptTemplate:
+        template = PromptTemplate(text, name)
+        with self._lock:
+            self._templates[name] = template
+        return template
+
+    def get(self, name: str) -> PromptTemplate:
+        try:
+            return self._templates[name]
+        except KeyError:
+            raise KeyError(f"未注册的模板: {name}") from None
+
+    def render(self, name: str, **values: Any) -> str:
+        return self.get(name).render(**values)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._templates
+
+
+prompt_templates = TemplateRegistry()
@@ -0,0 +1,55 @@
+"""
+token计数
+
+安装了 tiktoken 时使用模型对应的编码器（每个编码只加载一次）；
+否则按字符估算：ASCII 约 4 个字符一个token，其余字符（中文等）每字符一个token。
+同一文本的计数结果会被缓存，历史消息、模板片段重复计数时不再重新编码。
+"""
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Optional
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - 可选依赖
+    tiktoken = None
+
+CHARS_PER_TOKEN = 4
+# 每条对话消息的格式开销（role 与分隔符）
+MESSAGE_OVERHEAD = 4
+DEFAULT_ENCODING = "o200k_base"
+
+
+@lru_cache(maxsize=None)
+def get_encoder(model: Optional[str] = None) -> Optional[Callable[[str], Any]]:
+    """模型对应的编码函数；未安装 tiktoken 时返回 None"""
+    if tiktoken is None:
+        return None
+    try:
+        encoding = tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding(DEFAULT_ENCODING)
+    except KeyError:
+        encoding = tiktoken.get_encoding(DEFAULT_ENCODING)
+    return encoding.encode_ordinary
+
+
+@lru_cache(maxsize=16_384)
+def _count(text: str, model: Optional[str]) -> int:
+    encode = get_encoder(model)
+    if encode is not None:
+        return len(encode(text))
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return (ascii_chars + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN + (len(text) - ascii_chars)
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """文本的token数"""
+    return _count(text, model) if text else 0
+
+
+def count_message_tokens(messages: Iterable[Dict[str, Any]], model: Optional[str] = None) -> int:
+    """对话消息的token数（含每条消息的格式开销）"""
+    return sum(count_tokens(m.get("content") or "", model) + MESSAGE_OVERHEAD for m in messages)
+
+
+def token_cache_info():
+    """计数缓存的命中情况"""
+    return _count.cache_info()
@@ -0,0 +1,273 @@
+"""
+异步代理任务
+
+耗时的代理/工作流运行以任务方式提交，提交后立即返回任务ID，运行在后台执行：
+- 进程内执行：最多 JOB_MAX_WORKERS 个任务同时运行，其余排队；单个任务超过 JOB_TIMEOUT_SECONDS 即失败
+- 每个用户同时排队/运行的任务数不超过 JOB_MAX_ACTIVE_PER_USER，超出时 submit 抛出 JobLimitError
+- 进度以事件序列发布（status / token / step / result / error），订阅方按序号读取，
+  断线重连时可从上次的序号继续；每个任务只保留最近 JOB_EVENT_BUFFER 条事件
+- 结束的任务（结果与事件）保留 JOB_RESULT_TTL_SECONDS 后清除
+- cancel() 取消排队或运行中的任务（代理流与工作流步骤随之取消）
+
+    job_manager.register_agent("chat", lambda: ChatAgent(llm))
+    job = job_manager.submit(AGENT, "chat", user_id=1, payload={"message": "..."}, project_id=7)
+    async for seq, event, data in job.follow():
+        ...
+"""
+import asyncio
+import contextvars
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+
+from scrumix.api.core.config import settings
+from scrumix.agents.agent.agent import BaseAgent
+from scrumix.agents.utils.logger import log_context, logger
+from scrumix.agents.workflows.engine import StepTrace, Workflow, WorkflowError
+
+AGENT = "agent"
+WORKFLOW = "workflow"
+
+# 客户端上下文中允许的对话历史角色；history 以外的字段（如 memory、items）只能由服务端设置
+HISTORY_ROLES = ("user", "assistant")
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobLimitError(Exception):
+    """用户的并发任务数已达上限"""
+
+    def __init__(self, user_id: int, limit: int):
+        super().__init__(f"最多同时运行 {limit} 个任务")
+        self.user_id = user_id
+        self.limit = limit
+
+
+@dataclass
+class Job:
+    """一个代理/工作流运行任务"""
+    kind: str
+    name: str
+    user_id: int
+    payload: Dict[str, Any]
+    project_id: Optional[int] = None
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Any = None
+    error: Optional[str] = None
+    # 代理流式输出的累计文本（运行中即可读取部分结果）
+    partial: str = ""
+    events: Deque[Tuple[int, str, Dict[str, Any]]] = field(default_factory=deque, repr=False)
+    _seq: int = field(default=0, repr=False)
+    _wakeup: Optional[asyncio.Event] = field(default=None, repr=False)
+    _task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def publish(self, event: str, data: Dict[str, Any], buffer: int) -> None:
+        """追加一条事件并唤醒订阅方"""
+        self._seq += 1
+        self.events.append((self._seq, event, data))
+        while len(self.events) > buffer:
+            self.events.popleft()
+        if self._wakeup is not None:
+            self._wakeup.set()
+            self._wakeup = None
+
+    async def follow(self, after: int = 0,
+                     heartbeat: Optional[float] = None) -> AsyncIterator[Tuple[int, str, Dict[str, Any]]]:
+        """
+        按序号产出 after 之后的事件，直到任务结束；落后超过缓冲区时从最早的保留事件继续
+        指定 heartbeat 时，超过该秒数没有新事件则产出 (after, "ping", {})，用于保持代理连接
+        """
+        while True:
+            for seq, event, data in list(self.events):
+                if seq > after:
+                    after = seq
+                    yield seq, event, data
+            if self.finished and (not self.events or self.events[-1][0] <= after):
+                return
+            if self._wakeup is None:
+                self._wakeup = asyncio.Event()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield after, "ping", {}
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "name": self.name,
+            "project_id": self.project_id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "partial": self.partial if not self.finished else None,
+            "result": self.result,
+            "error": self.error,
+            "last_event_id": self._seq,
+        }
+
+
+class JobManager:
+    """进程内的任务调度"""
+
+    def __init__(self, max_workers: Optional[int] = None, max_active_per_user: Optional[int] = None,
+                 result_ttl: Optional[float] = None, timeout: Optional[float] = None,
+                 event_buffer: Optional[int] = None):
+        self.max_workers = settings.JOB_MAX_WORKERS if max_workers is None else max_workers
+        self.max_active_per_user = (
+            settings.JOB_MAX_ACTIVE_PER_USER if max_active_per_user is None else max_active_per_user
+        )
+        self.result_ttl = settings.JOB_RESULT_TTL_SECONDS if result_ttl is None else result_ttl
+        self.timeout = settings.JOB_TIMEOUT_SECONDS if timeout is None else timeout
+        self.event_buffer = settings.JOB_EVENT_BUFFER if event_buffer is None else event_buffer
+        self.agents: Dict[str, Callable[[], BaseAgent]] = {}
+        self.workflows: Dict[str, Callable[[], Workflow]] = {}
+        self._jobs: Dict[str, Job] = {}
+        # 已结束的任务，按结束时间排序，用于过期清理
+        self._finished: "OrderedDict[str, float]" = OrderedDict()
+        self._active: Dict[int, int] = {}
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def register_agent(self, name: str, factory: Callable[[], BaseAgent]) -> None:
+        self.agents[name] = factory
+
+    def register_workflow(self, name: str, factory: Callable[[], Workflow]) -> None:
+        self.workflows[name] = factory
+
+    def submit(self, kind: str, name: str, user_id: int, payload: Dict[str, Any],
+               project_id: Optional[int] = None) -> Job:
+        """提交任务并立即返回；未注册的代理/工作流抛出 KeyError，超出用户并发上限抛出 JobLimitError"""
+        registry = self.agents if kind == AGENT else self.workflows if kind == WORKFLOW else None
+        if registry is None or name not in registry:
+            raise KeyError(f"未注册的{kind}: {name}")
+        self._sweep()
+        if self.max_active_per_user and self._active.get(user_id, 0) >= self.max_active_per_user:
+            raise JobLimitError(user_id, self.max_active_per_user)
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+        job = Job(kind, name, user_id, dict(payload), project_id)
+        self._jobs[job.job_id] = job
+        self._active[user_id] = self._active.get(user_id, 0) + 1
+        job.publish("status", {"status": QUEUED}, self.event_buffer)
+        # 在空白上下文中运行：不继承提交请求的轨迹、用量归属等（请求结束后任务仍在运行）
+        loop = asyncio.get_running_loop()
+        job._task = contextvars.Context().run(loop.create_task, self._run(job, registry[name]))
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._sweep()
+        return self._jobs.get(job_id)
+
+    def list(self, user_id: int) -> List[Job]:
+        self._sweep()
+        return sorted((j for j in self._jobs.values() if j.user_id == user_id), key=lambda j: -j.created_at)
+
+    def cancel(self, job_id: str) -> bool:
+        """取消排队或运行中的任务；任务不存在或已结束时返回 False"""
+        job = self._jobs.get(job_id)
+        if job is None or job.finished or job._task is None:
+            return False
+        job._task.cancel()
+        return True
+
+    async def _run(self, job: Job, factory: Callable[[], Any]) -> None:
+        with log_context(job_id=job.job_id):
+            await self._execute(job, factory)
+
+    async def _execute(self, job: Job, factory: Callable[[], Any]) -> None:
+        try:
+            async with self._slots:
+                job.status = RUNNING
+                job.started_at = time.time()
+                job.publish("status", {"status": RUNNING}, self.event_buffer)
+                runner = self._run_agent if job.kind == AGENT else self._run_workflow
+                job.result = await asyncio.wait_for(runner(job, factory()), timeout=self.timeout or None)
+            job.status = SUCCEEDED
+            job.publish("result", {"result": job.result}, self.event_buffer)
+        except asyncio.CancelledError:
+            job.status = CANCELLED
+        except asyncio.TimeoutError:
+            job.status = FAILED
+            job.error = f"任务超时（{self.timeout}s）"
+        except WorkflowError as e:
+            job.status = FAILED
+            job.error = str(e)
+        except Exception as e:
+            logger.exception(f"任务 {job.job_id} 失败")
+            job.status = FAILED
+            job.error = repr(e)
+        finally:
+            job.finished_at = time.time()
+            if job.error is not None:
+                job.publish("error", {"detail": job.error}, self.event_buffer)
+            job.publish("status", {"status": job.status}, self.event_buffer)
+            self._active[job.user_id] -= 1
+            if not self._active[job.user_id]:
+                del self._active[job.user_id]
+            self._finished[job.job_id] = job.finished_at
+
+    def _context(self, job: Job) -> Dict[str, Any]:
+        """代理上下文：客户端只能提供 history（{role: user|assistant, content}），其他字段被丢弃"""
+        history = (job.payload.get("context") or {}).get("history") or []
+        history = [
+            {"role": message["role"], "content": message["content"]}
+            for message in history
+            if isinstance(message, dict) and message.get("role") in HISTORY_ROLES
+            and isinstance(message.get("content"), str)
+        ]
+        return {"history": history, "project_id": job.project_id, "user_id": job.user_id}
+
+    async def _run_agent(self, job: Job, agent: BaseAgent) -> str:
+        """流式执行代理，每段输出发布为 token 事件"""
+        chunks = []
+        async for chunk in agent.execute_stream(job.payload["message"], self._context(job)):
+            chunks.append(chunk)
+            job.partial += chunk
+            job.publish("token", {"text": chunk}, self.event_buffer)
+        return "".join(chunks)
+
+    async def _run_workflow(self, job: Job, workflow: Workflow) -> Dict[str, Any]:
+        """执行工作流，步骤状态变化发布为 step 事件"""
+        def on_step(trace: StepTrace) -> None:
+            job.publish("step", {"step": trace.name, "status": trace.status, "error": trace.error}, self.event_buffer)
+
+        params = {**(job.payload.get("params") or {}), **self._context(job)}
+        run = await workflow.run(params, on_step=on_step)
+        return run.outputs
+
+    def _sweep(self) -> None:
+        """清除过期的已结束任务"""
+        deadline = time.time() - self.result_ttl
+        while self._finished:
+            job_id, finished_at = next(iter(self._finished.items()))
+            if finished_at > deadline:
+                break
+            del self._finished[job_id]
+            self._jobs.pop(job_id, None)
+
+    async def shutdown(self) -> None:
+        """取消全部未结束的任务"""
+        tasks = [job._task for job in self._jobs.values() if job._task is not None and not job.finished]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+job_manager = JobManager()
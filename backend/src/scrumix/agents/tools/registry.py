@@ -0,0 +1,245 @@
+"""
+工具注册表
+
+- 工具参数用 pydantic 模型声明（或由函数签名推断），导出 OpenAI function calling 格式的 schema
+- 同一轮的多个工具调用并发执行；每个工具有超时与并发上限
+- 只读且幂等的工具（read_only=True）在一次代理运行内按参数缓存结果，
+  同一轮中的相同调用只执行一次
+
+    registry = ToolRegistry()
+
+    @registry.tool(description="获取 Sprint 详情", read_only=True, timeout=5)
+    async def get_sprint(sprint_id: int) -> dict:
+        ...
+
+    results = await registry.execute([ToolCall("1", "get_sprint", {"sprint_id": 3})], cache=ToolRunCache())
+"""
+import asyncio
+import inspect
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Type
+
+from pydantic import BaseModel, ValidationError, create_model
+
+from scrumix.agents.utils.hashing import stable_hash
+from scrumix.agents.utils.tracing import ERROR, default_tracer
+
+ToolFunc = Callable[..., Awaitable[Any]]
+
+DEFAULT_TOOL_TIMEOUT = 30.0
+
+
+def _model_from_signature(name: str, func: Callable) -> Type[BaseModel]:
+    """由函数签名生成参数模型"""
+    fields = {}
+    for parameter in inspect.signature(func).parameters.values():
+        if parameter.kind in (parameter.VAR_POSITIONAL, parameter.VAR_KEYWORD):
+            continue
+        annotation = parameter.annotation if parameter.annotation is not inspect.Parameter.empty else Any
+        default = parameter.default if parameter.default is not inspect.Parameter.empty else ...
+        fields[parameter.name] = (annotation, default)
+    return create_model(f"{name}_args", **fields)
+
+
+@dataclass
+class Tool:
+    """工具定义"""
+    name: str
+    description: str
+    func: ToolFunc
+    args_model: Type[BaseModel]
+    timeout: float = DEFAULT_TOOL_TIMEOUT
+    max_concurrency: Optional[int] = None
+    # 只读且幂等：同一次运行内可按参数缓存结果
+    read_only: bool = False
+    _semaphore: Optional[asyncio.Semaphore] = field(default=None, init=False, repr=False)
+
+    @classmethod
+    def from_function(cls, func: ToolFunc, name: Optional[str] = None, description: Optional[str] = None,
+                      args_model: Optional[Type[BaseModel]] = None, **options) -> "Tool":
+        name = name or func.__name__
+        return cls(
+            name=name,
+            description=description or inspect.getdoc(func) or "",
+            func=func,
+            args_model=args_model or _model_from_signature(name, func),
+            **options,
+        )
+
+    @property
+    def semaphore(self) -> Optional[asyncio.Semaphore]:
+        if self.max_concurrency and self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def schema(self) -> Dict[str, Any]:
+        """OpenAI function calling 格式的工具声明"""
+        parameters = self.args_model.model_json_schema()
+        parameters.pop("title", None)
+        return {
+            "type": "function",
+            "function": {"name": self.name, "description": self.description, "parameters": parameters},
+        }
+
+    def validate(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """校验并规范化参数（保留字段的类型，嵌套模型不转为字典）"""
+        return dict(self.args_model.model_validate(arguments))
+
+
+@dataclass
+class ToolCall:
+    """模型发起的一次工具调用"""
+    id: str
+    name: str
+    arguments: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_openai(cls, data: Dict[str, Any]) -> "ToolCall":
+        """解析 chat completions 响应中的 tool_calls 项"""
+        function = data.get("function") or {}
+        arguments = function.get("arguments") or "{}"
+        if isinstance(arguments, str):
+            try:
+                arguments = json.loads(arguments)
+            except ValueError:
+                arguments = {"_raw": arguments}
+        return cls(id=data.get("id", ""), name=function.get("name", ""), arguments=arguments)
+
+
+@dataclass
+class ToolResult:
+    """工具调用结果；失败时 error 非空，结果仍返回给模型"""
+    call_id: str
+    name: str
+    output: Any = None
+    error: Optional[str] = None
+    cached: bool = False
+    duration: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def to_message(self) -> Dict[str, str]:
+        """转换为 role=tool 的对话消息"""
+        content = self.output if self.error is None else {"error": self.error}
+        if not isinstance(content, str):
+            content = json.dumps(content, ensure_ascii=False, default=str)
+        return {"role": "tool", "tool_call_id": self.call_id, "content": content}
+
+
+class ToolRunCache:
+    """一次代理运行内的只读工具结果缓存（含进行中的调用，相同调用只执行一次）"""
+
+    def __init__(self):
+        self._results: Dict[str, "asyncio.Future[Any]"] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(name: str, arguments: Dict[str, Any]) -> Optional[str]:
+        """缓存键；参数无法稳定哈希时返回 None（不缓存该调用）"""
+        try:
+            return stable_hash({"tool": name, "arguments": arguments})
+        except TypeError:
+            return None
+
+    async def get_or_run(self, key: str, run: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """返回 (结果, 是否命中)；失败的调用不缓存"""
+        future = self._results.get(key)
+        if future is not None:
+            self.hits += 1
+            return await asyncio.shield(future), True
+        self.misses += 1
+        future = asyncio.ensure_future(run())
+        self._results[key] = future
+        try:
+            return await asyncio.shield(future), False
+        except Exception:
+            self._results.pop(key, None)
+            raise
+
+
+class ToolRegistry:
+    """工具注册表"""
+
+    def __init__(self):
+        self._tools: Dict[str, Tool] = {}
+
+    def register(self, tool: Tool) -> Tool:
+        if tool.name in self._tools:
+            raise ValueError(f"工具重复: {tool.name}")
+        self._tools[tool.name] = tool
+        return tool
+
+    def tool(self, name: Optional[str] = None, description: Optional[str] = None,
+             args_model: Optional[Type[BaseModel]] = None, timeout: float = DEFAULT_TOOL_TIMEOUT,
+             max_concurrency: Optional[int] = None, read_only: bool = False):
+        """以装饰器方式注册工具"""
+        def decorator(func: ToolFunc) -> ToolFunc:
+            self.register(Tool.from_function(
+                func, name, description, args_model,
+                timeout=timeout, max_concurrency=max_concurrency, read_only=read_only,
+            ))
+            return func
+        return decorator
+
+    def get(self, name: str) -> Optional[Tool]:
+        return self._tools.get(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tools
+
+    def __iter__(self) -> Iterator[Tool]:
+        return iter(self._tools.values())
+
+    def __len__(self) -> int:
+        return len(self._tools)
+
+    def schemas(self) -> List[Dict[str, Any]]:
+        """全部工具声明，直接作为 chat completions 的 tools 参数"""
+        return [tool.schema() for tool in self._tools.values()]
+
+    async def execute(self, calls: Sequence[ToolCall], cache: Optional[ToolRunCache] = None) -> List[ToolResult]:
+        """并发执行一轮工具调用，结果顺序与调用顺序一致"""
+        return list(await asyncio.gather(*(self.call(c, cache) for c in calls)))
+
+    async def call(self, call: ToolCall, cache: Optional[ToolRunCache] = None) -> ToolResult:
+        """执行单个工具调用，错误转换为 ToolResult.error"""
+        started = time.monotonic()
+        result = ToolResult(call.id, call.name)
+        tool = self._tools.get(call.name)
+        with default_tracer.span(f"tool.{call.name}", "tool", tool=call.name) as span:
+            try:
+                if tool is None:
+                    raise LookupError(f"未知工具: {call.name}")
+                try:
+                    arguments = tool.validate(call.arguments)
+                except ValidationError as e:
+                    raise ValueError(f"参数无效: {e.errors(include_url=False)}")
+
+                key = ToolRunCache.key(tool.name, arguments) if cache is not None and tool.read_only else None
+                if key is not None:
+                    result.output, result.cached = await cache.get_or_run(
+                        key, lambda: self._invoke(tool, arguments)
+                    )
+                else:
+                    result.output = await self._invoke(tool, arguments)
+            except asyncio.TimeoutError:
+                result.error = f"工具 {call.name} 超时（{tool.timeout}s）"
+            except Exception as e:
+                result.error = str(e) or repr(e)
+            span.set(cached=result.cached)
+            if result.error is not None:
+                span.status, span.error = ERROR, result.error
+        result.duration = time.monotonic() - started
+        return result
+
+    async def _invoke(self, tool: Tool, arguments: Dict[str, Any]) -> Any:
+        semaphore = tool.semaphore
+        if semaphore is None:
+            return await asyncio.wait_for(tool.func(**arguments), timeout=tool.timeout)
+        async with semaphore:
+            return await asyncio.wait_for(tool.func(**arguments), timeout=tool.timeout)
@@ -0,0 +1,27 @@
+# 哈希工具
+import dataclasses
+import datetime
+import hashlib
+import json
+from typing import Any
+
+from pydantic import BaseModel
+
+
+def _encode(value: Any) -> Any:
+    """有确定表示的常见类型；其他对象（repr 可能相同或含内存地址）不能用作缓存键"""
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=repr)
+    raise TypeError(f"无法稳定哈希 {type(value).__name__} 类型的值")
+
+
+def stable_hash(value: Any) -> str:
+    """对可 JSON 序列化的值计算稳定哈希；含其他类型的值时抛出 TypeError（调用方应跳过缓存）"""
+    payload = json.dumps(value, sort_keys=True, ensure_ascii=False, default=_encode, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
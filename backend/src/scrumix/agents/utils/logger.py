@@ -1,35 +1,279 @@
-# 日志工具
+"""
+日志工具
+
+所有 scrumix.* 日志器共用一条异步管道：
+- 调用方只经过 QueueHandler 把记录放入有界队列，格式化与写 stdout 在 QueueListener 的后台线程中完成，
+  请求线程和事件循环不会阻塞在 I/O 上；队列满时丢弃记录并计数，而不是等待
+- 记录为 JSON（LOG_FORMAT=text 时为单行文本），附带当前上下文中的 request_id / trace_id
+  以及 logger.info(..., extra={...}) 传入的字段
+- 按日志器前缀采样 DEBUG 记录（LOG_SAMPLE_RATES，如 {"scrumix.agents.llm": 0.01}）
+- 同一位置重复的 WARNING 及以上记录在每个时间窗内最多输出 LOG_ERROR_BURST 条，
+  其余计数后在下一条输出的记录中以 suppressed 字段报告
+
+    logger = setup_logger("scrumix.api")
+    with log_context(request_id="..."):
+        logger.warning("OAuth回调失败", extra={"provider": "keycloak"})
+"""
+import atexit
+import contextvars
+import datetime
+import json
 import logging
+import queue
+import random
 import sys
-from typing import Optional
+import threading
+import time
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from scrumix.api.core.config import settings
+
+ROOT_LOGGER = "scrumix"
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# LogRecord 自带的属性，其余属性视为 extra 字段
+_RECORD_ATTRS = set(logging.LogRecord("", 0, "", 0, "", None, None).__dict__) | {"message", "asctime", "taskName"}
+
+_log_context: "contextvars.ContextVar[Dict[str, Any]]" = contextvars.ContextVar("log_context", default={})
+
+
+def bind_log_context(**fields: Any) -> contextvars.Token:
+    """把字段加入当前上下文的日志记录，返回用于还原的 token"""
+    return _log_context.set({**_log_context.get(), **fields})
+
+
+def reset_log_context(token: contextvars.Token) -> None:
+    try:
+        _log_context.reset(token)
+    except ValueError:
+        # 异步生成器在其他上下文中被关闭时无法还原
+        _log_context.set({})
+
+
+@contextmanager
+def log_context(**fields: Any) -> Iterator[None]:
+    """在 with 块内的日志记录中附带字段（如 request_id、trace_id）"""
+    token = bind_log_context(**fields)
+    try:
+        yield
+    finally:
+        reset_log_context(token)
+
+
+def current_log_context() -> Dict[str, Any]:
+    return _log_context.get()
+
+
+class ContextFilter(logging.Filter):
+    """在调用方线程中把上下文字段写入记录（后台线程中已无法读取 contextvars）"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in _log_context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """按日志器前缀以固定比例保留 max_level 及以下的记录"""
+
+    def __init__(self, rates: Optional[Dict[str, float]] = None, max_level: int = logging.DEBUG):
+        super().__init__()
+        self.max_level = max_level
+        self.rates: Dict[str, float] = {}
+        self._cache: Dict[str, Optional[float]] = {}
+        for prefix, rate in (rates or {}).items():
+            self.set_rate(prefix, rate)
+
+    def set_rate(self, prefix: str, rate: Optional[float]) -> None:
+        """设置前缀的采样比例；None 表示不采样（全部保留）"""
+        if rate is None:
+            self.rates.pop(prefix, None)
+        else:
+            self.rates[prefix] = min(1.0, max(0.0, rate))
+        self._cache = {}
+
+    def _rate(self, name: str) -> Optional[float]:
+        if name not in self._cache:
+            # 最长前缀优先
+            matches = [p for p in self.rates if name == p or name.startswith(p + ".")]
+            self._cache[name] = self.rates[max(matches, key=len)] if matches else None
+        return self._cache[name]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level:
+            return True
+        rate = self._rate(record.name)
+        return rate is None or random.random() < rate
+
+
+class RateLimitFilter(logging.Filter):
+    """同一位置（日志器、级别、文件行）的 min_level 及以上记录每个时间窗最多输出 burst 条"""
+
+    def __init__(self, burst: int = 10, window: float = 60.0, min_level: int = logging.WARNING):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.min_level = min_level
+        # 键 -> [时间窗起点, 本窗口已输出数, 被抑制数]
+        self._windows: Dict[Tuple[str, int, str, int], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < self.min_level or self.burst <= 0:
+            return True
+        key = (record.name, record.levelno, record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            state = self._windows.get(key)
+            if state is None or now - state[0] >= self.window:
+                suppressed = state[2] if state is not None else 0
+                self._windows[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            if state[1] < self.burst:
+                state[1] += 1
+                return True
+            state[2] += 1
+            return False
+
+
+class JsonFormatter(logging.Formatter):
+    """每条记录一行 JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data: Dict[str, Any] = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                data[key] = value
+        if record.exc_text:
+            data["exc"] = record.exc_text
+        elif record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """单行文本，附带上下文与 extra 字段"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        extra = " ".join(
+            f"{key}={value}" for key, value in record.__dict__.items()
+            if key not in _RECORD_ATTRS and not key.startswith("_")
+        )
+        return f"{text} [{extra}]" if extra else text
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """放入有界队列，队列满时丢弃记录"""
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]"):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 在调用方线程中合并消息参数与异常栈，保留 extra 字段供后台格式化
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LoggingPipeline:
+    """scrumix 日志器的队列管道（进程内唯一）"""
+
+    def __init__(self):
+        self.handler: Optional[NonBlockingQueueHandler] = None
+        self.listener: Optional[QueueListener] = None
+        self._output: Optional[logging.Handler] = None
+        self.sampling = SamplingFilter()
+        self.rate_limit = RateLimitFilter()
+        self._lock = threading.Lock()
+
+    def configure(self, level: Optional[str] = None, fmt: Optional[str] = None, stream=None,
+                  format_string: Optional[str] = None) -> None:
+        """安装（或按新参数重建）管道；未指定的参数取自配置"""
+        with self._lock:
+            self._stop()
+            fmt = fmt or settings.LOG_FORMAT
+            output = logging.StreamHandler(stream or sys.stdout)
+            output.setFormatter(TextFormatter(format_string or TEXT_FORMAT) if fmt == "text" else JsonFormatter())
+            log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(settings.LOG_QUEUE_SIZE)
+            self.handler = NonBlockingQueueHandler(log_queue)
+            self.sampling = SamplingFilter(settings.LOG_SAMPLE_RATES)
+            self.rate_limit = RateLimitFilter(settings.LOG_ERROR_BURST, settings.LOG_ERROR_WINDOW_SECONDS)
+            for log_filter in (self.sampling, self.rate_limit, ContextFilter()):
+                self.handler.addFilter(log_filter)
+            self.listener = QueueListener(log_queue, output, respect_handler_level=True)
+            self.listener.start()
+            self._output = output
+
+            root = logging.getLogger(ROOT_LOGGER)
+            root.handlers = [self.handler]
+            root.setLevel(level or settings.LOG_LEVEL)
+            # 不再传给根日志器，避免与 uvicorn 等的处理器重复输出
+            root.propagate = False
+
+    @property
+    def configured(self) -> bool:
+        return self._output is not None
+
+    def _stop(self) -> None:
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def stop(self) -> None:
+        """
+        写出队列中剩余的记录并停止后台线程
+        之后的记录（关闭阶段、atexit）不再经过队列，由输出处理器在调用方线程中直接写出
+        """
+        with self._lock:
+            if self.listener is None:
+                return
+            self._stop()
+            for log_filter in self.handler.filters:
+                self._output.addFilter(log_filter)
+            logging.getLogger(ROOT_LOGGER).handlers = [self._output]
+
+    @property
+    def dropped(self) -> int:
+        return self.handler.dropped if self.handler is not None else 0
+
+
+logging_pipeline = LoggingPipeline()
+atexit.register(logging_pipeline.stop)
+
 
 def setup_logger(
     name: str,
-    level: int = logging.INFO,
+    level: Optional[int] = None,
     format_string: Optional[str] = None
 ) -> logging.Logger:
-    """设置日志器"""
-    
-    if format_string is None:
-        format_string = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    
-    # 创建日志器
+    """获取 scrumix.* 日志器；首次调用时安装日志管道"""
+    if not logging_pipeline.configured:
+        logging_pipeline.configure(format_string=format_string)
     logger = logging.getLogger(name)
-    logger.setLevel(level)
-    
-    # 创建控制台处理器
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(level)
-    
-    # 创建格式器
-    formatter = logging.Formatter(format_string)
-    console_handler.setFormatter(formatter)
-    
-    # 添加处理器到日志器
-    if not logger.handlers:
-        logger.addHandler(console_handler)
-    
+    if level is not None:
+        logger.setLevel(level)
     return logger
 
 # 默认日志器
-logger = setup_logger("scrumix.agents") 
\ No newline at end of file
+logger = setup_logger("scrumix.agents")
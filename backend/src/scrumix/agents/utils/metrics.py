@@ -0,0 +1,41 @@
+# 指标工具
+import threading
+from collections import deque
+from typing import Deque, Dict
+
+
+class LatencyMetric:
+    """延迟指标：累计次数与均值，并保留最近的样本用于计算分位数"""
+
+    def __init__(self, name: str, max_samples: int = 1_000):
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self._samples: Deque[float] = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> float:
+        """最近样本的分位数，q 取 0~1"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "avg": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+        }
+
+
+# 流式代理输出的首token时间（从收到请求到首段输出）
+ttft_metric = LatencyMetric("agent_ttft_seconds")
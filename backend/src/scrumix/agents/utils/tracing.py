@@ -0,0 +1,348 @@
+"""
+请求与代理运行追踪
+
+一次 HTTP 请求（api/core/middleware.py 的 TracingMiddleware）或一次不在请求中的代理运行
+（最外层的 BaseAgent.execute / execute_stream、工作流运行）为一条轨迹，其中的数据库语句、
+Keycloak 调用、密码哈希、LLM 调用、工具调用、嵌套代理调用记录为带父子关系的 span，
+轨迹结束后由后台线程写入 TraceStore，不阻塞请求。当前 span 保存在 contextvars 中，
+并发的调用各自挂在正确的父 span 下。
+
+- 轨迹名为根 span 名，如 "http POST /api/v1/auth/login"、"agent.chat"、"workflow.sprint_planning"，
+  可用于 TraceStore.list_runs 过滤
+- W3C traceparent：请求头中的 trace id 与采样决定被沿用，发往 Keycloak / LLM 的请求带上当前的 traceparent
+- 采样：新轨迹按 TRACE_SAMPLE_RATE（默认 0.1）采样；未采样的轨迹只在上下文中保留 trace id（用于日志与向下游传播），
+  span 为廉价的空操作
+- 未配置轨迹存储（AGENT_TRACE_DIR 为空）时不记录
+
+    with default_tracer.span("llm.chat", "llm", model="gpt-4o-mini") as span:
+        ...
+        span.set(total_tokens=123)
+"""
+import asyncio
+import contextvars
+import queue
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from scrumix.api.core.config import settings
+from scrumix.agents.utils.logger import bind_log_context, logger, reset_log_context
+from scrumix.agents.workflows.store import FileTraceStore, TraceStore
+
+OK = "ok"
+ERROR = "error"
+CANCELLED = "cancelled"
+
+# 后台写入线程每批等待的时间
+WRITE_BATCH_SECONDS = 0.2
+
+_TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+# id 只需唯一、无需不可预测，用 getrandbits 避免每个 span 一次 urandom 系统调用
+def _new_span_id() -> str:
+    return f"{random.getrandbits(64):016x}"
+
+
+def _new_trace_id() -> str:
+    return f"{random.getrandbits(128):032x}"
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """解析 W3C traceparent 头，返回 (trace_id, parent_span_id, sampled)；格式无效时返回 None"""
+    if not header:
+        return None
+    match = _TRACEPARENT_RE.match(header.strip().lower())
+    if match is None:
+        return None
+    trace_id, parent_id, flags = match.groups()
+    if trace_id == "0" * 32 or parent_id == "0" * 16:
+        return None
+    return trace_id, parent_id, bool(int(flags, 16) & 1)
+
+
+@dataclass
+class Span:
+    """一次操作的耗时与属性"""
+    name: str
+    kind: str = "internal"
+    span_id: str = field(default_factory=_new_span_id)
+    parent_id: Optional[str] = None
+    started_at: float = field(default_factory=time.time)
+    duration: Optional[float] = None
+    status: str = OK
+    error: Optional[str] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    _start: float = field(default_factory=time.perf_counter, repr=False)
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update({k: v for k, v in attributes.items() if v is not None})
+
+    def finish(self) -> None:
+        self.duration = time.perf_counter() - self._start
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "started_at": self.started_at,
+            "duration": self.duration,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+@dataclass
+class Trace:
+    """一条轨迹的全部 span；run_id 即 W3C trace id，parent_id 为上游服务的 span"""
+    name: str
+    run_id: str = field(default_factory=_new_trace_id)
+    parent_id: Optional[str] = None
+    sampled: bool = True
+    spans: List[Span] = field(default_factory=list)
+
+    def totals(self) -> Dict[str, Any]:
+        llm = [s for s in self.spans if s.kind == "llm"]
+        db = [s for s in self.spans if s.kind == "db"]
+        return {
+            "llm_calls": len(llm),
+            "llm_seconds": sum(s.duration or 0.0 for s in llm),
+            "total_tokens": sum(s.attributes.get("total_tokens", 0) for s in llm),
+            "tool_calls": sum(1 for s in self.spans if s.kind == "tool"),
+            "db_statements": len(db),
+            "db_seconds": sum(s.duration or 0.0 for s in db),
+        }
+
+    def to_trace(self) -> Dict[str, Any]:
+        root = self.spans[0] if self.spans else None
+        return {
+            "run_id": self.run_id,
+            "name": root.name if root else self.name,
+            "kind": root.kind if root else "agent",
+            "parent_id": self.parent_id,
+            "status": root.status if root else OK,
+            "started_at": root.started_at if root else None,
+            "duration": root.duration if root else None,
+            "totals": self.totals(),
+            "spans": [span.to_dict() for span in self.spans],
+        }
+
+
+_current_trace: "contextvars.ContextVar[Optional[Trace]]" = contextvars.ContextVar("agent_trace", default=None)
+_current_span: "contextvars.ContextVar[Optional[Span]]" = contextvars.ContextVar("agent_span", default=None)
+
+
+def _reset(var: contextvars.ContextVar, token: contextvars.Token) -> None:
+    try:
+        var.reset(token)
+    except ValueError:
+        # 异步生成器在其他上下文中被关闭时无法还原，直接清空
+        var.set(None)
+
+
+class Tracer:
+    """追踪器；store 为空时使用 AGENT_TRACE_DIR，两者都为空时不记录"""
+
+    def __init__(self, store: Optional[TraceStore] = None, sample_rate: Optional[float] = None):
+        self._store = store
+        self._configured = store is not None
+        self.sample_rate = settings.TRACE_SAMPLE_RATE if sample_rate is None else sample_rate
+        self._queue: "queue.Queue[Tuple[TraceStore, Trace]]" = queue.Queue(maxsize=1000)
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        self.dropped = 0
+
+    @property
+    def store(self) -> Optional[TraceStore]:
+        if not self._configured:
+            self._configured = True
+            if settings.AGENT_TRACE_DIR:
+                self._store = FileTraceStore(settings.AGENT_TRACE_DIR)
+        return self._store
+
+    def configure(self, store: Optional[TraceStore], sample_rate: Optional[float] = None) -> None:
+        """替换轨迹存储（None 表示关闭追踪）与采样比例"""
+        self.flush()
+        self._store = store
+        self._configured = True
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+
+    @property
+    def enabled(self) -> bool:
+        return self.store is not None
+
+    def _sample(self) -> bool:
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    @staticmethod
+    def current_trace() -> Optional[Trace]:
+        return _current_trace.get()
+
+    @staticmethod
+    def traceparent() -> Optional[str]:
+        """当前上下文的 W3C traceparent；不在轨迹中时返回 None"""
+        trace = _current_trace.get()
+        if trace is None:
+            return None
+        span = _current_span.get()
+        span_id = span.span_id if span is not None else (trace.parent_id or _new_span_id())
+        return f"00-{trace.run_id}-{span_id}-{'01' if trace.sampled else '00'}"
+
+    def inject(self, headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """返回加上 traceparent 的请求头副本"""
+        headers = dict(headers or {})
+        traceparent = self.traceparent()
+        if traceparent is not None:
+            headers["traceparent"] = traceparent
+        return headers
+
+    @contextmanager
+    def span(self, name: str, kind: str = "internal", root: bool = False, **attributes: Any) -> Iterator[Span]:
+        """
+        记录一个 span；root=True 且当前没有轨迹时开始一条新轨迹（按采样比例决定是否记录），结束时写入存储
+        不在已采样的轨迹中时返回不被记录的 span
+        """
+        new_trace = None
+        if root and _current_trace.get() is None and self.enabled:
+            new_trace = Trace(name, sampled=self._sample())
+        with self._span(name, kind, attributes, new_trace) as span:
+            yield span
+
+    @contextmanager
+    def trace(self, name: str, kind: str = "server", traceparent: Optional[str] = None,
+              **attributes: Any) -> Iterator[Span]:
+        """
+        开始一条新轨迹（如一次 HTTP 请求）；traceparent 为上游的 W3C 头时沿用其 trace id 与采样决定
+        已在轨迹中时等同于 span()
+        """
+        if _current_trace.get() is not None:
+            with self._span(name, kind, attributes, None) as span:
+                yield span
+            return
+        parent = parse_traceparent(traceparent)
+        if parent is not None:
+            trace_id, parent_id, sampled = parent
+            new_trace = Trace(name, run_id=trace_id, parent_id=parent_id, sampled=sampled and self.enabled)
+        elif self.enabled:
+            new_trace = Trace(name, sampled=self._sample())
+        else:
+            new_trace = None
+        with self._span(name, kind, attributes, new_trace) as span:
+            yield span
+
+    @contextmanager
+    def _span(self, name: str, kind: str, attributes: Dict[str, Any], new_trace: Optional[Trace]) -> Iterator[Span]:
+        span = Span(name, kind)
+        span.set(**attributes)
+        trace = new_trace or _current_trace.get()
+        if trace is None or (not trace.sampled and new_trace is None):
+            yield span
+            return
+        if new_trace is not None:
+            trace_token = _current_trace.set(new_trace)
+            # 轨迹内的日志记录附带 trace_id
+            log_token = bind_log_context(trace_id=new_trace.run_id)
+            if not new_trace.sampled:
+                # 未采样：只在上下文中保留 trace id 与采样决定
+                try:
+                    yield span
+                finally:
+                    reset_log_context(log_token)
+                    _reset(_current_trace, trace_token)
+                return
+            span.parent_id = new_trace.parent_id
+        else:
+            parent = _current_span.get()
+            span.parent_id = parent.span_id if parent is not None else trace.parent_id
+        trace.spans.append(span)
+        span_token = _current_span.set(span)
+        try:
+            yield span
+        except (asyncio.CancelledError, GeneratorExit):
+            span.status = CANCELLED
+            raise
+        except BaseException as e:
+            span.status = ERROR
+            span.error = repr(e)
+            raise
+        finally:
+            span.finish()
+            _reset(_current_span, span_token)
+            if new_trace is not None:
+                reset_log_context(log_token)
+                _reset(_current_trace, trace_token)
+                self._save(new_trace)
+
+    def start_span(self, name: str, kind: str = "internal", **attributes: Any) -> Optional[Span]:
+        """
+        手动开始一个叶子 span（用于 SQLAlchemy 事件等无法使用 with 的场合），须用 end_span 结束
+        不在已采样的轨迹中时返回 None
+        """
+        trace = _current_trace.get()
+        if trace is None or not trace.sampled:
+            return None
+        parent = _current_span.get()
+        span = Span(name, kind, parent_id=parent.span_id if parent is not None else trace.parent_id)
+        span.set(**attributes)
+        trace.spans.append(span)
+        return span
+
+    @staticmethod
+    def end_span(span: Span, error: Optional[BaseException] = None) -> None:
+        if error is not None:
+            span.status = ERROR
+            span.error = repr(error)
+        span.finish()
+
+    def _save(self, trace: Trace) -> None:
+        """交给后台线程写入，队列满时丢弃"""
+        store = self.store
+        if store is None:
+            return
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait((store, trace))
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_writer(self) -> None:
+        if self._writer is None or not self._writer.is_alive():
+            with self._writer_lock:
+                if self._writer is None or not self._writer.is_alive():
+                    self._writer = threading.Thread(target=self._write_loop, name="trace-writer", daemon=True)
+                    self._writer.start()
+
+    def _write_loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            # 攒一批再写：写文件的系统调用每次都会释放 GIL，逐条写入时与事件循环线程反复争抢 GIL，
+            # 请求延迟的增加远大于写入本身的 CPU 开销
+            time.sleep(WRITE_BATCH_SECONDS)
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for store, trace in batch:
+                try:
+                    store.save(trace.to_trace())
+                except OSError as e:
+                    logger.warning(f"保存轨迹失败: {e}")
+                finally:
+                    self._queue.task_done()
+
+    def flush(self) -> None:
+        """等待已结束的轨迹全部写入"""
+        if self._writer is not None:
+            self._queue.join()
+
+
+default_tracer = Tracer()
@@ -0,0 +1,293 @@
+"""
+异步 DAG 工作流引擎
+
+步骤声明依赖，依赖全部完成的步骤立即并发执行：
+
+    workflow = Workflow("sprint_planning")
+
+    @workflow.step()
+    async def backlog(params):
+        return await po_agent.execute("整理待办", params)
+
+    @workflow.step(depends_on=["backlog"], timeout=60)
+    async def estimates(params, backlog):
+        return await dev_agent.execute("估算", {"backlog": backlog})
+
+    result = await workflow.run({"sprint_id": 1}, memo=MemoryMemoStore(), traces=FileTraceStore("traces"))
+
+- 记忆化：输入哈希 = 步骤名 + 版本 + 参数 + 依赖输出，命中时跳过执行
+- 超时：单步超时即失败；任一步失败时取消其余在途步骤，下游步骤标记为 skipped
+- 取消：取消 run() 所在任务会取消全部在途步骤
+- 每次运行的逐步耗时轨迹写入 TraceStore（无论成功、失败或取消）
+- on_step：步骤开始、命中缓存、结束时回调（用于进度推送）
+"""
+import asyncio
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence
+
+from scrumix.agents.utils.hashing import stable_hash
+from scrumix.agents.utils.logger import logger
+from scrumix.agents.utils.tracing import default_tracer
+from scrumix.agents.workflows.store import MISSING, MemoStore, TraceStore
+
+StepFunc = Callable[..., Awaitable[Any]]
+StepCallback = Callable[["StepTrace"], None]
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+CACHED = "cached"
+FAILED = "failed"
+TIMED_OUT = "timed_out"
+CANCELLED = "cancelled"
+SKIPPED = "skipped"
+
+
+class WorkflowError(Exception):
+    """工作流执行失败"""
+
+    def __init__(self, message: str, run: "WorkflowRun"):
+        super().__init__(message)
+        self.run = run
+
+
+@dataclass
+class Step:
+    """工作流步骤；func(params, **依赖输出)"""
+    name: str
+    func: StepFunc
+    depends_on: Sequence[str] = ()
+    timeout: Optional[float] = None
+    memoize: bool = True
+    # 修改步骤实现后递增版本，使旧的记忆化结果失效
+    version: str = "1"
+    # 步骤读取的参数名；None 表示全部参数都参与输入哈希
+    params: Optional[Sequence[str]] = None
+
+    def memo_key(self, params: Dict[str, Any], inputs: Dict[str, Any]) -> str:
+        """记忆化键；参数或输入无法稳定哈希时抛出 TypeError"""
+        used = params if self.params is None else {k: params.get(k) for k in self.params}
+        return stable_hash({"step": self.name, "version": self.version, "params": used, "inputs": inputs})
+
+
+@dataclass
+class StepTrace:
+    """步骤轨迹"""
+    name: str
+    status: str = PENDING
+    ready_at: Optional[float] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    memo_key: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def duration(self) -> Optional[float]:
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    @property
+    def wait(self) -> Optional[float]:
+        """依赖就绪后等待并发槽的时间"""
+        if self.ready_at is None or self.started_at is None:
+            return None
+        return self.started_at - self.ready_at
+
+
+@dataclass
+class WorkflowRun:
+    """一次运行的结果与轨迹"""
+    run_id: str
+    workflow: str
+    params: Dict[str, Any]
+    status: str = RUNNING
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    outputs: Dict[str, Any] = field(default_factory=dict)
+    steps: Dict[str, StepTrace] = field(default_factory=dict)
+
+    @property
+    def duration(self) -> Optional[float]:
+        return None if self.finished_at is None else self.finished_at - self.started_at
+
+    def to_trace(self) -> Dict[str, Any]:
+        """可持久化的轨迹（不含输出）"""
+        return {
+            "run_id": self.run_id,
+            "workflow": self.workflow,
+            "status": self.status,
+            "params": self.params,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration": self.duration,
+            "steps": [
+                {**asdict(trace), "duration": trace.duration, "wait": trace.wait}
+                for trace in self.steps.values()
+            ],
+        }
+
+
+def _notify(on_step: Optional[StepCallback], trace: StepTrace) -> None:
+    if on_step is not None:
+        try:
+            on_step(trace)
+        except Exception as e:
+            logger.warning(f"步骤回调失败: {e}")
+
+
+class Workflow:
+    """由步骤组成的有向无环图"""
+
+    def __init__(self, name: str, max_concurrency: Optional[int] = None):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.steps: Dict[str, Step] = {}
+
+    def add_step(self, step: Step) -> Step:
+        if step.name in self.steps:
+            raise ValueError(f"步骤重复: {step.name}")
+        self.steps[step.name] = step
+        return step
+
+    def step(self, name: Optional[str] = None, depends_on: Iterable[str] = (), timeout: Optional[float] = None,
+             memoize: bool = True, version: str = "1", params: Optional[Sequence[str]] = None):
+        """以装饰器方式添加步骤"""
+        def decorator(func: StepFunc) -> StepFunc:
+            self.add_step(Step(name or func.__name__, func, tuple(depends_on), timeout, memoize, version, params))
+            return func
+        return decorator
+
+    def validate(self) -> List[str]:
+        """检查依赖存在且无环，返回拓扑序"""
+        for step in self.steps.values():
+            for dependency in step.depends_on:
+                if dependency not in self.steps:
+                    raise ValueError(f"步骤 {step.name} 依赖不存在的步骤 {dependency}")
+        indegree = {name: len(step.depends_on) for name, step in self.steps.items()}
+        order = [name for name, degree in indegree.items() if degree == 0]
+        for name in order:
+            for other in self.steps.values():
+                if name in other.depends_on:
+                    indegree[other.name] -= 1
+                    if indegree[other.name] == 0:
+                        order.append(other.name)
+        if len(order) != len(self.steps):
+            raise ValueError(f"工作流 {self.name} 存在循环依赖")
+        return order
+
+    async def run(self, params: Optional[Dict[str, Any]] = None, memo: Optional[MemoStore] = None,
+                  traces: Optional[TraceStore] = None, run_id: Optional[str] = None,
+                  on_step: Optional[StepCallback] = None) -> WorkflowRun:
+        """执行工作流；失败时抛出 WorkflowError（其 run 属性包含轨迹）"""
+        self.validate()
+        run = WorkflowRun(run_id or uuid.uuid4().hex, self.name, dict(params or {}))
+        run.steps = {name: StepTrace(name) for name in self.steps}
+        try:
+            # 代理轨迹：整个运行为一条轨迹，步骤内的代理、LLM、工具调用挂在对应步骤下
+            with default_tracer.span(f"workflow.{self.name}", "workflow", root=True, run_id=run.run_id):
+                await self._execute(run, memo, on_step)
+            run.status = SUCCEEDED
+        except asyncio.CancelledError:
+            run.status = CANCELLED
+            raise
+        except WorkflowError:
+            run.status = FAILED
+            raise
+        finally:
+            run.finished_at = time.time()
+            for trace in run.steps.values():
+                if trace.status in (PENDING, RUNNING):
+                    trace.status = CANCELLED if run.status == CANCELLED or trace.status == RUNNING else SKIPPED
+            if traces is not None:
+                try:
+                    # 写文件与原子替换在线程池中执行，不阻塞事件循环
+                    await asyncio.get_running_loop().run_in_executor(None, traces.save, run.to_trace())
+                except OSError as e:
+                    logger.warning(f"保存工作流轨迹失败: {e}")
+        return run
+
+    async def _execute(self, run: WorkflowRun, memo: Optional[MemoStore], on_step: Optional[StepCallback]) -> None:
+        semaphore = asyncio.Semaphore(self.max_concurrency) if self.max_concurrency else None
+        remaining = {name: set(step.depends_on) for name, step in self.steps.items()}
+        running: Dict[asyncio.Task, str] = {}
+
+        def start_ready() -> None:
+            for name in [n for n, deps in remaining.items() if not deps]:
+                del remaining[name]
+                run.steps[name].ready_at = time.time()
+                task = asyncio.ensure_future(self._run_step(self.steps[name], run, memo, semaphore, on_step))
+                running[task] = name
+
+        start_ready()
+        try:
+            while running:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = running.pop(task)
+                    error = task.exception()
+                    if error is not None:
+                        raise WorkflowError(f"步骤 {name} 失败: {error!r}", run) from error
+                    for deps in remaining.values():
+                        deps.discard(name)
+                start_ready()
+        finally:
+            # 失败或被取消时，取消仍在执行的步骤并等待其退出
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+    async def _run_step(self, step: Step, run: WorkflowRun, memo: Optional[MemoStore],
+                        semaphore: Optional[asyncio.Semaphore], on_step: Optional[StepCallback] = None) -> None:
+        trace = run.steps[step.name]
+        inputs = {dependency: run.outputs[dependency] for dependency in step.depends_on}
+
+        if memo is not None and step.memoize:
+            try:
+                trace.memo_key = step.memo_key(run.params, inputs)
+            except TypeError as e:
+                # 输入无法稳定哈希（如 numpy 数组、任意对象）时不记忆化该步骤
+                logger.debug(f"步骤 {step.name} 不记忆化: {e}")
+        if trace.memo_key is not None:
+            cached = await memo.aget(trace.memo_key)
+            if cached is not MISSING:
+                trace.started_at = trace.finished_at = time.time()
+                trace.status = CACHED
+                run.outputs[step.name] = cached
+                _notify(on_step, trace)
+                return
+
+        if semaphore is not None:
+            await semaphore.acquire()
+        trace.started_at = time.time()
+        trace.status = RUNNING
+        _notify(on_step, trace)
+        try:
+            with default_tracer.span(f"step.{step.name}", "step"):
+                output = await asyncio.wait_for(step.func(run.params, **inputs), timeout=step.timeout)
+        except asyncio.TimeoutError:
+            trace.status = TIMED_OUT
+            trace.error = f"超时（{step.timeout}s）"
+            raise
+        except asyncio.CancelledError:
+            trace.status = CANCELLED
+            raise
+        except Exception as e:
+            trace.status = FAILED
+            trace.error = repr(e)
+            raise
+        finally:
+            trace.finished_at = time.time()
+            if semaphore is not None:
+                semaphore.release()
+            if trace.status != RUNNING:
+                _notify(on_step, trace)
+
+        trace.status = SUCCEEDED
+        run.outputs[step.name] = output
+        _notify(on_step, trace)
+        if trace.memo_key is not None:
+            await memo.aset(trace.memo_key, output)
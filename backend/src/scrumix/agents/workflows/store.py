@@ -0,0 +1,148 @@
+"""
+工作流的持久化：步骤输出的记忆化存储与运行轨迹存储
+"""
+import asyncio
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+# 记忆化存储中缺失的标记（输出本身可能为 None）
+MISSING = object()
+
+
+class MemoStore(ABC):
+    """步骤输出的记忆化存储，键为输入哈希"""
+
+    @abstractmethod
+    def get(self, key: str) -> Any:
+        """返回输出，未命中时返回 MISSING"""
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    async def aget(self, key: str) -> Any:
+        """供工作流引擎调用；会阻塞的实现应在线程池中执行"""
+        return self.get(key)
+
+    async def aset(self, key: str, value: Any) -> None:
+        self.set(key, value)
+
+
+class MemoryMemoStore(MemoStore):
+    """进程内记忆化存储"""
+
+    def __init__(self):
+        self._values: Dict[str, Any] = {}
+
+    def get(self, key: str) -> Any:
+        return self._values.get(key, MISSING)
+
+    def set(self, key: str, value: Any) -> None:
+        self._values[key] = value
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+class SQLiteMemoStore(MemoStore):
+    """SQLite 记忆化存储，输出以 pickle 保存（只用于本地可信数据）"""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS workflow_memo (key TEXT PRIMARY KEY, value BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM workflow_memo WHERE key = ?", (key,)).fetchone()
+        return MISSING if row is None else pickle.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO workflow_memo (key, value, created_at) VALUES (?, ?, ?)",
+                (key, data, time.time()),
+            )
+
+    async def aget(self, key: str) -> Any:
+        # 查询与反序列化在线程池中执行，不阻塞事件循环
+        return await asyncio.get_running_loop().run_in_executor(None, self.get, key)
+
+    async def aset(self, key: str, value: Any) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, self.set, key, value)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class TraceStore(ABC):
+    """运行轨迹存储"""
+
+    @abstractmethod
+    def save(self, trace: Dict[str, Any]) -> None:
+        pass
+
+    @abstractmethod
+    def load(self, run_id: str) -> Optional[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    def list_runs(self, workflow: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """最近的运行（不含步骤明细）"""
+        pass
+
+
+class FileTraceStore(TraceStore):
+    """每次运行一个 JSON 文件：<directory>/<run_id>.json"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, run_id: str) -> str:
+        return os.path.join(self.directory, f"{run_id}.json")
+
+    def save(self, trace: Dict[str, Any]) -> None:
+        # 先写临时文件再原子替换，读取方不会读到半个文件
+        path = self._path(trace["run_id"])
+        tmp = f"{path}.tmp"
+        data = json.dumps(trace, ensure_ascii=False, default=str)
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def load(self, run_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(run_id), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def list_runs(self, workflow: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        entries: List[Tuple[float, str]] = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                path = os.path.join(self.directory, name)
+                entries.append((os.path.getmtime(path), name[:-len(".json")]))
+        runs = []
+        for _, run_id in sorted(entries, reverse=True):
+            trace = self.load(run_id)
+            # 工作流轨迹以 workflow 标识，代理轨迹以 name 标识
+            if trace is None or (workflow and workflow not in (trace.get("workflow"), trace.get("name"))):
+                continue
+            runs.append({k: v for k, v in trace.items() if k != "steps"})
+            if len(runs) >= limit:
+                break
+        return runs
@@ -5,7 +5,17 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from scrumix.api.core.config import settings
+from scrumix.api.core.middleware import RequestContextMiddleware, TracingMiddleware
+from scrumix.api.core.realtime import board_hub
 from scrumix.api.routes import api_router
+from scrumix.api.crud.rank import rank_rebalancer
+from scrumix.api.crud.usage import usage_crud
+from scrumix.api.db.database import SessionLocal
+from scrumix.agents.llm.client import close_http_client
+from scrumix.agents.llm.usage import default_usage
+from scrumix.agents.tasks.jobs import job_manager
+from scrumix.agents.utils.logger import logger, logging_pipeline
+from scrumix.agents.utils.tracing import default_tracer
 
 
 app = FastAPI(
@@ -27,8 +37,42 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 后添加的在外层：先确定 request_id，再开始轨迹
+app.add_middleware(TracingMiddleware)
+app.add_middleware(RequestContextMiddleware)
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+def flush_llm_usage():
+    """把进程内累计的LLM用量写入数据库"""
+    db = SessionLocal()
+    try:
+        usage_crud.flush(db)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+async def startup():
+    """启动LLM用量的定期写库任务、排序键后台重排与看板事件广播"""
+    default_usage.start(flush_llm_usage)
+    rank_rebalancer.start(SessionLocal)
+    await board_hub.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    """取消未结束的后台任务，关闭看板连接，写入剩余的LLM用量，关闭LLM共享连接池"""
+    await job_manager.shutdown()
+    await board_hub.stop()
+    await rank_rebalancer.stop()
+    await default_usage.stop()
+    try:
+        flush_llm_usage()
+    except Exception as e:
+        logger.warning(f"写入LLM用量失败: {e}")
+    await close_http_client()
+    default_tracer.flush()
+    logging_pipeline.stop()
+
 @app.get("/health")
 async def health_check():
     """健康检查端点"""
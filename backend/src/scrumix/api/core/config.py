@@ -13,6 +13,19 @@ class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     SECRET_KEY: str = os.environ.get("SECRET_KEY", "changeme")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8  # 8 days
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    
+    # 访问令牌签名算法：HS256 使用 SECRET_KEY；ES256/RS256 使用下面的PEM密钥，
+    # 其他服务只需公钥（GET /auth/jwks）即可验证令牌
+    JWT_ALGORITHM: str = os.environ.get("JWT_ALGORITHM", "HS256")
+    JWT_PRIVATE_KEY: str = os.environ.get("JWT_PRIVATE_KEY", "")
+    JWT_PUBLIC_KEY: str = os.environ.get("JWT_PUBLIC_KEY", "")
+    # 已验证访问令牌的缓存条目数（0 表示关闭缓存）
+    TOKEN_CACHE_SIZE: int = 10_000
+    # 轮换后旧刷新令牌仍可使用的宽限时间（并发刷新），超出后重用视为令牌泄露
+    REFRESH_TOKEN_REUSE_WINDOW_SECONDS: int = 30
+    # 每个进程缓存用户令牌版本的秒数：其他进程中的权限变更最多在该时间后生效
+    TOKEN_VERSION_CACHE_SECONDS: float = 5.0
     
     # URLs
     BACKEND_URL: str = os.environ.get("BACKEND_URL", "http://localhost:8000")
@@ -45,7 +58,81 @@ class Settings(BaseSettings):
     def KEYCLOAK_USERINFO_URL(self) -> str:
         return f"{self.KEYCLOAK_SERVER_URL}/realms/{self.KEYCLOAK_REALM}/protocol/openid-connect/userinfo"
 
-    SQLALCHEMY_DATABASE_URI: Optional[PostgresDsn] = None
+    # Azure OpenAI / OpenAI 兼容接口
+    AZURE_OPENAI_ENDPOINT: str = os.environ.get("AZURE_OPENAI_ENDPOINT", "")
+    AZURE_OPENAI_API_KEY: str = os.environ.get("AZURE_OPENAI_API_KEY", "")
+    AZURE_OPENAI_API_VERSION: str = os.environ.get("AZURE_OPENAI_API_VERSION", "2024-12-01-preview")
+    AZURE_OPENAI_DEPLOYMENT: str = os.environ.get("AZURE_OPENAI_DEPLOYMENT", "gpt-4o-mini")
+    AZURE_OPENAI_EMBEDDING_DEPLOYMENT: str = os.environ.get("AZURE_OPENAI_EMBEDDING_DEPLOYMENT", "text-embedding-3-small")
+    
+    # LLM 调度：每个部署的并发上限、每分钟token预算、重试次数
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_TOKENS_PER_MINUTE: int = 120_000
+    LLM_MAX_RETRIES: int = 4
+    LLM_REQUEST_TIMEOUT_SECONDS: float = 120.0
+    
+    # LLM 响应缓存；LLM_CACHE_PATH 为空时只使用内存缓存
+    LLM_CACHE_TTL_SECONDS: int = 24 * 60 * 60
+    LLM_CACHE_MAX_ENTRIES: int = 10_000
+    LLM_CACHE_PATH: str = ""
+    
+    # 嵌入批量上限（单次请求的输入条数与token数）
+    EMBEDDING_BATCH_SIZE: int = 256
+    EMBEDDING_BATCH_TOKENS: int = 100_000
+    
+    # 提示词预算：模型上下文窗口与上下文打包的目标token数（0 表示窗口减去输出预留）
+    LLM_CONTEXT_WINDOW: int = 128_000
+    LLM_PROMPT_TOKEN_BUDGET: int = 16_000
+    
+    # 轨迹目录（每条请求/代理运行轨迹一个 JSON 文件）；为空时不记录
+    AGENT_TRACE_DIR: str = os.environ.get("AGENT_TRACE_DIR", "")
+    # 新轨迹的采样比例（上游 traceparent 已带采样决定时沿用上游）
+    # 全量采样约增加 15% 请求延迟，默认只采样 10%；排查问题时可通过环境变量 TRACE_SAMPLE_RATE=1.0 临时调高
+    TRACE_SAMPLE_RATE: float = 0.1
+    
+    # LLM 用量：项目默认每日token配额（0 表示不限）与用量写库周期
+    LLM_PROJECT_DAILY_TOKEN_QUOTA: int = 0
+    LLM_USAGE_FLUSH_SECONDS: float = 10.0
+
+    # 异步代理任务：同时运行的任务数、每个用户同时排队/运行的任务数、单个任务超时、结果保留时间、每个任务保留的进度事件数
+    JOB_MAX_WORKERS: int = 4
+    JOB_MAX_ACTIVE_PER_USER: int = 3
+    JOB_TIMEOUT_SECONDS: float = 15 * 60
+    JOB_RESULT_TTL_SECONDS: float = 60 * 60
+    JOB_EVENT_BUFFER: int = 5000
+
+    # 看板实时推送：跨进程广播地址（为空时只在进程内广播，redis://... 使用 Redis pub/sub）、
+    # 每个连接的发送队列长度、空闲连接的心跳间隔
+    BOARD_BROADCAST_URL: str = ""
+    BOARD_SEND_QUEUE_SIZE: int = 256
+    BOARD_HEARTBEAT_SECONDS: float = 30.0
+
+    # 项目变更日志：保留天数（更早的记录被清除，落后更多的客户端需要全量重新加载）、
+    # 每个项目每写入多少个版本压缩一次（0 表示不自动压缩）
+    CHANGE_LOG_RETENTION_DAYS: int = 30
+    CHANGE_LOG_COMPACT_EVERY: int = 1000
+
+    # 排序键（待办优先级、看板列内顺序）：键长超过该值时登记后台重排，以及后台重排的执行间隔
+    RANK_REBALANCE_LENGTH: int = 24
+    RANK_REBALANCE_INTERVAL_SECONDS: float = 30.0
+
+    # 日志：级别、格式（json / text）、异步队列容量、重复警告/错误的限流、DEBUG 记录按日志器前缀的采样比例
+    LOG_LEVEL: str = os.environ.get("LOG_LEVEL", "INFO")
+    LOG_FORMAT: str = os.environ.get("LOG_FORMAT", "json")
+    LOG_QUEUE_SIZE: int = 10_000
+    LOG_ERROR_BURST: int = 10
+    LOG_ERROR_WINDOW_SECONDS: float = 60.0
+    LOG_SAMPLE_RATES: Dict[str, float] = {}
+
+    # 可直接指定完整连接串，例如本地运行时使用 sqlite:///./scrumix.db
+    SQLALCHEMY_DATABASE_URI: Optional[str] = None
+    
+    @field_validator("JWT_ALGORITHM", mode="after")
+    def validate_jwt_algorithm(cls, v: str) -> str:
+        # python-jose 不支持 EdDSA
+        if v not in ("HS256", "ES256", "RS256"):
+            raise ValueError(f"Unsupported JWT_ALGORITHM: {v} (supported: HS256, ES256, RS256)")
+        return v
     
     @field_validator("SQLALCHEMY_DATABASE_URI", mode="after")
     def assemble_db_connection(cls, v: Optional[str], info) -> Any:
@@ -63,13 +150,13 @@ class Settings(BaseSettings):
         if isinstance(port, str):
             port = int(port)
         
-        return PostgresDsn.build(
+        return str(PostgresDsn.build(
             scheme="postgresql",
             username=user,
             password=password,
             host=host,
             port=port,
             path=f"{db or ''}",
-        )
+        ))
 
 settings = Settings() 
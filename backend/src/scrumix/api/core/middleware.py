@@ -0,0 +1,100 @@
+"""
+ASGI 中间件（纯 ASGI 实现，不缓冲流式响应）
+
+- RequestContextMiddleware：为每个请求确定 request_id（沿用请求头 X-Request-ID，否则生成），
+  在请求处理期间绑定到日志上下文，并写回响应头
+- TracingMiddleware：每个请求为一条轨迹的根 span（沿用上游 traceparent），
+  请求中的数据库语句、Keycloak 调用、密码哈希、LLM 调用等挂在其下，见 agents/utils/tracing.py
+"""
+import re
+import uuid
+
+from scrumix.agents.utils.logger import log_context
+from scrumix.agents.utils.tracing import ERROR, default_tracer
+
+REQUEST_ID_HEADER = b"x-request-id"
+TRACEPARENT_HEADER = b"traceparent"
+# 只接受简单的请求ID，避免日志注入
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._\-]{1,64}$")
+
+
+def _header(scope, name: bytes):
+    for key, value in scope.get("headers") or []:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _request_id(scope) -> str:
+    candidate = _header(scope, REQUEST_ID_HEADER)
+    if candidate is not None and _REQUEST_ID_RE.match(candidate):
+        return candidate
+    return uuid.uuid4().hex
+
+
+class RequestContextMiddleware:
+    """绑定 request_id 到日志上下文"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        request_id = _request_id(scope)
+        scope.setdefault("state", {})["request_id"] = request_id
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers") or [])
+                headers.append((REQUEST_ID_HEADER, request_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        with log_context(request_id=request_id):
+            await self.app(scope, receive, send_with_request_id)
+
+
+def _path_template(scope) -> str:
+    """把路径中的路径参数值替换为 {参数名}"""
+    params = scope.get("path_params")
+    if not params:
+        return scope["path"]
+    segments = scope["path"].split("/")
+    for name, value in params.items():
+        value = str(value)
+        for i, segment in enumerate(segments):
+            if segment == value:
+                segments[i] = f"{{{name}}}"
+                break
+    return "/".join(segments)
+
+
+class TracingMiddleware:
+    """为每个 HTTP 请求开始一条轨迹（按 TRACE_SAMPLE_RATE 采样）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        with default_tracer.trace(
+            f"http {method} {scope['path']}", "server",
+            traceparent=_header(scope, TRACEPARENT_HEADER), method=method, path=scope["path"],
+        ) as span:
+            async def send_with_status(message):
+                if message["type"] == "http.response.start":
+                    span.set(status_code=message["status"])
+                    if message["status"] >= 500:
+                        span.status = ERROR
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                # 用路径模板命名，便于按接口聚合（不同 FastAPI 版本的路由对象不一定带完整前缀）
+                span.name = f"http {method} {_path_template(scope)}"
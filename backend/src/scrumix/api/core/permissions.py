@@ -0,0 +1,179 @@
+"""
+权限模型
+
+访问令牌中携带紧凑的权限声明，请求时无需查询数据库即可完成授权：
+- `scopes`: 全局角色，例如 ["superuser"]
+- `prj`: 项目权限位集，{"<project_id>": <Permission 位掩码>}
+
+项目成员关系（设计文档中的 ProjectUser.role）变更后，调用
+`notify_membership_changed` 提高该用户的令牌版本，使此前签发的令牌失效，客户端刷新令牌后获得新的权限声明。
+"""
+import threading
+import time
+from collections import OrderedDict
+from enum import Enum, IntFlag
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from scrumix.api.core.config import settings
+from scrumix.api.models.user import User
+
+
+class Permission(IntFlag):
+    """项目内权限位"""
+    VIEW = 1
+    EDIT_BACKLOG = 2
+    MANAGE_SPRINT = 4
+    MANAGE_MEMBERS = 8
+    MANAGE_PROJECT = 16
+    USE_AGENTS = 32
+
+
+class GlobalRole(str, Enum):
+    """全局角色"""
+    USER = "user"
+    SUPERUSER = "superuser"
+
+
+class ProjectRole(str, Enum):
+    """项目角色"""
+    PRODUCT_OWNER = "product_owner"
+    SCRUM_MASTER = "scrum_master"
+    DEVELOPER = "developer"
+    VIEWER = "viewer"
+
+
+ROLE_PERMISSIONS: Dict[ProjectRole, Permission] = {
+    ProjectRole.PRODUCT_OWNER: (
+        Permission.VIEW | Permission.EDIT_BACKLOG | Permission.MANAGE_SPRINT
+        | Permission.MANAGE_MEMBERS | Permission.MANAGE_PROJECT | Permission.USE_AGENTS
+    ),
+    ProjectRole.SCRUM_MASTER: (
+        Permission.VIEW | Permission.EDIT_BACKLOG | Permission.MANAGE_SPRINT
+        | Permission.MANAGE_MEMBERS | Permission.USE_AGENTS
+    ),
+    ProjectRole.DEVELOPER: Permission.VIEW | Permission.EDIT_BACKLOG | Permission.USE_AGENTS,
+    ProjectRole.VIEWER: Permission.VIEW,
+}
+
+ALL_PERMISSIONS = Permission(sum(Permission))
+
+
+def global_role_of(user) -> GlobalRole:
+    """用户的全局角色"""
+    return GlobalRole.SUPERUSER if user.is_superuser else GlobalRole.USER
+
+
+def encode_project_permissions(project_roles: Mapping[int, Iterable[ProjectRole]]) -> Dict[str, int]:
+    """将 {项目ID: 角色列表} 编码为 {"项目ID": 位掩码}（JSON对象的键必须是字符串）"""
+    encoded = {}
+    for project_id, roles in project_roles.items():
+        if isinstance(roles, ProjectRole):
+            roles = [roles]
+        bits = Permission(0)
+        for role in roles:
+            bits |= ROLE_PERMISSIONS[ProjectRole(role)]
+        if bits:
+            encoded[str(project_id)] = int(bits)
+    return encoded
+
+
+def decode_project_permissions(claim: Optional[Mapping[str, int]]) -> Dict[int, int]:
+    """解码令牌中的项目权限位集"""
+    if not claim:
+        return {}
+    return {int(project_id): int(bits) for project_id, bits in claim.items()}
+
+
+def has_project_permission(scopes: List[str], project_permissions: Mapping[int, int],
+                           project_id: int, permission: Permission) -> bool:
+    """O(1) 判断是否拥有项目权限；超级用户拥有全部权限"""
+    if GlobalRole.SUPERUSER.value in scopes:
+        return True
+    return project_permissions.get(project_id, 0) & permission == permission
+
+
+# 项目成员关系加载器：(db, user_id) -> {project_id: 角色或角色列表}
+# 项目成员模型实现后通过 register_project_roles_loader 注册
+ProjectRolesLoader = Callable[[Session, int], Mapping[int, Iterable[ProjectRole]]]
+_project_roles_loader: Optional[ProjectRolesLoader] = None
+
+
+def register_project_roles_loader(loader: ProjectRolesLoader) -> None:
+    """注册项目成员关系加载器"""
+    global _project_roles_loader
+    _project_roles_loader = loader
+
+
+def load_project_roles(db: Session, user_id: int) -> Mapping[int, Iterable[ProjectRole]]:
+    """加载用户的项目角色，签发令牌时调用"""
+    if _project_roles_loader is None:
+        return {}
+    return _project_roles_loader(db, user_id)
+
+
+class TokenVersions:
+    """
+    用户令牌版本（users.token_version）
+    访问令牌签发时写入当时的版本（"ver" 声明），版本小于当前版本的令牌视为过期，需要刷新后重新签发。
+    版本保存在数据库中，重启后仍然有效、各工作进程共享；每个进程按 TOKEN_VERSION_CACHE_SECONDS 缓存读取结果，
+    其他进程中的变更最多在该时间后生效（本进程中的变更立即生效）。
+    """
+
+    def __init__(self, ttl: Optional[float] = None, max_entries: int = 100_000):
+        self.ttl = settings.TOKEN_VERSION_CACHE_SECONDS if ttl is None else ttl
+        self.max_entries = max_entries
+        # user_id -> (版本, 缓存过期时间)
+        self._versions: "OrderedDict[int, Tuple[int, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _put(self, user_id: int, version: int) -> None:
+        with self._lock:
+            self._versions[user_id] = (version, time.monotonic() + self.ttl)
+            self._versions.move_to_end(user_id)
+            while len(self._versions) > self.max_entries:
+                self._versions.popitem(last=False)
+
+    def current(self, db: Session, user_id: int) -> Optional[int]:
+        """用户当前的令牌版本（用户不存在时返回 None）"""
+        cached = self._versions.get(user_id)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+        version = db.query(User.token_version).filter(User.id == user_id).scalar()
+        if version is None:
+            return None
+        self._put(user_id, version)
+        return version
+
+    def bump(self, db: Session, user_id: int) -> None:
+        """令牌版本加一（由调用方提交，提交后调用 invalidate）"""
+        db.query(User).filter(User.id == user_id).update(
+            {User.token_version: User.token_version + 1}, synchronize_session=False
+        )
+
+    def invalidate(self, *user_ids: int) -> None:
+        """丢弃本进程中缓存的版本"""
+        with self._lock:
+            for user_id in user_ids:
+                self._versions.pop(user_id, None)
+
+    def is_stale(self, db: Session, user_id: int, token_version: Optional[int]) -> bool:
+        """令牌是否签发于最近一次权限变更之前（用户已不存在时同样视为过期）"""
+        version = self.current(db, user_id)
+        return version is None or (token_version or 0) < version
+
+    def clear(self) -> None:
+        with self._lock:
+            self._versions.clear()
+
+
+token_versions = TokenVersions()
+
+
+def notify_membership_changed(db: Session, *user_ids: int) -> None:
+    """项目成员关系或全局角色变更后调用，使相关用户的现有令牌失效"""
+    for user_id in user_ids:
+        token_versions.bump(db, user_id)
+    db.commit()
+    token_versions.invalidate(*user_ids)
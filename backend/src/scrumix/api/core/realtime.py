@@ -0,0 +1,314 @@
+"""
+看板实时推送
+
+BoardHub 按项目频道把看板变更事件推送给已订阅的连接（WebSocket 路由见 routes/boards.py）：
+- 每个事件只序列化一次，扇出时只把同一个字符串放入各订阅者的发送队列，不等待任何连接
+- 每个连接一个有界发送队列：客户端读得慢时，带相同 key 的事件（如同一张卡片的多次移动）
+  合并为最新一条；队列仍满时丢弃最旧的事件，并在下次发送前先推送 resync，提示客户端重新拉取看板
+- 跨进程广播：事件先交给广播后端，由后端投递给每个工作进程的本地订阅者；
+  BOARD_BROADCAST_URL 为空时只在进程内广播，redis://... 时使用 Redis pub/sub（需要安装 redis）
+
+    board_hub.publish(project_id, "item.moved", {"id": 12, "status": "done", "rank": "a0V"}, key="item:12")
+"""
+import asyncio
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set
+
+from scrumix.api.core.config import settings
+from scrumix.agents.utils.logger import setup_logger
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover - 可选依赖
+    aioredis = None
+
+logger = setup_logger("scrumix.api.realtime")
+
+RESYNC = "resync"
+PING = "ping"
+
+# 投递回调：(project_id, key, message)
+Deliver = Callable[[int, Optional[str], str], None]
+
+
+class Subscription:
+    """一个连接对某个项目频道的订阅（只在事件循环线程中使用）"""
+
+    def __init__(self, project_id: int, user_id: Optional[int], max_queue: int):
+        self.project_id = project_id
+        self.user_id = user_id
+        self.max_queue = max(1, max_queue)
+        # key -> 消息；未带 key 的事件使用递增序号作为 key，不参与合并
+        self._queue: "OrderedDict[Hashable, str]" = OrderedDict()
+        self._seq = 0
+        # 等待中的发送循环（扇出时只对其 set_result，比 asyncio.Event 少一层等待者列表）
+        self._waiter: Optional[asyncio.Future] = None
+        self._resync = False
+        self.closed = False
+        self.delivered = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    def offer(self, key: Optional[str], message: str) -> None:
+        """放入发送队列，不阻塞"""
+        if self.closed:
+            return
+        if key is None:
+            self._seq += 1
+            slot: Hashable = self._seq
+        else:
+            slot = ("k", key)
+            if self._queue.pop(slot, None) is not None:
+                self.coalesced += 1
+        self._queue[slot] = message
+        while len(self._queue) > self.max_queue:
+            self._queue.popitem(last=False)
+            self.dropped += 1
+            self._resync = True
+        self._wake()
+
+    def _wake(self) -> None:
+        waiter = self._waiter
+        if waiter is not None:
+            self._waiter = None
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def get(self, timeout: Optional[float] = None) -> List[str]:
+        """
+        取出队列中的全部消息；超时返回空列表（用于心跳）
+        丢弃过事件时第一条为 resync
+        """
+        if not self._queue and not self.closed:
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                if timeout is None:
+                    await self._waiter
+                else:
+                    await asyncio.wait_for(self._waiter, timeout=timeout)
+            except asyncio.TimeoutError:
+                return []
+            finally:
+                self._waiter = None
+        messages = list(self._queue.values())
+        self._queue.clear()
+        if self._resync:
+            self._resync = False
+            messages.insert(0, _encode(self.project_id, RESYNC, {"dropped": self.dropped}))
+        self.delivered += len(messages)
+        return messages
+
+    def close(self) -> None:
+        self.closed = True
+        self._queue.clear()
+        self._wake()
+
+
+def _encode(project_id: int, event: str, data: Dict[str, Any]) -> str:
+    return json.dumps(
+        {"type": event, "project_id": project_id, "ts": time.time(), "data": data},
+        ensure_ascii=False, default=str,
+    )
+
+
+class BroadcastBackend(ABC):
+    """广播后端：把事件投递给所有工作进程（包括自己）"""
+
+    async def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+
+    @abstractmethod
+    def publish(self, project_id: int, key: Optional[str], message: str) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+
+class MemoryBroadcast(BroadcastBackend):
+    """进程内广播（单进程部署）"""
+
+    def __init__(self):
+        self._deliver: Optional[Deliver] = None
+
+    def publish(self, project_id: int, key: Optional[str], message: str) -> None:
+        if self._deliver is not None:
+            self._deliver(project_id, key, message)
+
+
+class RedisBroadcast(BroadcastBackend):
+    """
+    Redis pub/sub 广播：每个项目一个频道 {prefix}{project_id}
+    发布放入本地队列后由后台任务写入 Redis，调用方不等待网络；
+    本进程发布的事件也经 Redis 返回后再投递，各进程看到的顺序一致
+    """
+
+    def __init__(self, url: str, prefix: str = "scrumix:board:", max_pending: int = 10_000):
+        if aioredis is None:
+            raise RuntimeError("BOARD_BROADCAST_URL 使用 Redis 需要安装 redis（pip install redis）")
+        self.url = url
+        self.prefix = prefix
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._deliver: Optional[Deliver] = None
+        self._client = None
+        self._pending: Optional["asyncio.Queue"] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+        self._client = aioredis.from_url(self.url)
+        self._pending = asyncio.Queue(self.max_pending)
+        self._tasks = [asyncio.create_task(self._publisher()), asyncio.create_task(self._subscriber())]
+
+    def publish(self, project_id: int, key: Optional[str], message: str) -> None:
+        if self._pending is None:
+            return
+        try:
+            self._pending.put_nowait((f"{self.prefix}{project_id}", json.dumps([key, message])))
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def _publisher(self) -> None:
+        while True:
+            channel, payload = await self._pending.get()
+            try:
+                await self._client.publish(channel, payload)
+            except Exception as e:
+                logger.warning(f"看板事件发布失败: {e}")
+
+    async def _subscriber(self) -> None:
+        while True:
+            try:
+                pubsub = self._client.pubsub()
+                await pubsub.psubscribe(f"{self.prefix}*")
+                async for item in pubsub.listen():
+                    if item.get("type") != "pmessage":
+                        continue
+                    channel = item["channel"]
+                    if isinstance(channel, bytes):
+                        channel = channel.decode()
+                    key, message = json.loads(item["data"])
+                    self._deliver(int(channel[len(self.prefix):]), key, message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # 断线后重连；期间的事件丢失，客户端重连时会重新拉取看板
+                logger.warning(f"看板事件订阅中断，1秒后重连: {e}")
+                await asyncio.sleep(1.0)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def broadcast_from_url(url: str) -> BroadcastBackend:
+    if not url:
+        return MemoryBroadcast()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBroadcast(url)
+    raise ValueError(f"不支持的 BOARD_BROADCAST_URL: {url}")
+
+
+class BoardHub:
+    """按项目频道扇出看板事件"""
+
+    def __init__(self, backend: Optional[BroadcastBackend] = None, queue_size: Optional[int] = None):
+        self.backend = backend
+        self.queue_size = settings.BOARD_SEND_QUEUE_SIZE if queue_size is None else queue_size
+        self._channels: Dict[int, Set[Subscription]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._started = False
+        self.published = 0
+
+    async def start(self) -> None:
+        """启动广播后端（首次订阅或发布时也会自动以 MemoryBroadcast 启动）"""
+        if self._started:
+            return
+        self._loop = asyncio.get_running_loop()
+        if self.backend is None:
+            self.backend = broadcast_from_url(settings.BOARD_BROADCAST_URL)
+        self._started = True
+        await self.backend.start(self._deliver)
+
+    def _ensure_started(self) -> None:
+        if self._started:
+            return
+        # 未在启动事件中调用 start() 时（如脚本、基准）使用进程内广播
+        if self.backend is None:
+            self.backend = MemoryBroadcast()
+        if not isinstance(self.backend, MemoryBroadcast):
+            raise RuntimeError("BoardHub 未启动：跨进程广播需要先 await start()")
+        self._loop = asyncio.get_running_loop()
+        self.backend._deliver = self._deliver
+        self._started = True
+
+    async def stop(self) -> None:
+        for subscriptions in self._channels.values():
+            for subscription in subscriptions:
+                subscription.close()
+        self._channels.clear()
+        if self._started and self.backend is not None:
+            await self.backend.stop()
+        self._started = False
+
+    def subscribe(self, project_id: int, user_id: Optional[int] = None) -> Subscription:
+        self._ensure_started()
+        subscription = Subscription(project_id, user_id, self.queue_size)
+        self._channels.setdefault(project_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscription.close()
+        subscriptions = self._channels.get(subscription.project_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._channels[subscription.project_id]
+
+    def publish(self, project_id: int, event: str, data: Dict[str, Any], key: Optional[str] = None) -> None:
+        """
+        发布看板事件，不阻塞；key 相同的事件在慢连接的队列中合并为最新一条
+        可在事件循环线程或其他线程（如同步路由的线程池）中调用
+        """
+        message = _encode(project_id, event, data)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            if self._loop is None:
+                return
+            self._loop.call_soon_threadsafe(self._publish, project_id, key, message)
+            return
+        self._publish(project_id, key, message)
+
+    def _publish(self, project_id: int, key: Optional[str], message: str) -> None:
+        self._ensure_started()
+        self.published += 1
+        self.backend.publish(project_id, key, message)
+
+    def _deliver(self, project_id: int, key: Optional[str], message: str) -> None:
+        for subscription in tuple(self._channels.get(project_id, ())):
+            subscription.offer(key, message)
+
+    def stats(self) -> Dict[str, Any]:
+        subscriptions = [s for channel in self._channels.values() for s in channel]
+        return {
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+            "channels": len(self._channels),
+            "subscribers": len(subscriptions),
+            "published": self.published,
+            "pending": sum(len(s._queue) for s in subscriptions),
+            "coalesced": sum(s.coalesced for s in subscriptions),
+            "dropped": sum(s.dropped for s in subscriptions),
+        }
+
+
+board_hub = BoardHub()
@@ -1,7 +1,16 @@
 # 安全相关，如认证加密
-from jose import JWTError, jwt
+from jose import JWTError, jwk, jwt
+from jose.backends.base import Key
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional, Union, Any
+from functools import lru_cache
+from typing import Optional, Union, Any, Dict, Tuple
+import base64
+import hashlib
+import hmac
+import secrets
+import threading
+import time
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
@@ -10,10 +19,94 @@ from scrumix.api.core.config import settings
 from scrumix.api.db.database import get_db
 from scrumix.api.utils.password import verify_password, get_password_hash
 from scrumix.api.schemas.user import TokenData
+from scrumix.api.core.permissions import (
+    GlobalRole, Permission, global_role_of, encode_project_permissions,
+    decode_project_permissions, has_project_permission, load_project_roles,
+    token_versions
+)
 
 # JWT Bearer认证
 security = HTTPBearer()
 
+@lru_cache(maxsize=8)
+def _load_jwt_keys(algorithm: str, secret_key: str, private_pem: str, public_pem: str) -> Tuple[Key, Key, Optional[str]]:
+    """构造 (签名密钥, 验证密钥, kid)，只解析一次PEM"""
+    if algorithm.startswith("HS"):
+        key = jwk.construct(secret_key, algorithm)
+        return key, key, None
+    if not private_pem and not public_pem:
+        raise RuntimeError(f"JWT_PRIVATE_KEY/JWT_PUBLIC_KEY must be set for {algorithm}")
+    signing_key = jwk.construct(private_pem, algorithm) if private_pem else None
+    verification_key = jwk.construct(public_pem, algorithm) if public_pem else signing_key.public_key()
+    kid = base64.urlsafe_b64encode(
+        hashlib.sha256(verification_key.to_pem()).digest()[:12]
+    ).decode().rstrip("=")
+    return signing_key, verification_key, kid
+
+def get_jwt_keys() -> Tuple[Key, Key, Optional[str]]:
+    """当前配置下的访问令牌密钥"""
+    return _load_jwt_keys(
+        settings.JWT_ALGORITHM, settings.SECRET_KEY,
+        settings.JWT_PRIVATE_KEY, settings.JWT_PUBLIC_KEY
+    )
+
+def get_public_jwks() -> Dict[str, Any]:
+    """访问令牌验证公钥（JWKS）；对称算法没有可公开的密钥"""
+    if settings.JWT_ALGORITHM.startswith("HS"):
+        return {"keys": []}
+    _, verification_key, kid = get_jwt_keys()
+    public_jwk = verification_key.to_dict()
+    public_jwk.update({"kid": kid, "use": "sig", "alg": settings.JWT_ALGORITHM})
+    return {"keys": [public_jwk]}
+
+class VerifiedTokenCache:
+    """
+    已验证访问令牌的有界LRU缓存
+    键为令牌的SHA-256摘要，条目在令牌的 exp 时刻过期；同一令牌重复请求时跳过解码和验签。
+    """
+    
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[bytes, Tuple[TokenData, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+    
+    def get(self, key: bytes) -> Optional[TokenData]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            token_data, expires_at = entry
+            if time.time() >= expires_at:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return token_data
+    
+    def put(self, key: bytes, token_data: TokenData, expires_at: float) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (token_data, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+token_cache = VerifiedTokenCache(settings.TOKEN_CACHE_SIZE)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """创建JWT访问令牌"""
     to_encode = data.copy()
@@ -21,25 +114,74 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.now() + expires_delta
     else:
         expire = datetime.now() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm="HS256")
+    to_encode.update({"exp": expire, "iat": int(time.time())})
+    signing_key, _, kid = get_jwt_keys()
+    if signing_key is None:
+        raise RuntimeError("JWT_PRIVATE_KEY is required to issue access tokens")
+    headers = {"kid": kid} if kid else None
+    encoded_jwt = jwt.encode(to_encode, signing_key, algorithm=settings.JWT_ALGORITHM, headers=headers)
     return encoded_jwt
 
-def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None):
-    """创建刷新令牌"""
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.now() + expires_delta
-    else:
-        expire = datetime.now() + timedelta(days=7)  # 7天过期
-    to_encode.update({"exp": expire, "type": "refresh"})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm="HS256")
-    return encoded_jwt
+def create_user_access_token(db: Session, user, expires_delta: Optional[timedelta] = None,
+                             session_id: Optional[int] = None) -> str:
+    """为用户签发访问令牌，携带全局角色、项目权限位集与所属会话ID（用于重新签发时校验会话）"""
+    data = {
+        "sub": str(user.id),
+        "email": user.email,
+        "scopes": [global_role_of(user).value],
+        "prj": encode_project_permissions(load_project_roles(db, user.id)),
+        "ver": user.token_version or 0,
+    }
+    if session_id is not None:
+        data["sid"] = session_id
+    return create_access_token(data, expires_delta=expires_delta)
+
+def generate_refresh_token_secret() -> Tuple[str, str]:
+    """生成刷新令牌密钥，返回 (密钥, 密钥哈希)"""
+    secret = secrets.token_urlsafe(32)
+    return secret, hash_refresh_token_secret(secret)
+
+def derive_refresh_token_secret(session_id: int, previous_secret: str) -> str:
+    """
+    由上一个刷新令牌密钥派生下一个密钥（HMAC，需 SECRET_KEY）
+    宽限时间内并发刷新的请求用同一旧令牌得到同一新令牌，而不会使先完成轮换的客户端的令牌失效
+    """
+    digest = hmac.new(
+        settings.SECRET_KEY.encode(), f"refresh:{session_id}.{previous_secret}".encode(), hashlib.sha256
+    ).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+def hash_refresh_token_secret(secret: str) -> str:
+    """刷新令牌密钥的定长哈希（密钥本身是高熵随机数，SHA-256即可）"""
+    return hashlib.sha256(secret.encode()).hexdigest()
+
+def format_refresh_token(session_id: int, secret: str) -> str:
+    """组装刷新令牌：<会话ID>.<密钥>"""
+    return f"{session_id}.{secret}"
+
+def parse_refresh_token(token: str) -> Optional[Tuple[int, str]]:
+    """解析刷新令牌，返回 (会话ID, 密钥)"""
+    session_id, _, secret = token.partition(".")
+    if not session_id.isdigit() or not secret:
+        return None
+    return int(session_id), secret
+
+def verify_refresh_token_secret(secret: str, hashed_secret: Optional[str]) -> bool:
+    """常量时间比较刷新令牌密钥与存储的哈希"""
+    if not hashed_secret:
+        return False
+    return hmac.compare_digest(hash_refresh_token_secret(secret), hashed_secret)
 
 def verify_token(token: str) -> Optional[TokenData]:
-    """验证JWT token"""
+    """验证JWT token（已验证的令牌在过期前命中缓存）"""
+    cache_key = token_cache.key(token)
+    cached = token_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
+        _, verification_key, _ = get_jwt_keys()
+        payload = jwt.decode(token, verification_key, algorithms=[settings.JWT_ALGORITHM])
         user_id: int = payload.get("sub")
         email: str = payload.get("email")
         scopes: list = payload.get("scopes", [])
@@ -47,34 +189,60 @@ def verify_token(token: str) -> Optional[TokenData]:
         if user_id is None:
             return None
             
-        token_data = TokenData(user_id=user_id, email=email, scopes=scopes)
+        token_data = TokenData(
+            user_id=user_id,
+            email=email,
+            scopes=scopes,
+            project_permissions=decode_project_permissions(payload.get("prj")),
+            issued_at=payload.get("iat"),
+            expires_at=payload.get("exp"),
+            session_id=payload.get("sid"),
+            token_version=payload.get("ver", 0)
+        )
+        if "exp" in payload:
+            token_cache.put(cache_key, token_data, float(payload["exp"]))
         return token_data
     except JWTError:
         return None
 
-async def get_current_user(
+async def get_token_data(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
-):
-    """获取当前用户"""
-    from scrumix.api.crud.user import user_crud
-    
+) -> TokenData:
+    """校验访问令牌并返回其中的声明（只按缓存的令牌版本查询数据库）"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    try:
-        token_data = verify_token(credentials.credentials)
-        if token_data is None:
-            raise credentials_exception
-    except JWTError:
+    token_data = verify_token(credentials.credentials)
+    if token_data is None:
         raise credentials_exception
     
+    # 权限变更前签发的令牌需要刷新
+    if token_versions.is_stale(db, token_data.user_id, token_data.token_version):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token permissions are outdated, please refresh",
+            headers={"WWW-Authenticate": 'Bearer error="invalid_token"'},
+        )
+    return token_data
+
+async def get_current_user(
+    token_data: TokenData = Depends(get_token_data),
+    db: Session = Depends(get_db)
+):
+    """获取当前用户（令牌已按 get_token_data 校验，包括权限变更后的失效）"""
+    from scrumix.api.crud.user import user_crud
+    
     user = user_crud.get_by_id(db, user_id=token_data.user_id)
     if user is None:
-        raise credentials_exception
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     
     if not user.is_active:
         raise HTTPException(
@@ -90,13 +258,29 @@ async def get_current_active_user(current_user = Depends(get_current_user)):
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
-async def get_current_superuser(current_user = Depends(get_current_user)):
-    """获取当前超级用户"""
-    if not current_user.is_superuser:
+async def get_current_superuser(token_data: TokenData = Depends(get_token_data)) -> TokenData:
+    """获取当前超级用户（根据令牌中的全局角色判断，不查询数据库）"""
+    if GlobalRole.SUPERUSER.value not in token_data.scopes:
         raise HTTPException(
             status_code=400, detail="The user doesn't have enough privileges"
         )
-    return current_user
+    return token_data
+
+def require_project_permission(permission: Permission):
+    """
+    项目权限依赖：从路径参数 project_id 读取项目，按令牌中的位集 O(1) 判断
+    用法: Depends(require_project_permission(Permission.EDIT_BACKLOG))
+    """
+    async def dependency(project_id: int, token_data: TokenData = Depends(get_token_data)) -> TokenData:
+        if not has_project_permission(
+            token_data.scopes, token_data.project_permissions, project_id, permission
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not enough permissions for this project"
+            )
+        return token_data
+    return dependency
 
 def create_email_verification_token(email: str) -> str:
     """创建邮箱验证token"""
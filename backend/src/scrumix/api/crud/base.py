@@ -1,21 +1,66 @@
 # CRUD 基类
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+import re
+from typing import Any, Dict, Generic, List, Optional, Sequence, Tuple, Type, TypeVar, Union
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
+from sqlalchemy import func, inspect as sa_inspect, tuple_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from ..core.config import settings
 from ..db.base import Base
+from ..db.rank import rank_between, spread_ranks
+from .change import DELETE, INSERT, UPDATE, change_log_crud, snapshot
+from .rank import rank_rebalancer
 
 ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
+# SQLite 只在错误信息中给出违反约束的列，如 "UNIQUE constraint failed: users.email"
+_SQLITE_UNIQUE_RE = re.compile(r"UNIQUE constraint failed: (.+)$")
+
+def get_constraint_name(exc: IntegrityError) -> Optional[str]:
+    """
+    从IntegrityError中提取违反的约束名
+    * PostgreSQL: 返回约束/唯一索引名，如 `ix_users_email`
+    * SQLite: 返回列名列表，如 `users.email`
+    """
+    diag = getattr(exc.orig, "diag", None)
+    constraint_name = getattr(diag, "constraint_name", None)
+    if constraint_name:
+        return constraint_name
+    match = _SQLITE_UNIQUE_RE.search(str(exc.orig))
+    return match.group(1).strip() if match else None
+
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
-    def __init__(self, model: Type[ModelType]):
+    def __init__(self, model: Type[ModelType], track_changes: bool = False,
+                 rank_field: Optional[str] = None, rank_scope: Sequence[str] = ("project_id",)):
         """
         CRUD基类，包含默认的CRUD操作
         * `model`: SQLAlchemy模型类
+        * `track_changes`: 写入时记录项目变更日志（模型需有 project_id 字段），用于增量同步，见 crud/change.py
+        * `rank_field`: 排序键列（RankType，见 db/rank.py），提供 move / get_multi_ordered / rebalance
+        * `rank_scope`: 在其中排序的范围列，如 ("project_id",) 或看板的 ("project_id", "status")
         """
         self.model = model
+        self.track_changes = track_changes
+        self.rank_field = rank_field
+        self.rank_scope = tuple(rank_scope)
+
+    def _record_change(self, db: Session, db_obj: ModelType, op: str) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """在提交前记录变更，返回 (project_id, 变更)；未开启 track_changes 时不做任何事"""
+        if not self.track_changes:
+            return None
+        if op != DELETE:
+            # 取得新对象的ID与服务端生成的列值
+            db.flush()
+        project_id = db_obj.project_id
+        data = snapshot(db_obj) if op != DELETE else None
+        return project_id, change_log_crud.record(db, project_id, self.model.__tablename__, db_obj.id, op, data)
+
+    def _after_commit(self, db: Session, change: Optional[Tuple[int, Dict[str, Any]]]) -> None:
+        if change is not None:
+            change_log_crud.after_commit(db, *change)
 
     def get(self, db: Session, id: Any) -> Optional[ModelType]:
         return db.query(self.model).filter(self.model.id == id).first()
@@ -27,10 +72,19 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
 
     def create(self, db: Session, *, obj_in: CreateSchemaType) -> ModelType:
         obj_in_data = jsonable_encoder(obj_in)
+        if self.rank_field:
+            scope = {column: obj_in_data.get(column) for column in self.rank_scope}
+            if not obj_in_data.get(self.rank_field):
+                # 未指定排序键时排在范围末尾
+                obj_in_data[self.rank_field] = rank_between(self._last_rank(db, scope), None)
         db_obj = self.model(**obj_in_data)
         db.add(db_obj)
+        change = self._record_change(db, db_obj, INSERT)
         db.commit()
         db.refresh(db_obj)
+        self._after_commit(db, change)
+        if self.rank_field:
+            self._check_duplicate_rank(db, db_obj, scope)
         return db_obj
 
     def update(
@@ -40,21 +94,133 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         db_obj: ModelType,
         obj_in: Union[UpdateSchemaType, Dict[str, Any]]
     ) -> ModelType:
-        obj_data = jsonable_encoder(db_obj)
+        # 按映射的列取字段名：提交后过期的对象 __dict__ 为空，jsonable_encoder 会得到空字典
+        obj_data = [attr.key for attr in sa_inspect(db_obj).mapper.column_attrs]
         if isinstance(obj_in, dict):
             update_data = obj_in
         else:
             update_data = obj_in.dict(exclude_unset=True)
+        old_project_id = db_obj.project_id if self.track_changes else None
         for field in obj_data:
             if field in update_data:
                 setattr(db_obj, field, update_data[field])
         db.add(db_obj)
+        changes = [self._record_change(db, db_obj, UPDATE)]
+        if self.track_changes and db_obj.project_id != old_project_id:
+            # 移到其他项目：原项目的客户端需要删除该实体
+            changes.append((old_project_id, change_log_crud.record(
+                db, old_project_id, self.model.__tablename__, db_obj.id, DELETE
+            )))
         db.commit()
         db.refresh(db_obj)
+        for change in changes:
+            self._after_commit(db, change)
         return db_obj
 
     def remove(self, db: Session, *, id: int) -> ModelType:
         obj = db.query(self.model).get(id)
+        change = self._record_change(db, obj, DELETE)
         db.delete(obj)
         db.commit()
-        return obj 
\ No newline at end of file
+        self._after_commit(db, change)
+        return obj
+
+    def _scope_query(self, db: Session, scope: Dict[str, Any]):
+        query = db.query(self.model)
+        for column, value in scope.items():
+            query = query.filter(getattr(self.model, column) == value)
+        return query
+
+    def _last_rank(self, db: Session, scope: Dict[str, Any]) -> Optional[str]:
+        rank = getattr(self.model, self.rank_field)
+        return self._scope_query(db, scope).with_entities(func.max(rank)).scalar()
+
+    def _check_duplicate_rank(self, db: Session, db_obj: ModelType, scope: Dict[str, Any]) -> None:
+        """并发追加到末尾会得到相同的排序键（顺序不确定），登记重排"""
+        rank = getattr(self.model, self.rank_field)
+        duplicate = self._scope_query(db, scope).filter(
+            rank == getattr(db_obj, self.rank_field), self.model.id != db_obj.id
+        ).with_entities(self.model.id).first()
+        if duplicate is not None:
+            rank_rebalancer.request(self, scope)
+
+    def get_multi_ordered(
+        self,
+        db: Session,
+        *,
+        scope: Dict[str, Any],
+        after_rank: Optional[str] = None,
+        after_id: Optional[Any] = None,
+        limit: int = 100
+    ) -> List[ModelType]:
+        """
+        按 (排序键, ID) 读取范围内的对象（模型应有 (范围列..., 排序键) 索引，按索引顺序读取无需排序）
+        (after_rank, after_id) 为上一页最后一个对象的游标（键集翻页，不使用 OFFSET）；
+        排序键重复时按 ID 区分，翻页不会跳过或重复对象
+        """
+        if (after_rank is None) != (after_id is None):
+            raise ValueError("翻页游标需要同时给出 after_rank 和 after_id")
+        rank = getattr(self.model, self.rank_field)
+        query = self._scope_query(db, scope)
+        if after_rank is not None:
+            query = query.filter(tuple_(rank, self.model.id) > tuple_(after_rank, after_id))
+        return query.order_by(rank, self.model.id).limit(limit).all()
+
+    def _neighbor_rank(self, db: Session, id: Any, scope: Dict[str, Any]) -> str:
+        neighbor = self.get(db, id)
+        if neighbor is None or any(getattr(neighbor, column) != value for column, value in scope.items()):
+            raise ValueError(f"相邻对象 {id} 不存在或不在同一排序范围内")
+        return getattr(neighbor, self.rank_field)
+
+    def move(
+        self,
+        db: Session,
+        *,
+        db_obj: ModelType,
+        after_id: Optional[Any] = None,
+        before_id: Optional[Any] = None,
+        obj_in: Optional[Dict[str, Any]] = None
+    ) -> ModelType:
+        """
+        把对象移到 after_id 之后、before_id 之前（都为空时移到末尾），只更新这一行
+        只给出一侧时另一侧取该侧的相邻对象；obj_in 可同时修改范围列（如移到另一个看板列）
+        相邻关系已被其他人改变时抛出 ValueError，客户端应刷新后重试
+        """
+        if db_obj.id in (after_id, before_id):
+            raise ValueError("不能以自身作为相邻对象")
+        update_data = dict(obj_in or {})
+        scope = {column: update_data.get(column, getattr(db_obj, column)) for column in self.rank_scope}
+        rank = getattr(self.model, self.rank_field)
+        others = self._scope_query(db, scope).filter(self.model.id != db_obj.id)
+        lower = self._neighbor_rank(db, after_id, scope) if after_id is not None else None
+        upper = self._neighbor_rank(db, before_id, scope) if before_id is not None else None
+        if after_id is None and before_id is None:
+            lower = others.with_entities(func.max(rank)).scalar()
+        elif after_id is None:
+            lower = others.filter(rank < upper).with_entities(func.max(rank)).scalar()
+        elif before_id is None:
+            upper = others.filter(rank > lower).with_entities(func.min(rank)).scalar()
+        if lower is not None and upper is not None and lower >= upper:
+            # 并发移动到同一位置会产生重复的键，重排后即可恢复
+            rank_rebalancer.request(self, scope)
+            raise ValueError("排序位置已变化，请刷新后重试")
+        new_rank = rank_between(lower, upper)
+        update_data[self.rank_field] = new_rank
+        db_obj = self.update(db, db_obj=db_obj, obj_in=update_data)
+        if len(new_rank) >= settings.RANK_REBALANCE_LENGTH:
+            rank_rebalancer.request(self, scope)
+        return db_obj
+
+    def rebalance(self, db: Session, *, scope: Dict[str, Any]) -> int:
+        """为范围内的对象按现有顺序重新分配等距的短排序键，返回改写的行数"""
+        rank = getattr(self.model, self.rank_field)
+        objs = self._scope_query(db, scope).order_by(rank, self.model.id).with_for_update().all()
+        changes = []
+        for db_obj, new_rank in zip(objs, spread_ranks(len(objs))):
+            if getattr(db_obj, self.rank_field) != new_rank:
+                setattr(db_obj, self.rank_field, new_rank)
+                changes.append(self._record_change(db, db_obj, UPDATE))
+        db.commit()
+        for change in changes:
+            self._after_commit(db, change)
+        return len(changes)
@@ -0,0 +1,135 @@
+"""
+项目变更日志
+
+开启 track_changes 的 CRUD（见 crud/base.py）写入项目内实体时，在同一事务中：
+- 项目版本加一：INSERT ... ON CONFLICT (project_id) DO UPDATE SET version = version + 1 RETURNING version，
+  持有行锁直到提交，同一项目的写入按版本顺序提交，客户端读到版本 N 后不会再出现更小的版本；
+  项目的第一次写入并发执行时也不会因主键冲突失败
+- 写入一条变更记录（版本、实体表名、ID、insert/update/delete、写入后的列值）
+提交后把变更推送给看板订阅者（core/realtime.py）。
+
+changes_since() 返回某版本之后的变更，重连的客户端只需同步增量。压缩：
+- 同一实体只保留最新一条记录（客户端按 upsert / delete 应用，结果与逐条应用相同）
+- 超过 CHANGE_LOG_RETENTION_DAYS 的记录被清除并提高 min_version；since 低于它的客户端收到 reset，
+  需要全量重新加载后从返回的版本继续
+"""
+import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import func, inspect as sa_inspect, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from scrumix.api.core.config import settings
+from scrumix.api.core.realtime import board_hub
+from scrumix.api.db.upsert import upsert
+from scrumix.api.models.change import ChangeLog, ProjectVersion
+from scrumix.agents.utils.logger import setup_logger
+
+logger = setup_logger("scrumix.api.changes")
+
+INSERT = "insert"
+UPDATE = "update"
+DELETE = "delete"
+
+# 看板推送的事件类型
+CHANGE_EVENT = "change"
+
+
+def snapshot(obj: Any) -> Dict[str, Any]:
+    """实体的列值（可JSON序列化）"""
+    mapper = sa_inspect(obj).mapper
+    return jsonable_encoder({attr.key: getattr(obj, attr.key) for attr in mapper.column_attrs})
+
+
+class ChangeLogCRUD:
+    def next_version(self, db: Session, project_id: int) -> int:
+        """项目版本加一并返回新版本（行锁持有到事务提交）"""
+        stmt = upsert(
+            db, ProjectVersion, {"project_id": project_id, "version": 1, "min_version": 0}, ["project_id"],
+            lambda excluded: {"version": ProjectVersion.version + 1, "updated_at": func.now()},
+        ).returning(ProjectVersion.version)
+        return db.execute(stmt).scalar_one()
+
+    def record(self, db: Session, project_id: int, entity: str, entity_id: int, op: str,
+               data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """在当前事务中记录一次变更（由调用方提交），返回变更内容"""
+        version = self.next_version(db, project_id)
+        data = None if op == DELETE else data
+        db.add(ChangeLog(
+            project_id=project_id, version=version, entity=entity, entity_id=entity_id, op=op, data=data
+        ))
+        return {"version": version, "entity": entity, "id": entity_id, "op": op, "data": data}
+
+    def after_commit(self, db: Session, project_id: int, change: Dict[str, Any]) -> None:
+        """提交后推送给看板订阅者；每 CHANGE_LOG_COMPACT_EVERY 个版本压缩一次"""
+        board_hub.publish(project_id, CHANGE_EVENT, change, key=f"{change['entity']}:{change['id']}")
+        every = settings.CHANGE_LOG_COMPACT_EVERY
+        if every and change["version"] % every == 0:
+            try:
+                self.compact(db, project_id)
+            except SQLAlchemyError as e:
+                db.rollback()
+                logger.warning(f"压缩项目 {project_id} 的变更日志失败: {e}")
+
+    def current(self, db: Session, project_id: int) -> Tuple[int, int]:
+        """项目的 (当前版本, min_version)"""
+        row = db.query(ProjectVersion.version, ProjectVersion.min_version).filter(
+            ProjectVersion.project_id == project_id
+        ).first()
+        return (row.version, row.min_version) if row is not None else (0, 0)
+
+    def changes_since(self, db: Session, project_id: int, since: int, limit: int = 500) -> Dict[str, Any]:
+        """
+        since 之后的变更（按版本升序，最多 limit 条）
+        version 为下次请求应使用的 since；has_more 时继续翻页
+        """
+        version, min_version = self.current(db, project_id)
+        result: Dict[str, Any] = {
+            "project_id": project_id, "since": since, "version": version,
+            "reset": False, "has_more": False, "changes": [],
+        }
+        if since < min_version:
+            result["reset"] = True
+            return result
+        rows = db.query(ChangeLog).filter(
+            ChangeLog.project_id == project_id, ChangeLog.version > since
+        ).order_by(ChangeLog.version).limit(limit + 1).all()
+        result["has_more"] = len(rows) > limit
+        rows = rows[:limit]
+        result["changes"] = [
+            {"version": row.version, "entity": row.entity, "id": row.entity_id, "op": row.op, "data": row.data}
+            for row in rows
+        ]
+        if rows and (result["has_more"] or rows[-1].version > version):
+            result["version"] = rows[-1].version
+        return result
+
+    def compact(self, db: Session, project_id: int, retention_days: Optional[int] = None) -> int:
+        """压缩项目的变更日志，返回删除的记录数"""
+        latest = select(func.max(ChangeLog.id)).where(
+            ChangeLog.project_id == project_id
+        ).group_by(ChangeLog.entity, ChangeLog.entity_id)
+        removed = db.query(ChangeLog).filter(
+            ChangeLog.project_id == project_id, ChangeLog.id.notin_(latest)
+        ).delete(synchronize_session=False)
+
+        retention_days = settings.CHANGE_LOG_RETENTION_DAYS if retention_days is None else retention_days
+        if retention_days:
+            cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=retention_days)
+            expired = db.query(func.max(ChangeLog.version)).filter(
+                ChangeLog.project_id == project_id, ChangeLog.changed_at < cutoff
+            ).scalar()
+            if expired:
+                removed += db.query(ChangeLog).filter(
+                    ChangeLog.project_id == project_id, ChangeLog.version <= expired
+                ).delete(synchronize_session=False)
+                db.query(ProjectVersion).filter(
+                    ProjectVersion.project_id == project_id, ProjectVersion.min_version < expired
+                ).update({ProjectVersion.min_version: expired}, synchronize_session=False)
+        db.commit()
+        return removed
+
+
+change_log_crud = ChangeLogCRUD()
@@ -0,0 +1,88 @@
+"""
+排序键后台重排
+
+move() 生成的排序键超过 RANK_REBALANCE_LENGTH 时（或 move/create 发现重复的键时）登记该排序范围，
+后台任务定期在线程池中为登记的范围重新分配等距的短键（每个范围一个事务，见 CRUDBase.rebalance）。
+重排改写范围内的全部行，因此只在键变长时偶尔执行，而不是在每次拖拽时执行。
+"""
+import asyncio
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from scrumix.api.core.config import settings
+from scrumix.agents.utils.logger import setup_logger
+
+logger = setup_logger("scrumix.api.rank")
+
+
+class RankRebalancer:
+    def __init__(self):
+        # (CRUD, 范围) -> (CRUD, 范围列的值)
+        self._pending: Dict[Tuple[int, Tuple], Tuple[Any, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def request(self, crud: Any, scope: Dict[str, Any]) -> None:
+        """登记需要重排的范围（重复登记只执行一次）"""
+        key = (id(crud), tuple(sorted(scope.items())))
+        with self._lock:
+            self._pending[key] = (crud, dict(scope))
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def run_pending(self, db: Session) -> int:
+        """重排全部已登记的范围，返回改写的行数；失败的范围留待下次"""
+        with self._lock:
+            items = list(self._pending.values())
+            self._pending.clear()
+        rewritten = 0
+        for crud, scope in items:
+            try:
+                rewritten += crud.rebalance(db, scope=scope)
+            except SQLAlchemyError as e:
+                db.rollback()
+                logger.warning(f"重排 {crud.model.__tablename__} {scope} 失败: {e}")
+                self.request(crud, scope)
+        return rewritten
+
+    async def run_periodic(self, session_factory: Callable[[], Session], interval: Optional[float] = None) -> None:
+        """定期在线程池中执行 run_pending，直到任务被取消"""
+        interval = interval or settings.RANK_REBALANCE_INTERVAL_SECONDS
+        loop = asyncio.get_running_loop()
+
+        def run() -> int:
+            db = session_factory()
+            try:
+                return self.run_pending(db)
+            finally:
+                db.close()
+
+        while True:
+            await asyncio.sleep(interval)
+            if not self._pending:
+                continue
+            try:
+                await loop.run_in_executor(None, run)
+            except Exception as e:
+                logger.warning(f"排序键重排失败: {e}")
+
+    def start(self, session_factory: Callable[[], Session], interval: Optional[float] = None) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run_periodic(session_factory, interval))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+rank_rebalancer = RankRebalancer()
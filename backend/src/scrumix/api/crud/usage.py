@@ -0,0 +1,131 @@
+"""
+LLM 用量与项目配额
+
+flush() 把用量累加器（agents/llm/usage.py）中尚未写库的累计值批量写入 llm_usage：
+每个键一条 INSERT ... ON CONFLICT DO UPDATE 累加（多进程同时写入同一键也不会产生重复行）；
+写库失败时放回累加器，下次一并写入。无项目/无用户在表中记为 0，查询结果中还原为 None。
+写入后读取当天各项目的总量与配额，刷新累加器的本地视图（多进程部署时各进程由此看到彼此的用量）。
+"""
+import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from scrumix.api.db.upsert import upsert
+from scrumix.api.models.usage import LLMUsage, ProjectTokenQuota
+from scrumix.agents.llm.usage import UsageAccumulator, UsageRow, default_usage
+
+# summary 可用的分组维度
+GROUP_COLUMNS = {
+    "day": LLMUsage.day,
+    "agent": LLMUsage.agent_name,
+    "project": LLMUsage.project_id,
+    "user": LLMUsage.user_id,
+    "model": LLMUsage.model,
+}
+
+# 表中以 0 表示“无”的键列
+NONE_AS_ZERO = ("project", "user")
+
+
+class LLMUsageCRUD:
+    def _write_row(self, db: Session, row: UsageRow) -> None:
+        key = row.key
+        db.execute(upsert(
+            db, LLMUsage,
+            {
+                "day": key.day, "agent_name": key.agent, "project_id": key.project_id or 0,
+                "user_id": key.user_id or 0, "model": key.model, "requests": row.requests,
+                "prompt_tokens": row.prompt_tokens, "completion_tokens": row.completion_tokens,
+            },
+            ["day", "agent_name", "project_id", "user_id", "model"],
+            lambda excluded: {
+                "requests": LLMUsage.requests + excluded.requests,
+                "prompt_tokens": LLMUsage.prompt_tokens + excluded.prompt_tokens,
+                "completion_tokens": LLMUsage.completion_tokens + excluded.completion_tokens,
+                "updated_at": func.now(),
+            },
+        ))
+
+    def flush(self, db: Session, accumulator: Optional[UsageAccumulator] = None) -> int:
+        """写入累计用量并刷新配额视图，返回写入的行数"""
+        accumulator = accumulator or default_usage
+        rows = accumulator.drain()
+        if rows:
+            try:
+                for row in rows:
+                    self._write_row(db, row)
+                db.commit()
+            except SQLAlchemyError:
+                db.rollback()
+                accumulator.restore(rows)
+                raise
+        today = datetime.datetime.now(datetime.timezone.utc).date()
+        accumulator.sync(today, self.project_totals(db, today), self.get_quotas(db))
+        return len(rows)
+
+    def project_totals(self, db: Session, day: datetime.date) -> Dict[int, int]:
+        """某天各项目的token总量"""
+        rows = db.query(
+            LLMUsage.project_id, func.sum(LLMUsage.prompt_tokens + LLMUsage.completion_tokens)
+        ).filter(LLMUsage.day == day, LLMUsage.project_id != 0).group_by(LLMUsage.project_id).all()
+        return {project_id: int(total or 0) for project_id, total in rows}
+
+    def summary(self, db: Session, since: Optional[datetime.date] = None, until: Optional[datetime.date] = None,
+                group_by: Optional[List[str]] = None, project_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """按维度汇总用量（包含 since 与 until 当天），按总token数降序"""
+        group_by = group_by or ["agent"]
+        unknown = [name for name in group_by if name not in GROUP_COLUMNS]
+        if unknown:
+            raise ValueError(f"不支持的分组维度: {', '.join(unknown)}")
+        columns = [GROUP_COLUMNS[name].label(name) for name in group_by]
+        total = func.sum(LLMUsage.prompt_tokens + LLMUsage.completion_tokens)
+        query = db.query(
+            *columns,
+            func.sum(LLMUsage.requests).label("requests"),
+            func.sum(LLMUsage.prompt_tokens).label("prompt_tokens"),
+            func.sum(LLMUsage.completion_tokens).label("completion_tokens"),
+            total.label("total_tokens"),
+        )
+        if since is not None:
+            query = query.filter(LLMUsage.day >= since)
+        if until is not None:
+            query = query.filter(LLMUsage.day <= until)
+        if project_id is not None:
+            query = query.filter(LLMUsage.project_id == project_id)
+        rows = query.group_by(*[GROUP_COLUMNS[name] for name in group_by]).order_by(total.desc()).all()
+        result = []
+        for row in rows:
+            item = dict(row._mapping)
+            for name in ("requests", "prompt_tokens", "completion_tokens", "total_tokens"):
+                item[name] = int(item[name] or 0)
+            for name in NONE_AS_ZERO:
+                if name in item:
+                    item[name] = item[name] or None
+            result.append(item)
+        return result
+
+    def get_quotas(self, db: Session) -> Dict[int, int]:
+        return {q.project_id: q.daily_tokens for q in db.query(ProjectTokenQuota).all()}
+
+    def set_quota(self, db: Session, project_id: int, daily_tokens: Optional[int]) -> Optional[ProjectTokenQuota]:
+        """设置项目的每日配额；None 表示删除，恢复使用默认配额"""
+        quota = db.query(ProjectTokenQuota).filter(ProjectTokenQuota.project_id == project_id).first()
+        if daily_tokens is None:
+            if quota is not None:
+                db.delete(quota)
+                db.commit()
+            return None
+        if quota is None:
+            quota = ProjectTokenQuota(project_id=project_id, daily_tokens=daily_tokens)
+            db.add(quota)
+        else:
+            quota.daily_tokens = daily_tokens
+        db.commit()
+        db.refresh(quota)
+        return quota
+
+
+usage_crud = LLMUsageCRUD()
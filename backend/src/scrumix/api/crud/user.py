@@ -1,30 +1,67 @@
 """
 用户相关的CRUD操作
 """
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import and_, or_, insert, select, update
+from sqlalchemy.engine import Row
 import secrets
 import json
 
+from scrumix.api.core.config import settings
+from scrumix.api.core.security import (
+    derive_refresh_token_secret, generate_refresh_token_secret, format_refresh_token,
+    hash_refresh_token_secret, parse_refresh_token, verify_refresh_token_secret
+)
+from scrumix.api.crud.base import get_constraint_name
 from scrumix.api.models.user import User, UserOAuth, UserSession, AuthProvider
-from scrumix.api.schemas.user import UserCreate, UserUpdate
+from scrumix.api.schemas.user import UserCreate, UserUpdate, UserSessionResponse
 from scrumix.api.utils.password import get_password_hash, verify_password
 
+# 唯一约束 -> 错误信息（PostgreSQL 返回索引名，SQLite 返回列名）
+USER_CREATE_CONSTRAINT_MESSAGES = {
+    "ix_users_email": "邮箱已被注册",
+    "users.email": "邮箱已被注册",
+    "ix_users_username": "用户名已被使用",
+    "users.username": "用户名已被使用",
+}
+
+USER_UPDATE_CONSTRAINT_MESSAGES = {
+    "ix_users_email": "邮箱已被使用",
+    "users.email": "邮箱已被使用",
+    "ix_users_username": "用户名已被使用",
+    "users.username": "用户名已被使用",
+}
+
+# 会话列表投影：只选取响应模型中的列
+SESSION_RESPONSE_COLUMNS = tuple(
+    getattr(UserSession, field) for field in UserSessionResponse.model_fields
+)
+
+OAUTH_ACCOUNT_CONSTRAINTS = {
+    "uq_user_oauth_provider_user_id",
+    "user_oauth.provider, user_oauth.provider_user_id",
+}
+
+def _translate_integrity_error(exc: IntegrityError, messages: dict) -> ValueError:
+    """将唯一约束冲突转换为业务错误，其他完整性错误原样抛出"""
+    message = messages.get(get_constraint_name(exc))
+    if message is None:
+        raise exc
+    return ValueError(message)
+
+def _now_like(reference: Optional[datetime]) -> datetime:
+    """当前时间，时区感知与参考时间保持一致（PostgreSQL返回带时区的时间）"""
+    if reference is not None and reference.tzinfo is not None:
+        return datetime.now(reference.tzinfo)
+    return datetime.now()
+
 class UserCRUD:
     def create_user(self, db: Session, user_create: UserCreate) -> User:
-        """创建新用户"""
-        # 检查邮箱是否已存在
-        if self.get_by_email(db, user_create.email):
-            raise ValueError("邮箱已被注册")
-        
-        # 检查用户名是否已存在
-        if user_create.username and self.get_by_username(db, user_create.username):
-            raise ValueError("用户名已被使用")
-        
-        # 创建用户对象
-        db_user = User(
+        """创建新用户（依赖唯一约束判重，单条 INSERT ... RETURNING）"""
+        stmt = insert(User).values(
             email=user_create.email,
             username=user_create.username,
             full_name=user_create.full_name,
@@ -33,11 +70,14 @@ class UserCRUD:
             language=user_create.language,
             hashed_password=get_password_hash(user_create.password) if user_create.password else None,
             is_verified=False  # 需要邮箱验证
-        )
+        ).returning(User)
         
-        db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        try:
+            db_user = db.scalars(stmt).one()
+            db.commit()
+        except IntegrityError as e:
+            db.rollback()
+            raise _translate_integrity_error(e, USER_CREATE_CONSTRAINT_MESSAGES) from e
         return db_user
     
     def get_by_id(self, db: Session, user_id: int) -> Optional[User]:
@@ -64,30 +104,24 @@ class UserCRUD:
         return user
     
     def update_user(self, db: Session, user_id: int, user_update: UserUpdate) -> Optional[User]:
-        """更新用户信息"""
-        user = self.get_by_id(db, user_id)
-        if not user:
-            return None
-        
+        """更新用户信息（依赖唯一约束判重，单条 UPDATE ... RETURNING）"""
         update_data = user_update.model_dump(exclude_unset=True)
+        if not update_data:
+            return self.get_by_id(db, user_id)
         
-        # 检查用户名是否已被使用
-        if "username" in update_data and update_data["username"]:
-            existing_user = self.get_by_username(db, update_data["username"])
-            if existing_user and existing_user.id != user_id:
-                raise ValueError("用户名已被使用")
-        
-        # 检查邮箱是否已被使用
-        if "email" in update_data:
-            existing_user = self.get_by_email(db, update_data["email"])
-            if existing_user and existing_user.id != user_id:
-                raise ValueError("邮箱已被使用")
-        
-        for field, value in update_data.items():
-            setattr(user, field, value)
+        stmt = (
+            update(User)
+            .where(User.id == user_id)
+            .values(**update_data)
+            .returning(User)
+        )
         
-        db.commit()
-        db.refresh(user)
+        try:
+            user = db.scalars(stmt).first()
+            db.commit()
+        except IntegrityError as e:
+            db.rollback()
+            raise _translate_integrity_error(e, USER_UPDATE_CONSTRAINT_MESSAGES) from e
         return user
     
     def update_last_login(self, db: Session, user_id: int) -> None:
@@ -149,19 +183,30 @@ class UserOAuthCRUD:
                            provider_user_id: str, access_token: str, 
                            refresh_token: Optional[str] = None, 
                            raw_data: Optional[dict] = None) -> UserOAuth:
-        """创建OAuth账户关联"""
-        oauth_account = UserOAuth(
+        """
+        创建OAuth账户关联
+        同一提供商用户的并发回调由唯一约束兜底：插入冲突时复用已存在的账户并更新token
+        """
+        stmt = insert(UserOAuth).values(
             user_id=user_id,
             provider=provider,
             provider_user_id=provider_user_id,
             access_token=access_token,
             refresh_token=refresh_token,
             raw_data=json.dumps(raw_data) if raw_data else None
-        )
+        ).returning(UserOAuth)
         
-        db.add(oauth_account)
-        db.commit()
-        db.refresh(oauth_account)
+        try:
+            oauth_account = db.scalars(stmt).one()
+            db.commit()
+            return oauth_account
+        except IntegrityError as e:
+            db.rollback()
+            if get_constraint_name(e) not in OAUTH_ACCOUNT_CONSTRAINTS:
+                raise
+        
+        oauth_account = self.get_by_provider_user_id(db, provider, provider_user_id)
+        self.update_oauth_tokens(db, oauth_account.id, access_token, refresh_token)
         return oauth_account
     
     def get_by_provider_user_id(self, db: Session, provider: AuthProvider, provider_user_id: str) -> Optional[UserOAuth]:
@@ -192,15 +237,16 @@ class UserOAuthCRUD:
 class UserSessionCRUD:
     def create_session(self, db: Session, user_id: int, expires_at: datetime,
                       user_agent: Optional[str] = None, ip_address: Optional[str] = None,
-                      device_info: Optional[str] = None) -> UserSession:
-        """创建用户会话"""
+                      device_info: Optional[str] = None,
+                      issue_refresh_token: bool = True) -> Tuple[UserSession, Optional[str]]:
+        """创建用户会话，返回 (会话, 刷新令牌)；数据库只保存刷新令牌密钥的哈希"""
         session_token = secrets.token_urlsafe(32)
-        refresh_token = secrets.token_urlsafe(32)
+        secret, secret_hash = generate_refresh_token_secret() if issue_refresh_token else (None, None)
         
         session = UserSession(
             user_id=user_id,
             session_token=session_token,
-            refresh_token=refresh_token,
+            refresh_token_hash=secret_hash,
             user_agent=user_agent,
             ip_address=ip_address,
             device_info=device_info,
@@ -210,7 +256,9 @@ class UserSessionCRUD:
         db.add(session)
         db.commit()
         db.refresh(session)
-        return session
+        
+        refresh_token = format_refresh_token(session.id, secret) if secret else None
+        return session, refresh_token
     
     def get_by_session_token(self, db: Session, session_token: str) -> Optional[UserSession]:
         """根据会话token获取会话"""
@@ -222,35 +270,83 @@ class UserSessionCRUD:
             )
         ).first()
     
-    def get_by_refresh_token(self, db: Session, refresh_token: str) -> Optional[UserSession]:
-        """根据刷新token获取会话"""
+    def get_active_session(self, db: Session, session_id: int, user_id: int) -> Optional[UserSession]:
+        """获取属于该用户、未停用且未过期的会话"""
         return db.query(UserSession).filter(
             and_(
-                UserSession.refresh_token == refresh_token,
+                UserSession.id == session_id,
+                UserSession.user_id == user_id,
                 UserSession.is_active == True,
                 UserSession.expires_at > datetime.now()
             )
         ).first()
     
-    def update_activity(self, db: Session, session_id: int) -> bool:
-        """更新会话活动时间"""
-        session = db.query(UserSession).filter(UserSession.id == session_id).first()
+    def rotate_refresh_token(self, db: Session, refresh_token: str) -> Optional[Tuple[UserSession, str]]:
+        """
+        校验并轮换刷新令牌，返回 (会话, 新刷新令牌)
+        * 按令牌中的会话ID主键查询并加行锁，常量时间比较密钥哈希
+        * 新密钥由旧密钥派生：旧令牌在宽限时间内重用（并发刷新）时返回与第一次轮换相同的新令牌，
+          不再轮换，先完成的客户端拿到的令牌仍然有效
+        * 旧令牌在宽限时间外重用视为令牌泄露，停用整个会话
+        """
+        parsed = parse_refresh_token(refresh_token)
+        if not parsed:
+            return None
+        session_id, secret = parsed
+        
+        session = db.query(UserSession).filter(
+            and_(
+                UserSession.id == session_id,
+                UserSession.is_active == True,
+                UserSession.expires_at > datetime.now()
+            )
+        ).with_for_update().first()
         if not session:
-            return False
+            return None
+        
+        now = _now_like(session.refresh_token_rotated_at)
+        new_secret = derive_refresh_token_secret(session.id, secret)
+        if verify_refresh_token_secret(secret, session.refresh_token_hash):
+            session.previous_refresh_token_hash = session.refresh_token_hash
+            session.refresh_token_hash = hash_refresh_token_secret(new_secret)
+            session.refresh_token_rotated_at = now
+        elif verify_refresh_token_secret(secret, session.previous_refresh_token_hash):
+            reuse_window = timedelta(seconds=settings.REFRESH_TOKEN_REUSE_WINDOW_SECONDS)
+            if now - session.refresh_token_rotated_at > reuse_window:
+                session.is_active = False
+                db.commit()
+                return None
+            # 并发刷新：第一次轮换已从同一旧密钥派生出当前密钥，直接返回它
+            if not verify_refresh_token_secret(new_secret, session.refresh_token_hash):
+                db.rollback()
+                return None
+        else:
+            db.rollback()
+            return None
         
-        session.last_activity_at = datetime.now()
+        session.last_activity_at = now
         db.commit()
-        return True
+        return session, format_refresh_token(session.id, new_secret)
     
-    def deactivate_session(self, db: Session, session_id: int) -> bool:
-        """停用会话"""
-        session = db.query(UserSession).filter(UserSession.id == session_id).first()
-        if not session:
-            return False
-        
-        session.is_active = False
+    def update_activity(self, db: Session, session_id: int, user_id: Optional[int] = None) -> bool:
+        """更新会话活动时间（单条UPDATE，传入user_id时只更新该用户的会话）"""
+        return self._update_session(db, session_id, user_id, last_activity_at=datetime.now())
+    
+    def deactivate_session(self, db: Session, session_id: int, user_id: int) -> bool:
+        """停用会话（单条UPDATE，只能停用属于该用户的会话）"""
+        return self._update_session(db, session_id, user_id, is_active=False)
+    
+    def _update_session(self, db: Session, session_id: int, user_id: Optional[int], **values) -> bool:
+        """UPDATE user_sessions SET ... WHERE id=:id [AND user_id=:uid]，不预先加载行"""
+        conditions = [UserSession.id == session_id]
+        if user_id is not None:
+            conditions.append(UserSession.user_id == user_id)
+        result = db.execute(
+            update(UserSession).where(*conditions).values(**values),
+            execution_options={"synchronize_session": False}
+        )
         db.commit()
-        return True
+        return result.rowcount > 0
     
     def deactivate_user_sessions(self, db: Session, user_id: int) -> int:
         """停用用户的所有会话"""
@@ -271,15 +367,20 @@ class UserSessionCRUD:
         db.commit()
         return count
     
-    def get_user_sessions(self, db: Session, user_id: int) -> List[UserSession]:
-        """获取用户的所有活跃会话"""
-        return db.query(UserSession).filter(
-            and_(
-                UserSession.user_id == user_id,
-                UserSession.is_active == True,
-                UserSession.expires_at > datetime.now()
-            )
-        ).order_by(UserSession.last_activity_at.desc()).all()
+    def get_user_sessions(self, db: Session, user_id: int) -> List[Row]:
+        """
+        获取用户的所有活跃会话
+        只查询 UserSessionResponse 需要的列，返回轻量行元组而非ORM对象
+        """
+        return db.execute(
+            select(*SESSION_RESPONSE_COLUMNS).where(
+                and_(
+                    UserSession.user_id == user_id,
+                    UserSession.is_active == True,
+                    UserSession.expires_at > datetime.now()
+                )
+            ).order_by(UserSession.last_activity_at.desc())
+        ).all()
 
 # 实例化CRUD对象
 user_crud = UserCRUD()
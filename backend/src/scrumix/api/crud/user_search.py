@@ -0,0 +1,121 @@
+"""
+用户搜索（管理员）
+
+按 email / username / full_name 的部分匹配搜索用户，结果按相关度排序，
+使用键集分页（游标 = 上一页最后一条的 (相关度, id)），翻页成本与页码无关。
+
+- PostgreSQL: LIKE '%q%' 由 pg_trgm GIN 索引支持，相关度为 trigram 相似度，前缀匹配额外加权
+- SQLite: 使用 FTS5 trigram 外部内容表 users_fts，相关度为 bm25
+- 少于3个字符的查询无法使用 trigram，退化为前缀匹配并按 id 排序
+"""
+import base64
+import json
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Float, and_, case, cast, column, func, literal, literal_column, or_, select, table
+from sqlalchemy.orm import Session
+
+from scrumix.api.models.user import User
+
+# trigram 至少需要3个字符
+MIN_TRIGRAM_QUERY_LENGTH = 3
+# 前缀匹配在相似度之上的加权
+PREFIX_BOOST = 1.0
+
+SEARCH_COLUMNS = (User.email, User.username, User.full_name)
+
+# SQLite FTS5 外部内容表，见 models/user.py 中的 USERS_FTS_DDL
+users_fts = table("users_fts", column("rowid"))
+
+
+def encode_cursor(rank: float, user_id: int) -> str:
+    """编码分页游标"""
+    payload = json.dumps({"r": rank, "id": user_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    """解码分页游标"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(payload["r"]), int(payload["id"])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("无效的分页游标")
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class UserSearchCRUD:
+    def search_users(self, db: Session, q: str, limit: int = 20,
+                     cursor: Optional[str] = None) -> Tuple[List[User], Optional[str]]:
+        """搜索用户，返回 (用户列表, 下一页游标)"""
+        q = q.strip().lower()
+        if not q:
+            return [], None
+
+        if len(q) < MIN_TRIGRAM_QUERY_LENGTH:
+            stmt, rank, descending = self._prefix_query(q)
+        elif db.get_bind().dialect.name == "sqlite":
+            stmt, rank, descending = self._sqlite_fts_query(q)
+        else:
+            stmt, rank, descending = self._trigram_query(q)
+
+        if cursor:
+            last_rank, last_id = decode_cursor(cursor)
+            after_rank = rank < last_rank if descending else rank > last_rank
+            stmt = stmt.where(or_(after_rank, and_(rank == last_rank, User.id > last_id)))
+
+        stmt = stmt.order_by(rank.desc() if descending else rank.asc(), User.id.asc()).limit(limit + 1)
+        rows = db.execute(stmt).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last_user, last_rank = rows[-1]
+            next_cursor = encode_cursor(last_rank, last_user.id)
+        return [user for user, _ in rows], next_cursor
+
+    def _prefix_query(self, q: str):
+        """短查询：前缀匹配"""
+        pattern = f"{_escape_like(q)}%"
+        rank = cast(literal(0), Float)
+        stmt = select(User, rank).where(
+            or_(*(func.lower(col).like(pattern, escape="\\") for col in SEARCH_COLUMNS))
+        )
+        return stmt, rank, True
+
+    def _trigram_query(self, q: str):
+        """PostgreSQL：pg_trgm 子串匹配 + 相似度排序"""
+        pattern = f"%{_escape_like(q)}%"
+        prefix = f"{_escape_like(q)}%"
+        lowered = [func.lower(func.coalesce(col, "")) for col in SEARCH_COLUMNS]
+        rank = cast(
+            func.greatest(*(func.similarity(col, q) for col in lowered))
+            + case(
+                (or_(lowered[0].like(prefix, escape="\\"), lowered[1].like(prefix, escape="\\")), PREFIX_BOOST),
+                else_=0.0,
+            ),
+            Float,
+        )
+        stmt = select(User, rank).where(
+            or_(*(func.lower(col).like(pattern, escape="\\") for col in SEARCH_COLUMNS))
+        )
+        return stmt, rank, True
+
+    def _sqlite_fts_query(self, q: str):
+        """SQLite：FTS5 trigram 短语匹配 + bm25 排序（值越小越相关）"""
+        fts = literal_column("users_fts")
+        phrase = '"' + q.replace('"', '""') + '"'
+        rank = cast(func.bm25(fts), Float)
+        stmt = (
+            select(User, rank)
+            .select_from(users_fts)
+            .join(User, User.id == users_fts.c.rowid)
+            .where(fts.op("MATCH")(phrase))
+        )
+        return stmt, rank, False
+
+
+user_search_crud = UserSearchCRUD()
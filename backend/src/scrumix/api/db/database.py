@@ -3,9 +3,13 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from scrumix.api.db.base import Base
 from scrumix.api.core.config import settings
+from scrumix.api.db.tracing import instrument_engine
 
-# 创建数据库引擎
-engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+# 创建数据库引擎（SQLite 仅用于本地运行，需要允许跨线程使用连接）
+connect_args = {"check_same_thread": False} if settings.SQLALCHEMY_DATABASE_URI.startswith("sqlite") else {}
+engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, connect_args=connect_args)
+# 当前请求已采样时记录每条语句的 span
+instrument_engine(engine)
 
 # 创建SessionLocal类
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
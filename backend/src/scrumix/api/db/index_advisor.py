@@ -0,0 +1,309 @@
+"""
+索引顾问（开发工具）
+
+在一个临时 schema 中按当前模型建表并灌入大规模合成数据，然后调用
+crud/ 中每个 CRUD 对象的公开方法，截获它们发出的 SQL，逐条执行
+EXPLAIN (FORMAT JSON)，标记大表上的顺序扫描并给出索引建议。
+
+整个过程都在一个事务中完成，结束时回滚，不会在数据库中留下任何数据。
+仅支持 PostgreSQL。
+
+用法:
+    cd src && python -m scrumix.api.db.index_advisor --rows 200000
+"""
+import argparse
+import hashlib
+import importlib
+import inspect
+import os
+import pkgutil
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from scrumix.api.core.config import settings
+from scrumix.api.db.base import Base
+from scrumix.api import models  # noqa: F401  注册所有模型
+from scrumix.api.models.user import AuthProvider
+from scrumix.api.schemas.user import UserCreate, UserUpdate
+
+# 合成数据中被采样的用户编号，查询参数都指向这条已存在的数据
+SAMPLE_ID = 42
+
+# 匹配 EXPLAIN Filter 中 "列 运算符" 形式的条件
+_CONDITION_RE = re.compile(r"\(*(\w+)\)*(?:::[\w ]+)?\s+(=|<>|<=|>=|<|>|~~\*?)\s")
+_RANGE_OPERATORS = {"<", ">", "<=", ">="}
+_SKIPPED_STATEMENTS = ("INSERT", "SAVEPOINT", "RELEASE", "ROLLBACK", "BEGIN", "COMMIT")
+
+
+def _md5(value: str) -> str:
+    return hashlib.md5(value.encode()).hexdigest()
+
+
+def sample_arguments() -> Dict[str, Any]:
+    """按参数名提供的示例参数，值都指向合成数据中的 SAMPLE_ID"""
+    return {
+        "user_id": SAMPLE_ID,
+        "project_id": SAMPLE_ID,
+        "session_id": SAMPLE_ID,
+        "oauth_id": SAMPLE_ID,
+        "email": f"user{SAMPLE_ID}@example.com",
+        "username": f"user{SAMPLE_ID}",
+        "provider": AuthProvider.KEYCLOAK,
+        "provider_user_id": _md5(str(SAMPLE_ID)),
+        "session_token": _md5(f"s{SAMPLE_ID}"),
+        "refresh_token": f"{SAMPLE_ID}.advisor-secret",
+        "access_token": "advisor-access-token",
+        "password": "advisor-password",
+        "current_password": "advisor-password",
+        "new_password": "advisor-password",
+        "expires_at": datetime.now() + timedelta(days=1),
+        "q": f"user{SAMPLE_ID}",
+        "since": 0,
+        "day": date.today(),
+        "daily_tokens": 100_000,
+        "skip": 0,
+        "limit": 100,
+        "user_create": UserCreate(email="advisor@example.com", username="advisor"),
+        "user_update": UserUpdate(full_name="Index Advisor"),
+    }
+
+
+# 合成数据：每个用户一个Keycloak账户、三个会话（约四分之一已停用，部分已过期）
+SEED_STATEMENTS = [
+    """
+    INSERT INTO users (email, username, full_name, is_active, is_verified, is_superuser,
+                       status, timezone, language, created_at, updated_at)
+    SELECT 'user' || g || '@example.com', 'user' || g, 'User ' || g, true, true, false,
+           'ACTIVE', 'UTC', 'zh-CN', now(), now()
+    FROM generate_series(1, :rows) AS g
+    """,
+    """
+    INSERT INTO user_oauth (user_id, provider, provider_user_id, access_token, created_at, updated_at)
+    SELECT g, 'KEYCLOAK', md5(g::text), 'token', now(), now()
+    FROM generate_series(1, :rows) AS g
+    """,
+    """
+    INSERT INTO user_sessions (user_id, session_token, refresh_token_hash, is_active, expires_at,
+                               created_at, updated_at, last_activity_at)
+    SELECT 1 + (g % :rows), md5('s' || g), encode(sha256(('r' || g)::bytea), 'hex'), g % 4 <> 0,
+           now() + ((g % 30) - 10) * interval '1 day', now(), now(), now()
+    FROM generate_series(1, :rows * 3) AS g
+    """,
+]
+
+
+@dataclass
+class CapturedQuery:
+    """一次 CRUD 调用中截获的SQL语句"""
+    method: str
+    statement: str
+    parameters: Any
+
+
+@dataclass
+class SeqScanFinding:
+    """一次大表顺序扫描"""
+    method: str
+    table: str
+    table_rows: int
+    filter: Optional[str]
+    suggested_columns: List[str] = field(default_factory=list)
+
+    @property
+    def suggestion(self) -> Optional[str]:
+        if not self.suggested_columns:
+            return None
+        name = f"ix_{self.table}_{'_'.join(self.suggested_columns)}"
+        return (
+            f"CREATE INDEX CONCURRENTLY {name} "
+            f"ON {self.table} ({', '.join(self.suggested_columns)});"
+        )
+
+
+def suggest_columns(filter_expr: Optional[str]) -> List[str]:
+    """从 EXPLAIN 的 Filter 表达式中提取索引列：等值列在前，范围列在后"""
+    if not filter_expr:
+        return []
+    equality: List[str] = []
+    ranges: List[str] = []
+    for clause in re.split(r"\s+AND\s+", filter_expr):
+        bare = clause.strip("() ")
+        if re.fullmatch(r"\w+", bare):
+            # 布尔列直接作为条件，例如 "is_active"
+            equality.append(bare)
+            continue
+        for column, operator in _CONDITION_RE.findall(clause):
+            target = ranges if operator in _RANGE_OPERATORS else equality
+            if column not in equality and column not in ranges:
+                target.append(column)
+    return equality + ranges
+
+
+def iter_plan_nodes(plan: Dict[str, Any]):
+    """深度优先遍历执行计划节点"""
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from iter_plan_nodes(child)
+
+
+def crud_methods() -> List[Tuple[str, Callable]]:
+    """收集 crud/ 中所有CRUD实例的公开方法"""
+    from scrumix.api import crud
+
+    methods = []
+    seen = set()
+    for module_info in pkgutil.iter_modules(crud.__path__):
+        module = importlib.import_module(f"{crud.__name__}.{module_info.name}")
+        for instance_name, instance in vars(module).items():
+            # 其他模块导入的同一实例只收集一次
+            if not instance_name.endswith("_crud") or id(instance) in seen:
+                continue
+            seen.add(id(instance))
+            for name, method in inspect.getmembers(instance, inspect.ismethod):
+                if not name.startswith("_"):
+                    methods.append((f"{instance_name}.{name}", method))
+    return methods
+
+
+def capture_queries(conn: Connection, verbose: bool = False) -> List[CapturedQuery]:
+    """在保存点中逐个调用CRUD方法，截获发出的SQL"""
+    captured: List[CapturedQuery] = []
+    current = {"method": None}
+
+    def before_cursor_execute(_conn, _cursor, statement, parameters, _context, executemany):
+        if current["method"] is None or executemany:
+            return
+        if statement.lstrip().upper().startswith(_SKIPPED_STATEMENTS):
+            return
+        captured.append(CapturedQuery(current["method"], statement, parameters))
+
+    samples = sample_arguments()
+    event.listen(conn, "before_cursor_execute", before_cursor_execute)
+    try:
+        for method_name, method in crud_methods():
+            kwargs = {}
+            signature = inspect.signature(method)
+            missing = [
+                p.name for p in signature.parameters.values()
+                if p.name != "db" and p.name not in samples and p.default is inspect.Parameter.empty
+            ]
+            if missing:
+                print(f"跳过 {method_name}: 缺少示例参数 {missing}")
+                continue
+            for p in signature.parameters.values():
+                if p.name != "db" and p.name in samples:
+                    kwargs[p.name] = samples[p.name]
+
+            db = Session(bind=conn, join_transaction_mode="create_savepoint")
+            current["method"] = method_name
+            try:
+                method(db, **kwargs)
+            except Exception as e:  # 单个方法失败不影响其余分析
+                print(f"调用 {method_name} 失败: {e}")
+            finally:
+                current["method"] = None
+                db.rollback()
+                db.close()
+            if verbose:
+                print(f"已调用 {method_name}")
+    finally:
+        event.remove(conn, "before_cursor_execute", before_cursor_execute)
+    return captured
+
+
+def explain(conn: Connection, query: CapturedQuery, min_rows: int) -> List[SeqScanFinding]:
+    """对一条语句执行 EXPLAIN，返回大表上的顺序扫描"""
+    result = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {query.statement}", query.parameters)
+    plan = result.scalar()[0]["Plan"]
+    findings = []
+    for node in iter_plan_nodes(plan):
+        if node.get("Node Type") != "Seq Scan":
+            continue
+        table = node["Relation Name"]
+        table_rows = conn.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:t)"),
+            {"t": table},
+        ).scalar() or 0
+        if table_rows < min_rows:
+            continue
+        findings.append(SeqScanFinding(
+            method=query.method,
+            table=table,
+            table_rows=table_rows,
+            filter=node.get("Filter"),
+            suggested_columns=suggest_columns(node.get("Filter")),
+        ))
+    return findings
+
+
+def run(database_url: str, rows: int, min_rows: int, verbose: bool = False) -> List[SeqScanFinding]:
+    """建临时schema、灌数据、分析全部CRUD查询，最后回滚"""
+    engine = create_engine(database_url)
+    if engine.dialect.name != "postgresql":
+        raise SystemExit("索引顾问仅支持 PostgreSQL")
+
+    schema = f"index_advisor_{os.getpid()}"
+    findings: List[SeqScanFinding] = []
+    with engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            conn.exec_driver_sql(f"CREATE SCHEMA {schema}")
+            conn.exec_driver_sql(f"SET LOCAL search_path TO {schema}")
+            Base.metadata.create_all(conn)
+            for statement in SEED_STATEMENTS:
+                conn.execute(text(statement), {"rows": rows})
+            for table in Base.metadata.sorted_tables:
+                conn.exec_driver_sql(f"ANALYZE {table.name}")
+
+            queries = capture_queries(conn, verbose=verbose)
+            for query in queries:
+                findings.extend(explain(conn, query, min_rows))
+                if verbose:
+                    print(f"[{query.method}] {query.statement}")
+        finally:
+            trans.rollback()
+    engine.dispose()
+    return findings
+
+
+def print_report(findings: List[SeqScanFinding]) -> None:
+    """打印分析报告"""
+    if not findings:
+        print("未发现大表顺序扫描")
+        return
+
+    print(f"发现 {len(findings)} 处大表顺序扫描:\n")
+    suggestions = {}
+    for f in findings:
+        print(f"- {f.method}: Seq Scan on {f.table} (~{f.table_rows} 行)")
+        print(f"    Filter: {f.filter or '(无)'}")
+        if f.suggestion:
+            suggestions[f.suggestion] = None
+    if suggestions:
+        print("\n索引建议:")
+        for suggestion in suggestions:
+            print(f"  {suggestion}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="对 crud/ 中的查询执行 EXPLAIN 并给出索引建议")
+    parser.add_argument("--database-url", default=str(settings.SQLALCHEMY_DATABASE_URI))
+    parser.add_argument("--rows", type=int, default=200_000, help="合成用户数量")
+    parser.add_argument("--min-rows", type=int, default=10_000, help="只报告超过该行数的表")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    findings = run(args.database_url, args.rows, args.min_rows, verbose=args.verbose)
+    print_report(findings)
+    if findings:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+排序键（分数索引）
+
+待办列表优先级、看板列内顺序使用字符串排序键而不是整数位置：
+排序键视为 base62 小数 0.d1d2d3...，按字节序比较；在两个相邻键之间总能生成一个新键，
+拖拽移动只需更新被移动的那一行（整数位置需要改写其后的所有行）。
+反复在同一位置插入时键会变长，超过 RANK_REBALANCE_LENGTH 后由后台重排为等距的短键（见 crud/rank.py）。
+
+    class BacklogItem(Base):
+        __table_args__ = (Index("ix_backlog_items_project_rank", "project_id", "rank"),)
+        rank = Column(RankType(), nullable=False)
+
+    rank_between("V", "W")  # "VV"
+    rank_between(None, "V")  # "F"（移到最前）
+"""
+from typing import List, Optional
+
+from sqlalchemy import String
+from sqlalchemy.types import TypeDecorator
+
+# 按 ASCII 升序排列的 base62 数字
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+BASE = len(DIGITS)
+_VALUES = {digit: value for value, digit in enumerate(DIGITS)}
+
+# 列长度；重排阈值远小于该值，后台重排之前的连续插入也有足够余量
+RANK_MAX_LENGTH = 255
+
+
+def rank_between(lower: Optional[str], upper: Optional[str]) -> str:
+    """
+    生成严格位于 lower 与 upper 之间的排序键（None 表示无下界/上界）
+    生成的键不以 "0" 结尾，因此任意两个不同的键之间都还能继续插入
+    """
+    lower = lower or ""
+    if upper is not None and lower >= upper:
+        raise ValueError(f"排序键下界 {lower!r} 不小于上界 {upper!r}")
+    # 追加到末尾/最前：把第一个可增减的位加一/减一，而不是取中点，连续追加时键长增长得慢得多
+    if lower and upper is None:
+        for i, digit in enumerate(lower):
+            if _VALUES[digit] < BASE - 1:
+                return lower[:i] + DIGITS[_VALUES[digit] + 1]
+        return lower + DIGITS[1]
+    if upper and not lower:
+        for i, digit in enumerate(upper):
+            if _VALUES[digit] > 1:
+                return upper[:i] + DIGITS[_VALUES[digit] - 1]
+            if _VALUES[digit] == 1:
+                break
+    digits = []
+    i = 0
+    while True:
+        low = _VALUES[lower[i]] if i < len(lower) else 0
+        high = _VALUES[upper[i]] if upper is not None and i < len(upper) else BASE
+        if high - low > 1:
+            digits.append(DIGITS[(low + high) // 2])
+            return "".join(digits)
+        digits.append(DIGITS[low])
+        if high - low == 1:
+            # 这一位已小于上界，后续位不再受上界约束
+            upper = None
+        i += 1
+
+
+def spread_ranks(count: int) -> List[str]:
+    """count 个等距的升序排序键（重排用），相邻键之间至少留出 BASE 个空位"""
+    if count <= 0:
+        return []
+    width = 1
+    while BASE ** width < (count + 1) * BASE:
+        width += 1
+    space = BASE ** width
+    ranks = []
+    for i in range(1, count + 1):
+        value = i * space // (count + 1)
+        digits = []
+        for _ in range(width):
+            value, digit = divmod(value, BASE)
+            digits.append(DIGITS[digit])
+        # 去掉末尾的 "0" 不改变顺序（"0" 是最小的数字）
+        ranks.append("".join(reversed(digits)).rstrip("0"))
+    return ranks
+
+
+class RankType(TypeDecorator):
+    """
+    排序键列：按字节序比较的字符串
+    PostgreSQL/MySQL 的默认排序规则会按语言规则比较（如忽略大小写），这里固定为二进制排序规则，
+    使数据库中的 ORDER BY 与 Python 中的字符串比较一致
+    """
+    impl = String(RANK_MAX_LENGTH)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(String(RANK_MAX_LENGTH, collation="C"))
+        if dialect.name in ("mysql", "mariadb"):
+            return dialect.type_descriptor(String(RANK_MAX_LENGTH, collation="utf8mb4_bin"))
+        return dialect.type_descriptor(String(RANK_MAX_LENGTH))
@@ -0,0 +1,51 @@
+"""
+SQLAlchemy 语句追踪
+
+在引擎上注册游标事件，当前请求/代理运行的轨迹已采样时为每条语句记录一个 db span
+（语句文本截断、影响行数、耗时）；不在已采样的轨迹中时每条语句只多一次 contextvar 读取。
+"""
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from scrumix.agents.utils.tracing import default_tracer
+
+# span 中保留的语句长度
+MAX_STATEMENT_CHARS = 500
+
+_SPAN_KEY = "_scrumix_span"
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    span = default_tracer.start_span(
+        "db.query", "db",
+        system=conn.dialect.name,
+        statement=statement[:MAX_STATEMENT_CHARS],
+        executemany=executemany or None,
+    )
+    if span is not None and context is not None:
+        setattr(context, _SPAN_KEY, span)
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    span = getattr(context, _SPAN_KEY, None)
+    if span is not None:
+        span.set(rows=cursor.rowcount if cursor.rowcount >= 0 else None)
+        default_tracer.end_span(span)
+        setattr(context, _SPAN_KEY, None)
+
+
+def _handle_error(exception_context):
+    context = exception_context.execution_context
+    span = getattr(context, _SPAN_KEY, None)
+    if span is not None:
+        default_tracer.end_span(span, exception_context.original_exception)
+        setattr(context, _SPAN_KEY, None)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """为引擎注册追踪事件（重复调用无效果）"""
+    if event.contains(engine, "before_cursor_execute", _before_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    event.listen(engine, "after_cursor_execute", _after_execute)
+    event.listen(engine, "handle_error", _handle_error)
@@ -0,0 +1,34 @@
+"""
+INSERT ... ON CONFLICT DO UPDATE
+
+PostgreSQL 与 SQLite（3.24+）语法相同，由对应方言的 insert() 生成；单条语句原子完成“存在则更新、否则插入”，
+并发写入同一键时不会出现唯一约束冲突或重复行。
+
+    stmt = upsert(db, Counter, {"key": "a", "value": 1}, ["key"],
+                  lambda excluded: {"value": Counter.value + excluded.value})
+    db.execute(stmt)
+"""
+from typing import Any, Callable, Dict, Sequence
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def upsert(db: Session, model, values: Dict[str, Any], index_elements: Sequence[str],
+           set_: Callable[[Any], Dict[Any, Any]]):
+    """
+    构造 upsert 语句（可继续 .returning(...)）
+    * `index_elements`: 冲突判定所用的唯一约束列
+    * `set_`: 接收 excluded（本次要插入的值）并返回冲突时要更新的列
+    """
+    dialect = db.get_bind().dialect.name
+    insert = _INSERTS.get(dialect)
+    if insert is None:
+        raise ValueError(f"数据库 {dialect} 不支持 INSERT ... ON CONFLICT")
+    stmt = insert(model).values(**values)
+    return stmt.on_conflict_do_update(index_elements=list(index_elements), set_=set_(stmt.excluded))
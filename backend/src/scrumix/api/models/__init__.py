@@ -1 +1,3 @@
 from .user import User, UserOAuth, UserSession
+from .usage import LLMUsage, ProjectTokenQuota
+from .change import ProjectVersion, ChangeLog
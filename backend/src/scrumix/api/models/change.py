@@ -0,0 +1,39 @@
+"""
+项目变更日志相关的数据库模型
+"""
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, JSON, Index, UniqueConstraint
+from sqlalchemy.sql import func
+from scrumix.api.db.base import Base
+
+class ProjectVersion(Base):
+    """项目的当前变更版本（每次写入加一）与已压缩掉的最高版本"""
+    __tablename__ = "project_versions"
+
+    # 项目表尚未建立，暂不设外键
+    project_id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    # 不高于该版本的日志可能已被清除，since 低于它的客户端需要全量重新加载
+    min_version = Column(BigInteger, nullable=False, default=0)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class ChangeLog(Base):
+    """项目内实体的变更记录（insert / update 附带写入后的数据，delete 只有ID）"""
+    __tablename__ = "change_log"
+    __table_args__ = (
+        UniqueConstraint("project_id", "version", name="uq_change_log_project_version"),
+        Index("ix_change_log_entity", "project_id", "entity", "entity_id"),
+    )
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    project_id = Column(Integer, nullable=False)
+    version = Column(BigInteger, nullable=False)
+    entity = Column(String(100), nullable=False)  # 表名
+    entity_id = Column(Integer, nullable=False)
+    op = Column(String(10), nullable=False)  # insert / update / delete
+    data = Column(JSON, nullable=True)
+
+    changed_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+    def __repr__(self):
+        return f"<ChangeLog(project_id={self.project_id}, version={self.version}, {self.op} {self.entity}#{self.entity_id})>"
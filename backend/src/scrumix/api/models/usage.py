@@ -0,0 +1,41 @@
+"""
+LLM 用量相关的数据库模型
+"""
+from sqlalchemy import Column, Integer, BigInteger, String, Date, DateTime, UniqueConstraint, Index
+from sqlalchemy.sql import func
+from scrumix.api.db.base import Base
+
+class LLMUsage(Base):
+    """按天汇总的LLM用量（由代理层的用量累加器批量写入）"""
+    __tablename__ = "llm_usage"
+    __table_args__ = (
+        UniqueConstraint("day", "agent_name", "project_id", "user_id", "model", name="uq_llm_usage_key"),
+        Index("ix_llm_usage_project_day", "project_id", "day"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False, index=True)  # UTC 日期
+    agent_name = Column(String(100), nullable=False, default="")
+    # 项目表尚未建立，暂不设外键；0 表示无项目/无用户（唯一约束中 NULL 互不相等，不能用作键）
+    project_id = Column(Integer, nullable=False, default=0)
+    user_id = Column(Integer, nullable=False, default=0)
+    model = Column(String(100), nullable=False)
+
+    requests = Column(Integer, nullable=False, default=0)
+    prompt_tokens = Column(BigInteger, nullable=False, default=0)
+    completion_tokens = Column(BigInteger, nullable=False, default=0)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<LLMUsage(day={self.day}, agent='{self.agent_name}', project_id={self.project_id})>"
+
+class ProjectTokenQuota(Base):
+    """项目的每日token配额（未设置时使用 LLM_PROJECT_DAILY_TOKEN_QUOTA）"""
+    __tablename__ = "project_token_quotas"
+
+    project_id = Column(Integer, primary_key=True)
+    daily_tokens = Column(BigInteger, nullable=False)  # 0 表示不限
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
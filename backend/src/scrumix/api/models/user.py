@@ -1,7 +1,7 @@
 """
 用户相关的数据库模型
 """
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Index, DDL, event, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from enum import Enum
@@ -36,6 +36,8 @@ class User(Base):
     is_verified = Column(Boolean, default=False)
     is_superuser = Column(Boolean, default=False)
     status = Column(SQLEnum(UserStatus), default=UserStatus.ACTIVE)
+    # 令牌版本：权限变更时加一，使此前签发的访问令牌失效（见 core/permissions.py）
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     
     # 个人信息
     avatar_url = Column(String(500), nullable=True)
@@ -50,13 +52,49 @@ class User(Base):
     # 关联关系
     oauth_accounts = relationship("UserOAuth", back_populates="user", cascade="all, delete-orphan")
     sessions = relationship("UserSession", back_populates="user", cascade="all, delete-orphan")
+    
+    # 搜索索引：PostgreSQL 上 email/username/full_name 的 pg_trgm GIN 索引由迁移创建，
+    # SQLite（本地运行）上使用下方的 FTS5 外部内容表 users_fts
+
+# SQLite 全文索引：trigram 分词支持子串匹配，由触发器与 users 表保持同步
+USERS_FTS_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+        email, username, full_name, content='users', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS users_fts_ai AFTER INSERT ON users BEGIN
+        INSERT INTO users_fts(rowid, email, username, full_name)
+        VALUES (new.id, new.email, new.username, new.full_name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS users_fts_ad AFTER DELETE ON users BEGIN
+        INSERT INTO users_fts(users_fts, rowid, email, username, full_name)
+        VALUES ('delete', old.id, old.email, old.username, old.full_name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS users_fts_au AFTER UPDATE OF email, username, full_name ON users BEGIN
+        INSERT INTO users_fts(users_fts, rowid, email, username, full_name)
+        VALUES ('delete', old.id, old.email, old.username, old.full_name);
+        INSERT INTO users_fts(rowid, email, username, full_name)
+        VALUES (new.id, new.email, new.username, new.full_name);
+    END
+    """,
+]
+
+for _ddl in USERS_FTS_DDL:
+    event.listen(User.__table__, "after_create", DDL(_ddl).execute_if(dialect="sqlite"))
+event.listen(User.__table__, "before_drop", DDL("DROP TABLE IF EXISTS users_fts").execute_if(dialect="sqlite"))
 
 class UserOAuth(Base):
     """OAuth账户关联表"""
     __tablename__ = "user_oauth"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     
     # OAuth信息
     provider = Column(SQLEnum(AuthProvider), nullable=False)
@@ -79,9 +117,9 @@ class UserOAuth(Base):
     # 关联关系
     user = relationship("User", back_populates="oauth_accounts")
     
-    # 复合唯一索引：一个用户在同一个OAuth提供商只能有一个账户
+    # 复合唯一索引：同一个OAuth提供商的用户ID只能关联一个账户
     __table_args__ = (
-        {"schema": None},
+        Index("uq_user_oauth_provider_user_id", "provider", "provider_user_id", unique=True),
     )
 
 class UserSession(Base):
@@ -93,7 +131,10 @@ class UserSession(Base):
     
     # 会话信息
     session_token = Column(String(255), unique=True, nullable=False, index=True)
-    refresh_token = Column(String(255), unique=True, nullable=True, index=True)
+    # 刷新令牌只保存密钥的SHA-256哈希，令牌本身为 "<会话ID>.<密钥>"
+    refresh_token_hash = Column(String(64), nullable=True)
+    previous_refresh_token_hash = Column(String(64), nullable=True)  # 上一次轮换前的哈希，用于重用检测
+    refresh_token_rotated_at = Column(DateTime(timezone=True), nullable=True)
     
     # 客户端信息
     user_agent = Column(String(500), nullable=True)
@@ -110,4 +151,9 @@ class UserSession(Base):
     last_activity_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # 关联关系
-    user = relationship("User", back_populates="sessions") 
\ No newline at end of file
+    user = relationship("User", back_populates="sessions")
+    
+    # 复合索引：覆盖按用户查询活跃且未过期会话的路径
+    __table_args__ = (
+        Index("ix_user_sessions_user_active_expires", "user_id", "is_active", "expires_at"),
+    ) 
\ No newline at end of file
@@ -1,8 +1,14 @@
 from fastapi import APIRouter
 from .auth import router as auth_router
 from .users import router as users_router
+from .agents import router as agents_router
+from .boards import router as boards_router
+from .projects import router as projects_router
 
 api_router = APIRouter()
 
 api_router.include_router(auth_router, prefix="/auth", tags=["authentication"])
 api_router.include_router(users_router, prefix="/users", tags=["users"])
+api_router.include_router(agents_router, prefix="/agents", tags=["agents"])
+api_router.include_router(boards_router, prefix="/boards", tags=["boards"])
+api_router.include_router(projects_router, prefix="/projects", tags=["projects"])
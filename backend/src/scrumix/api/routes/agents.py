@@ -0,0 +1,296 @@
+"""
+代理相关的API路由
+"""
+import datetime
+import json
+import time
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from scrumix.api.core.permissions import GlobalRole, Permission
+from scrumix.api.core.security import get_current_superuser, get_token_data, require_project_permission
+from scrumix.api.crud.usage import usage_crud
+from scrumix.api.db.database import get_db
+from scrumix.api.schemas.agent import (
+    AgentChatRequest, AgentJobCreate, AgentJobResponse, LLMUsageSummaryResponse,
+    ProjectTokenQuotaResponse, ProjectTokenQuotaUpdate
+)
+from scrumix.api.schemas.user import TokenData
+from scrumix.agents.agent.agent import BaseAgent
+from scrumix.agents.agent.chat import ChatAgent
+from scrumix.agents.llm.base import QuotaExceededError
+from scrumix.agents.llm.openai import AzureOpenAILLM
+from scrumix.agents.llm.scheduler import default_scheduler
+from scrumix.agents.llm.usage import default_usage
+from scrumix.agents.memory.conversation import ConversationMemoryStore
+from scrumix.agents.tasks.jobs import AGENT, JobLimitError, JobManager, job_manager
+from scrumix.agents.utils.metrics import ttft_metric
+
+router = APIRouter()
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # 禁止 nginx 缓冲，保证分段立即送达
+    "X-Accel-Buffering": "no",
+}
+
+
+@lru_cache()
+def get_chat_agent() -> BaseAgent:
+    """对话代理（进程内共享）"""
+    return ChatAgent(AzureOpenAILLM.from_settings())
+
+
+@lru_cache()
+def get_conversation_store() -> ConversationMemoryStore:
+    """服务端对话记忆（进程内，按最近使用淘汰）"""
+    return ConversationMemoryStore(AzureOpenAILLM.from_settings())
+
+
+@lru_cache()
+def get_job_manager() -> JobManager:
+    """后台任务调度；首次使用时注册可提交的代理"""
+    job_manager.register_agent("chat", get_chat_agent)
+    return job_manager
+
+
+def sse_event(event: str, data: Dict[str, Any], event_id: Optional[int] = None) -> str:
+    """格式化一条SSE事件；event_id 用于断线重连（Last-Event-ID）"""
+    prefix = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{prefix}event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+async def agent_event_stream(chunks: AsyncIterator[str], context: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+    """
+    把代理输出转为SSE事件流；done 事件附带本次调用的提示词token统计
+    背压：StreamingResponse 每发送完一段才拉取下一段，客户端读得慢时上游LLM流也随之放慢
+    取消：客户端断开后 Starlette 取消响应任务，finally 中关闭代理流并释放上游连接和调度槽
+    """
+    started = time.monotonic()
+    ttft = None
+    count = 0
+    try:
+        async for chunk in chunks:
+            if ttft is None:
+                ttft = time.monotonic() - started
+                ttft_metric.observe(ttft)
+            count += 1
+            yield sse_event("token", {"text": chunk})
+        context = context or {}
+        prompt_stats = context.get("prompt_stats")
+        memory_stats = context.get("memory_stats")
+        yield sse_event("done", {
+            "chunks": count,
+            "ttft_ms": round(ttft * 1000, 1) if ttft is not None else None,
+            "duration_ms": round((time.monotonic() - started) * 1000, 1),
+            "prompt": prompt_stats.as_dict() if prompt_stats is not None else None,
+            "memory": memory_stats.as_dict() if memory_stats is not None else None,
+        })
+    except Exception as e:
+        yield sse_event("error", {"detail": str(e)})
+    finally:
+        await chunks.aclose()
+
+
+@router.post("/projects/{project_id}/chat/stream")
+async def stream_agent_chat(
+    project_id: int,
+    chat_request: AgentChatRequest,
+    token_data: TokenData = Depends(require_project_permission(Permission.USE_AGENTS)),
+    agent: BaseAgent = Depends(get_chat_agent),
+    conversations: ConversationMemoryStore = Depends(get_conversation_store)
+):
+    """以SSE流式返回代理输出；项目当天token配额用尽时返回429"""
+    try:
+        default_usage.check_quota(project_id)
+    except QuotaExceededError as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e)
+        )
+    context = {"project_id": project_id, "user_id": token_data.user_id, "history": chat_request.history}
+    if chat_request.conversation_id:
+        context["memory"] = conversations.get((token_data.user_id, project_id, chat_request.conversation_id))
+    return StreamingResponse(
+        agent_event_stream(agent.execute_stream(chat_request.message, context), context),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+
+@router.get("/metrics")
+async def get_agent_metrics(current_user: TokenData = Depends(get_current_superuser)):
+    """代理与LLM调度指标（管理员）"""
+    return {
+        "ttft": ttft_metric.snapshot(),
+        "deployments": default_scheduler.stats(),
+    }
+
+
+def _quota_response(project_id: int) -> ProjectTokenQuotaResponse:
+    return ProjectTokenQuotaResponse(
+        project_id=project_id,
+        daily_tokens=default_usage.quota(project_id),
+        used_tokens=default_usage.used(project_id),
+        remaining_tokens=default_usage.remaining(project_id),
+    )
+
+
+@router.get("/usage", response_model=LLMUsageSummaryResponse)
+async def get_llm_usage(
+    since: Optional[datetime.date] = None,
+    until: Optional[datetime.date] = None,
+    group_by: List[str] = Query(["agent", "project"]),
+    project_id: Optional[int] = None,
+    current_user: TokenData = Depends(get_current_superuser),
+    db: Session = Depends(get_db)
+):
+    """按代理/项目/用户/模型/日期汇总LLM用量（管理员）；先写入本进程尚未写库的用量"""
+    try:
+        usage_crud.flush(db)
+        items = usage_crud.summary(db, since=since, until=until, group_by=group_by, project_id=project_id)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return LLMUsageSummaryResponse(since=since, until=until, group_by=group_by, items=items)
+
+
+@router.get("/usage/quotas/{project_id}", response_model=ProjectTokenQuotaResponse)
+async def get_project_token_quota(
+    project_id: int,
+    current_user: TokenData = Depends(get_current_superuser),
+    db: Session = Depends(get_db)
+):
+    """项目当天的token配额与用量（管理员）"""
+    usage_crud.flush(db)
+    return _quota_response(project_id)
+
+
+@router.put("/usage/quotas/{project_id}", response_model=ProjectTokenQuotaResponse)
+async def set_project_token_quota(
+    project_id: int,
+    quota_update: ProjectTokenQuotaUpdate,
+    current_user: TokenData = Depends(get_current_superuser),
+    db: Session = Depends(get_db)
+):
+    """设置项目每日token配额（管理员）；其他进程在下一个写库周期生效"""
+    usage_crud.set_quota(db, project_id, quota_update.daily_tokens)
+    usage_crud.flush(db)
+    return _quota_response(project_id)
+
+
+# 任务事件流的心跳间隔（秒），防止代理因空闲断开长连接
+JOB_HEARTBEAT_SECONDS = 15.0
+
+
+def _get_own_job(job_id: str, token_data: TokenData, jobs: JobManager):
+    """读取任务；只有提交者和超级用户可见，其他人得到404"""
+    job = jobs.get(job_id)
+    if job is None or (
+        job.user_id != token_data.user_id and GlobalRole.SUPERUSER.value not in token_data.scopes
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    return job
+
+
+@router.post(
+    "/projects/{project_id}/jobs",
+    response_model=AgentJobResponse,
+    status_code=status.HTTP_202_ACCEPTED
+)
+async def create_agent_job(
+    project_id: int,
+    job_create: AgentJobCreate,
+    token_data: TokenData = Depends(require_project_permission(Permission.USE_AGENTS)),
+    jobs: JobManager = Depends(get_job_manager)
+):
+    """提交后台代理/工作流任务，立即返回任务ID；进度通过 /jobs/{job_id}/events 订阅"""
+    if job_create.kind == AGENT:
+        try:
+            default_usage.check_quota(project_id)
+        except QuotaExceededError as e:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=str(e)
+            )
+    payload = {"message": job_create.message, "params": job_create.params, "context": job_create.context.model_dump()}
+    try:
+        job = jobs.submit(job_create.kind, job_create.name, token_data.user_id, payload, project_id)
+    except KeyError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown {job_create.kind}: {job_create.name}"
+        )
+    except JobLimitError as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e)
+        )
+    return job.as_dict()
+
+
+@router.get("/jobs", response_model=List[AgentJobResponse])
+async def list_agent_jobs(
+    token_data: TokenData = Depends(get_token_data),
+    jobs: JobManager = Depends(get_job_manager)
+):
+    """当前用户的任务（最新在前，已结束的任务保留 JOB_RESULT_TTL_SECONDS）"""
+    return [job.as_dict() for job in jobs.list(token_data.user_id)]
+
+
+@router.get("/jobs/{job_id}", response_model=AgentJobResponse)
+async def get_agent_job(
+    job_id: str,
+    token_data: TokenData = Depends(get_token_data),
+    jobs: JobManager = Depends(get_job_manager)
+):
+    """任务状态、部分输出与结果"""
+    return _get_own_job(job_id, token_data, jobs).as_dict()
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_agent_job_events(
+    job_id: str,
+    after: Optional[int] = Query(None, ge=0, description="只返回序号大于该值的事件"),
+    last_event_id: Optional[str] = Header(None),
+    token_data: TokenData = Depends(get_token_data),
+    jobs: JobManager = Depends(get_job_manager)
+):
+    """
+    以SSE推送任务进度（status / token / step / result / error），任务结束后关闭
+    断线重连时浏览器自动携带 Last-Event-ID，从其后的事件继续
+    """
+    job = _get_own_job(job_id, token_data, jobs)
+    if after is None:
+        after = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+
+    async def events() -> AsyncIterator[str]:
+        async for seq, event, data in job.follow(after, heartbeat=JOB_HEARTBEAT_SECONDS):
+            yield ": ping\n\n" if event == "ping" else sse_event(event, data, seq)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@router.delete("/jobs/{job_id}", response_model=AgentJobResponse)
+async def cancel_agent_job(
+    job_id: str,
+    token_data: TokenData = Depends(get_token_data),
+    jobs: JobManager = Depends(get_job_manager)
+):
+    """取消排队或运行中的任务；已结束的任务返回409"""
+    job = _get_own_job(job_id, token_data, jobs)
+    if not jobs.cancel(job_id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Job already finished"
+        )
+    return job.as_dict()
@@ -10,7 +10,7 @@ from datetime import datetime, timedelta
 import secrets
 
 from scrumix.api.core.security import (
-    create_access_token, create_refresh_token, get_current_user,
+    create_user_access_token, get_current_user, get_token_data, get_public_jwks,
     create_email_verification_token, verify_email_verification_token,
     create_password_reset_token, verify_password_reset_token
 )
@@ -19,13 +19,15 @@ from scrumix.api.crud.user import user_crud, oauth_crud, session_crud
 from scrumix.api.schemas.user import (
     UserCreate, UserResponse, LoginRequest, LoginResponse,
     OAuthTokenRequest, OAuthTokenResponse, PasswordResetRequest,
-    PasswordResetConfirm, ChangePasswordRequest
+    PasswordResetConfirm, ChangePasswordRequest, TokenData
 )
 from scrumix.api.models.user import AuthProvider
 from scrumix.api.utils.oauth import keycloak_oauth
 from scrumix.api.core.config import settings
+from scrumix.agents.utils.logger import setup_logger
 
 router = APIRouter()
+logger = setup_logger("scrumix.api.auth")
 
 @router.post("/register", response_model=UserResponse)
 async def register(user_create: UserCreate, db: Session = Depends(get_db)):
@@ -71,31 +73,24 @@ async def login(
             detail="Inactive user"
         )
     
-    # 创建访问令牌
+    # 访问令牌有效期
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": str(user.id), "email": user.email}, 
-        expires_delta=access_token_expires
-    )
     
-    # 创建刷新令牌（如果选择了记住我）
-    refresh_token = None
-    if login_data.remember_me:
-        refresh_token = create_refresh_token(
-            data={"sub": str(user.id), "email": user.email}
-        )
-    
-    # 创建会话记录
+    # 创建会话记录（如果选择了记住我，同时签发刷新令牌）
     session_expires = datetime.now() + access_token_expires
     if login_data.remember_me:
-        session_expires = datetime.now() + timedelta(days=7)
+        session_expires = datetime.now() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
     
-    session = session_crud.create_session(
+    session, refresh_token = session_crud.create_session(
         db,
         user.id,
         session_expires,
         user_agent=request.headers.get("User-Agent"),
-        ip_address=request.client.host
+        ip_address=request.client.host,
+        issue_refresh_token=login_data.remember_me
+    )
+    access_token = create_user_access_token(
+        db, user, expires_delta=access_token_expires, session_id=session.id
     )
     
     # 更新最后登录时间
@@ -205,10 +200,16 @@ async def keycloak_callback_get(
                     username=user_info.get("preferred_username"),
                     avatar_url=user_info.get("picture")
                 )
-                user = user_crud.create_user(db, user_create)
-                user.is_verified = True
-                db.commit()
-                is_new_user = True
+                try:
+                    user = user_crud.create_user(db, user_create)
+                    user.is_verified = True
+                    db.commit()
+                    is_new_user = True
+                except ValueError:
+                    # 同一用户的并发回调已先创建了该用户
+                    user = user_crud.get_by_email(db, user_info["email"])
+                    if not user:
+                        raise
             
             oauth_crud.create_oauth_account(
                 db,
@@ -220,26 +221,21 @@ async def keycloak_callback_get(
                 user_info
             )
         
-        # 创建应用的JWT令牌
+        # 应用JWT令牌的有效期（令牌在创建会话后签发，携带会话ID）
         access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = create_access_token(
-            data={"sub": str(user.id), "email": user.email},
-            expires_delta=access_token_expires
-        )
-        
-        refresh_token = create_refresh_token(
-            data={"sub": str(user.id), "email": user.email}
-        )
         
-        # 创建会话记录
-        session_expires = datetime.now() + timedelta(days=7)
-        session = session_crud.create_session(
+        # 创建会话记录并签发刷新令牌
+        session_expires = datetime.now() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+        session, refresh_token = session_crud.create_session(
             db,
             user.id,
             session_expires,
             user_agent=request.headers.get("User-Agent"),
             ip_address=request.client.host
         )
+        access_token = create_user_access_token(
+            db, user, expires_delta=access_token_expires, session_id=session.id
+        )
         
         # 更新最后登录时间
         user_crud.update_last_login(db, user.id)
@@ -260,12 +256,12 @@ async def keycloak_callback_get(
         
         # 重定向到前端，携带临时授权码
         redirect_url = f"{frontend_url}/auth/oauth/success?code={temp_code}"
-        print(f"🚀 OAuth Success! Redirecting to: {redirect_url}")
-        print(f"📝 Temp code: {temp_code}")
+        # 临时授权码可换取令牌，不写入日志
+        logger.info("OAuth login succeeded", extra={"user_id": user.id, "is_new_user": is_new_user})
         return RedirectResponse(url=redirect_url, status_code=302)
         
     except Exception as e:
-        print(f"OAuth callback error: {str(e)}")
+        logger.exception("OAuth callback error")
         return RedirectResponse(
             url=f"{frontend_url}/auth/login?error=Authentication failed: {str(e)}",
             status_code=302
@@ -369,10 +365,19 @@ async def keycloak_callback(
                 username=user_info.get("preferred_username"),
                 avatar_url=user_info.get("picture")
             )
-            user = user_crud.create_user(db, user_create)
-            user.is_verified = True  # OAuth用户默认已验证
-            db.commit()
-            is_new_user = True
+            try:
+                user = user_crud.create_user(db, user_create)
+                user.is_verified = True  # OAuth用户默认已验证
+                db.commit()
+                is_new_user = True
+            except ValueError:
+                # 同一用户的并发回调已先创建了该用户
+                user = user_crud.get_by_email(db, user_info["email"])
+                if not user:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail="Failed to create user"
+                    )
         
         # 创建OAuth账户关联
         oauth_crud.create_oauth_account(
@@ -385,26 +390,21 @@ async def keycloak_callback(
             user_info
         )
     
-    # 创建应用的访问令牌
+    # 应用访问令牌的有效期（令牌在创建会话后签发，携带会话ID）
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": str(user.id), "email": user.email},
-        expires_delta=access_token_expires
-    )
     
-    refresh_token = create_refresh_token(
-        data={"sub": str(user.id), "email": user.email}
-    )
-    
-    # 创建会话记录
-    session_expires = datetime.now() + timedelta(days=7)
-    session = session_crud.create_session(
+    # 创建会话记录并签发刷新令牌
+    session_expires = datetime.now() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    session, refresh_token = session_crud.create_session(
         db,
         user.id,
         session_expires,
         user_agent=request.headers.get("User-Agent"),
         ip_address=request.client.host
     )
+    access_token = create_user_access_token(
+        db, user, expires_delta=access_token_expires, session_id=session.id
+    )
     
     # 更新最后登录时间
     user_crud.update_last_login(db, user.id)
@@ -423,13 +423,14 @@ async def refresh_token(
     refresh_token: str,
     db: Session = Depends(get_db)
 ):
-    """刷新访问令牌"""
-    session = session_crud.get_by_refresh_token(db, refresh_token)
-    if not session:
+    """刷新访问令牌（同时轮换刷新令牌）"""
+    rotated = session_crud.rotate_refresh_token(db, refresh_token)
+    if not rotated:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid refresh token"
         )
+    session, new_refresh_token = rotated
     
     user = session.user
     if not user.is_active:
@@ -440,20 +441,54 @@ async def refresh_token(
     
     # 创建新的访问令牌
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": str(user.id), "email": user.email},
-        expires_delta=access_token_expires
+    access_token = create_user_access_token(
+        db, user, expires_delta=access_token_expires, session_id=session.id
     )
     
-    # 更新会话活动时间
-    session_crud.update_activity(db, session.id)
-    
     return {
         "access_token": access_token,
+        "refresh_token": new_refresh_token,
         "token_type": "bearer",
         "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
     }
 
+@router.post("/token/reissue")
+async def reissue_access_token(
+    current_user = Depends(get_current_user),
+    token_data: TokenData = Depends(get_token_data),
+    db: Session = Depends(get_db)
+):
+    """
+    重新签发访问令牌（获取最新的项目权限）
+    令牌所属的会话必须仍然有效（登出、停用会话后不能再续期），新令牌不晚于会话过期
+    """
+    session = None
+    if token_data.session_id is not None:
+        session = session_crud.get_active_session(db, token_data.session_id, current_user.id)
+    if session is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Session is no longer active, please log in again",
+            headers={"WWW-Authenticate": 'Bearer error="invalid_token"'},
+        )
+    now = datetime.now(session.expires_at.tzinfo)
+    access_token_expires = min(
+        timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES), session.expires_at - now
+    )
+    access_token = create_user_access_token(
+        db, current_user, expires_delta=access_token_expires, session_id=session.id
+    )
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "expires_in": int(access_token_expires.total_seconds())
+    }
+
+@router.get("/jwks")
+async def jwks():
+    """访问令牌验证公钥（供其他服务验证令牌，无需共享SECRET_KEY）"""
+    return get_public_jwks()
+
 @router.post("/password/change")
 async def change_password(
     password_data: ChangePasswordRequest,
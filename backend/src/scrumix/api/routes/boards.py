@@ -0,0 +1,114 @@
+"""
+看板实时更新路由
+"""
+import asyncio
+import time
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query, WebSocket, WebSocketDisconnect, status
+
+from scrumix.api.core.config import settings
+from scrumix.api.core.permissions import Permission, has_project_permission, token_versions
+from scrumix.api.core.realtime import PING, Subscription, board_hub
+from scrumix.api.core.security import get_current_superuser, verify_token
+from scrumix.api.db.database import SessionLocal
+from scrumix.api.schemas.user import TokenData
+
+router = APIRouter()
+
+
+def _bearer_token(websocket: WebSocket, token: Optional[str]) -> Optional[str]:
+    """浏览器无法为 WebSocket 设置请求头，令牌可放在 ?token= 中；其他客户端可使用 Authorization 头"""
+    if token:
+        return token
+    authorization = websocket.headers.get("authorization", "")
+    scheme, _, credentials = authorization.partition(" ")
+    return credentials if scheme.lower() == "bearer" and credentials else None
+
+
+def _is_stale(token_data: TokenData) -> bool:
+    """令牌版本是否已过期（WebSocket 路由不经过 get_db 依赖，自行打开会话）"""
+    db = SessionLocal()
+    try:
+        return token_versions.is_stale(db, token_data.user_id, token_data.token_version)
+    finally:
+        db.close()
+
+
+def _token_valid(token_data: TokenData) -> bool:
+    """令牌未过期且未因权限变更失效"""
+    if token_data.expires_at is not None and token_data.expires_at <= time.time():
+        return False
+    return not _is_stale(token_data)
+
+
+async def _send_updates(websocket: WebSocket, subscription: Subscription, token_data: TokenData) -> None:
+    """
+    把发送队列中的事件写给客户端；空闲超过心跳间隔时发送 ping
+    每个心跳间隔（以及令牌到期时）重新检查令牌，过期或失效时以 1008 关闭连接
+    """
+    loop = asyncio.get_running_loop()
+    next_check = time.monotonic() + settings.BOARD_HEARTBEAT_SECONDS
+    while not subscription.closed:
+        timeout = settings.BOARD_HEARTBEAT_SECONDS
+        if token_data.expires_at is not None:
+            timeout = max(0.0, min(timeout, token_data.expires_at - time.time()))
+        messages = await subscription.get(timeout=timeout)
+        if subscription.closed:
+            break
+        if not messages or time.monotonic() >= next_check:
+            next_check = time.monotonic() + settings.BOARD_HEARTBEAT_SECONDS
+            # 版本检查可能查询数据库，不在事件循环线程中执行
+            if not await loop.run_in_executor(None, _token_valid, token_data):
+                board_hub.unsubscribe(subscription)
+                await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+                return
+        if not messages:
+            messages = [f'{{"type": "{PING}"}}']
+        for message in messages:
+            await websocket.send_text(message)
+
+
+@router.websocket("/projects/{project_id}/ws")
+async def board_updates(
+    websocket: WebSocket,
+    project_id: int,
+    token: Optional[str] = Query(None)
+):
+    """
+    订阅项目看板的实时变更（需要项目查看权限）
+    服务端推送 JSON 消息 {"type", "project_id", "ts", "data"}；收到 resync 时客户端应重新拉取看板
+    客户端发送的消息只用于保活，内容被忽略；令牌过期或权限变更后连接以 1008 关闭，客户端应刷新令牌后重连
+    """
+    access_token = _bearer_token(websocket, token)
+    token_data = verify_token(access_token) if access_token else None
+    if (
+        token_data is None
+        # 版本检查可能查询数据库，与心跳一样在线程池中执行
+        or not await asyncio.get_running_loop().run_in_executor(None, _token_valid, token_data)
+        or not has_project_permission(
+            token_data.scopes, token_data.project_permissions, project_id, Permission.VIEW
+        )
+    ):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    subscription = board_hub.subscribe(project_id, token_data.user_id)
+    sender = asyncio.create_task(_send_updates(websocket, subscription, token_data))
+    try:
+        # 读取到断开为止；发送失败的连接随后也会在这里收到断开
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        board_hub.unsubscribe(subscription)
+        sender.cancel()
+        await asyncio.gather(sender, return_exceptions=True)
+
+
+@router.get("/stats")
+async def get_board_hub_stats(current_user: TokenData = Depends(get_current_superuser)):
+    """看板推送的频道、订阅数与积压/合并/丢弃计数（管理员）"""
+    return board_hub.stats()
@@ -0,0 +1,28 @@
+"""
+项目相关的API路由
+"""
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from scrumix.api.core.permissions import Permission
+from scrumix.api.core.security import require_project_permission
+from scrumix.api.crud.change import change_log_crud
+from scrumix.api.db.database import get_db
+from scrumix.api.schemas.change import ProjectChangesResponse
+from scrumix.api.schemas.user import TokenData
+
+router = APIRouter()
+
+@router.get("/{project_id}/changes", response_model=ProjectChangesResponse)
+async def get_project_changes(
+    project_id: int,
+    since: int = Query(0, ge=0, description="上次同步得到的版本，0 表示从头开始"),
+    limit: int = Query(500, ge=1, le=5000),
+    token_data: TokenData = Depends(require_project_permission(Permission.VIEW)),
+    db: Session = Depends(get_db)
+):
+    """
+    项目在 since 版本之后的插入、更新与删除（看板/待办列表重连后的增量同步）
+    has_more 时以返回的 version 继续请求；reset 时需全量重新加载
+    """
+    return change_log_crud.changes_since(db, project_id, since, limit)
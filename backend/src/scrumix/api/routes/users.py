@@ -1,15 +1,17 @@
 """
 用户管理相关的API路由
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from scrumix.api.core.security import get_current_user, get_current_superuser
+from scrumix.api.core.permissions import notify_membership_changed
 from scrumix.api.db.database import get_db
 from scrumix.api.crud.user import user_crud, session_crud
+from scrumix.api.crud.user_search import user_search_crud
 from scrumix.api.schemas.user import (
-    UserResponse, UserUpdate, UserSessionResponse
+    UserResponse, UserUpdate, UserSessionResponse, UserSearchResponse
 )
 
 router = APIRouter()
@@ -56,7 +58,7 @@ async def revoke_user_session(
     db: Session = Depends(get_db)
 ):
     """撤销指定会话"""
-    success = session_crud.deactivate_session(db, session_id)
+    success = session_crud.deactivate_session(db, session_id, current_user.id)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -85,6 +87,24 @@ async def get_users(
     users = user_crud.get_users(db, skip=skip, limit=limit)
     return users
 
+@router.get("/search", response_model=UserSearchResponse)
+async def search_users(
+    q: str = Query(..., min_length=1, max_length=255),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current_user = Depends(get_current_superuser),
+    db: Session = Depends(get_db)
+):
+    """按邮箱、用户名或姓名搜索用户（管理员）"""
+    try:
+        users, next_cursor = user_search_crud.search_users(db, q, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return UserSearchResponse(items=users, next_cursor=next_cursor)
+
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user_by_id(
     user_id: int,
@@ -136,8 +156,9 @@ async def deactivate_user(
             detail="User not found"
         )
     
-    # 停用用户的所有会话
+    # 停用用户的所有会话，并使其现有访问令牌失效
     session_crud.deactivate_user_sessions(db, user_id)
+    notify_membership_changed(db, user_id)
     
     return {"message": "User deactivated successfully"}
 
@@ -0,0 +1,82 @@
+"""
+代理相关的Pydantic schemas
+"""
+from datetime import date
+from typing import Any, Dict, List, Literal, Optional
+
+from pydantic import BaseModel, Field, model_validator
+
+class AgentChatRequest(BaseModel):
+    """代理对话请求"""
+    message: str = Field(..., min_length=1, max_length=20_000)
+    history: List[Dict[str, str]] = []
+    # 指定时由服务端保存对话记忆（滑动窗口 + 滚动摘要），忽略 history
+    conversation_id: Optional[str] = Field(None, min_length=1, max_length=100)
+
+class LLMUsageSummaryItem(BaseModel):
+    """一个分组的LLM用量；未参与分组的维度为 None"""
+    day: Optional[date] = None
+    agent: Optional[str] = None
+    project: Optional[int] = None
+    user: Optional[int] = None
+    model: Optional[str] = None
+    requests: int
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+
+class LLMUsageSummaryResponse(BaseModel):
+    """LLM用量汇总（管理员）"""
+    since: Optional[date] = None
+    until: Optional[date] = None
+    group_by: List[str]
+    items: List[LLMUsageSummaryItem]
+
+class ProjectTokenQuotaUpdate(BaseModel):
+    """设置项目每日token配额；None 表示恢复默认配额，0 表示不限"""
+    daily_tokens: Optional[int] = Field(None, ge=0)
+
+class ProjectTokenQuotaResponse(BaseModel):
+    """项目当天的token配额与用量"""
+    project_id: int
+    daily_tokens: int
+    used_tokens: int
+    remaining_tokens: Optional[int] = None
+
+class AgentJobMessage(BaseModel):
+    """任务上下文中的一条对话历史"""
+    role: Literal["user", "assistant"]
+    content: str = Field(..., max_length=20_000)
+
+class AgentJobContext(BaseModel):
+    """任务的客户端上下文：只接受对话历史，其他字段被丢弃"""
+    history: List[AgentJobMessage] = Field([], max_length=100)
+
+class AgentJobCreate(BaseModel):
+    """提交代理/工作流任务；agent 需要 message，workflow 使用 params"""
+    kind: Literal["agent", "workflow"] = "agent"
+    name: str = Field(..., min_length=1, max_length=100)
+    message: Optional[str] = Field(None, min_length=1, max_length=20_000)
+    params: Dict[str, Any] = {}
+    context: AgentJobContext = AgentJobContext()
+
+    @model_validator(mode="after")
+    def check_message(self) -> "AgentJobCreate":
+        if self.kind == "agent" and not self.message:
+            raise ValueError("message is required for agent jobs")
+        return self
+
+class AgentJobResponse(BaseModel):
+    """任务状态；运行中的代理任务在 partial 中返回已生成的部分输出"""
+    job_id: str
+    kind: str
+    name: str
+    project_id: Optional[int] = None
+    status: str
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    partial: Optional[str] = None
+    result: Any = None
+    error: Optional[str] = None
+    last_event_id: int
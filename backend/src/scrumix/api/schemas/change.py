@@ -0,0 +1,26 @@
+"""
+项目变更同步相关的Pydantic schemas
+"""
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+
+class ChangeEntry(BaseModel):
+    """一条实体变更；insert/update 的 data 为写入后的完整列值，客户端按 upsert 应用"""
+    version: int
+    entity: str
+    id: int
+    op: str
+    data: Optional[Dict[str, Any]] = None
+
+class ProjectChangesResponse(BaseModel):
+    """
+    增量同步结果
+    version 为下次请求的 since；reset 为真时变更日志已压缩，客户端需全量重新加载
+    """
+    project_id: int
+    since: int
+    version: int
+    reset: bool = False
+    has_more: bool = False
+    changes: List[ChangeEntry] = []
@@ -1,7 +1,7 @@
 """
 用户相关的Pydantic schemas
 """
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime
 from pydantic import BaseModel, EmailStr, ConfigDict
 from scrumix.api.models.user import AuthProvider, UserStatus
@@ -52,6 +52,11 @@ class UserResponse(UserBase):
     created_at: datetime
     last_login_at: Optional[datetime] = None
 
+class UserSearchResponse(BaseModel):
+    """用户搜索结果（键集分页）"""
+    items: List[UserResponse]
+    next_cursor: Optional[str] = None
+
 class LoginRequest(BaseModel):
     """登录请求"""
     email: EmailStr
@@ -70,7 +75,12 @@ class TokenData(BaseModel):
     """Token数据"""
     user_id: Optional[int] = None
     email: Optional[str] = None
-    scopes: List[str] = []
+    scopes: List[str] = []  # 全局角色
+    project_permissions: Dict[int, int] = {}  # 项目ID -> 权限位集
+    issued_at: Optional[int] = None
+    expires_at: Optional[int] = None
+    session_id: Optional[int] = None
+    token_version: int = 0
 
 class OAuthTokenRequest(BaseModel):
     """OAuth Token请求"""
@@ -7,6 +7,10 @@ from typing import Optional, Dict, Any
 from urllib.parse import urlencode
 
 from scrumix.api.core.config import settings
+from scrumix.agents.utils.logger import setup_logger
+from scrumix.agents.utils.tracing import ERROR, default_tracer
+
+logger = setup_logger("scrumix.api.oauth")
 
 class KeycloakOAuth:
     def __init__(self):
@@ -55,17 +59,20 @@ class KeycloakOAuth:
             "redirect_uri": redirect_uri,
         }
         
-        async with httpx.AsyncClient() as client:
+        async with httpx.AsyncClient() as client, \
+                default_tracer.span("keycloak.exchange_code", "http", url=self.token_url) as span:
             try:
                 response = await client.post(
                     self.token_url,
                     data=data,
-                    headers={"Content-Type": "application/x-www-form-urlencoded"}
+                    headers=default_tracer.inject({"Content-Type": "application/x-www-form-urlencoded"})
                 )
+                span.set(status_code=response.status_code)
                 response.raise_for_status()
                 return response.json()
             except httpx.HTTPError as e:
-                print(f"Error exchanging code for token: {e}")
+                span.status = ERROR
+                logger.warning(f"Error exchanging code for token: {e}")
                 return None
     
     async def refresh_access_token(self, refresh_token: str) -> Optional[Dict[str, Any]]:
@@ -77,33 +84,39 @@ class KeycloakOAuth:
             "refresh_token": refresh_token,
         }
         
-        async with httpx.AsyncClient() as client:
+        async with httpx.AsyncClient() as client, \
+                default_tracer.span("keycloak.refresh_token", "http", url=self.token_url) as span:
             try:
                 response = await client.post(
                     self.token_url,
                     data=data,
-                    headers={"Content-Type": "application/x-www-form-urlencoded"}
+                    headers=default_tracer.inject({"Content-Type": "application/x-www-form-urlencoded"})
                 )
+                span.set(status_code=response.status_code)
                 response.raise_for_status()
                 return response.json()
             except httpx.HTTPError as e:
-                print(f"Error refreshing token: {e}")
+                span.status = ERROR
+                logger.warning(f"Error refreshing token: {e}")
                 return None
     
     async def get_user_info(self, access_token: str) -> Optional[Dict[str, Any]]:
         """获取用户信息"""
         headers = {"Authorization": f"Bearer {access_token}"}
         
-        async with httpx.AsyncClient() as client:
+        async with httpx.AsyncClient() as client, \
+                default_tracer.span("keycloak.userinfo", "http", url=self.userinfo_url) as span:
             try:
                 response = await client.get(
                     self.userinfo_url,
-                    headers=headers
+                    headers=default_tracer.inject(headers)
                 )
+                span.set(status_code=response.status_code)
                 response.raise_for_status()
                 return response.json()
             except httpx.HTTPError as e:
-                print(f"Error getting user info: {e}")
+                span.status = ERROR
+                logger.warning(f"Error getting user info: {e}")
                 return None
     
     async def validate_token(self, access_token: str) -> bool:
@@ -122,16 +135,19 @@ class KeycloakOAuth:
         
         revoke_url = f"{self.server_url}/realms/{self.realm}/protocol/openid-connect/revoke"
         
-        async with httpx.AsyncClient() as client:
+        async with httpx.AsyncClient() as client, \
+                default_tracer.span("keycloak.revoke_token", "http", url=revoke_url) as span:
             try:
                 response = await client.post(
                     revoke_url,
                     data=data,
-                    headers={"Content-Type": "application/x-www-form-urlencoded"}
+                    headers=default_tracer.inject({"Content-Type": "application/x-www-form-urlencoded"})
                 )
+                span.set(status_code=response.status_code)
                 return response.status_code == 200
             except httpx.HTTPError as e:
-                print(f"Error revoking token: {e}")
+                span.status = ERROR
+                logger.warning(f"Error revoking token: {e}")
                 return False
 
 # 实例化OAuth客户端
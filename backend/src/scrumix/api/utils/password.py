@@ -3,13 +3,17 @@
 """
 from passlib.context import CryptContext
 
+from scrumix.agents.utils.tracing import default_tracer
+
 # 密码加密上下文
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """验证密码"""
-    return pwd_context.verify(plain_password, hashed_password)
+    with default_tracer.span("password.verify", "crypto"):
+        return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     """获取密码哈希值"""
-    return pwd_context.hash(password) 
\ No newline at end of file
+    with default_tracer.span("password.hash", "crypto"):
+        return pwd_context.hash(password) 
\ No newline at end of file
@@ -5,16 +5,18 @@ import uvicorn
 import os
 
 from scrumix.api.app import app
+from scrumix.agents.utils.logger import setup_logger
+
+logger = setup_logger("scrumix.main")
 
 # Only initialize database if it's available
 if os.environ.get("POSTGRES_SERVER") and os.environ.get("POSTGRES_PASSWORD"):
     try:
         from scrumix.api.core.init_db import init_db
         init_db()
-        print("Database initialized successfully")
+        logger.info("Database initialized successfully")
     except Exception as e:
-        print(f"Warning: Could not initialize database: {e}")
-        print("Application will start without database connection")
+        logger.warning(f"Could not initialize database: {e}; application will start without database connection")
 
 if __name__ == "__main__":
     uvicorn.run("scrumix.api.app:app", host="0.0.0.0", port=8000, reload=True)